@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Student Management core (Student_Management_core.py)
+- Builds a StudentManager with N synthetic students (default 10^6)
+- Times ID lookups, name-prefix searches, renames and deletes against the
+  manager's indexes, and a linear scan (the old search) for comparison
+- Times sorted pages at random offsets (what the GUI table fetches on
+  scroll), including building the sort index on first use
+- Times ranking/statistics queries (top-k, rank, mean/variance,
+  histograms) on the manager's incrementally maintained structures
+- Times class-wide aggregates over the columnar marks store
+- Times a streaming CSV import into a SQLite StudentStore, export, and
+  reopening the store (lazy: nothing is read until asked for)
+- Times the headless batch CLI in fresh processes (module import, stats,
+  streamed adds and lookups), as a load test would run it
+- Reports operations/sec, memory per student and peak RSS; results can be
+  saved as JSON
+
+Usage examples:
+  python Student_Management_bench.py
+  python Student_Management_bench.py --students 100000 --ops 50000 --out students.json
+  python Student_Management_bench.py --import-rows 0     # skip the storage benchmarks
+"""
+
+import argparse
+import json
+import platform
+import random
+import resource
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+
+import Student_Management_core as core
+
+# -------------------------
+# Data
+# -------------------------
+def make_name(rng):
+    first = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8))).title()
+    last = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))).title()
+    return f"{first} {last}"
+
+def make_students(n, seed=1):
+    rng = random.Random(seed)
+    for i in range(n):
+        marks = {sub: rng.randint(0, 100) for sub in core.DEFAULT_SUBJECTS}
+        yield core.Student(f"S{i:07d}", make_name(rng), marks)
+
+# -------------------------
+# Benchmarks
+# -------------------------
+def current_rss_kb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * (resource.getpagesize() // 1024)
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def timed(fn, ops):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    return {"ops": ops, "seconds": elapsed, "ops_per_sec": ops / elapsed if elapsed else None}
+
+def run_storage(args, results):
+    """Import/export through a SQLite store; returns the RSS growth of the import in KiB."""
+    with tempfile.TemporaryDirectory() as tmp:
+        src = Path(tmp) / "students.csv"
+        rng = random.Random(args.seed)
+        with open(src, "w", encoding="utf-8") as f:
+            f.write(",".join(core.RECORD_FIELDS) + "\n")
+            for i in range(args.import_rows):
+                marks = ",".join(str(rng.randint(0, 100)) for _ in core.DEFAULT_SUBJECTS)
+                f.write(f"S{i:07d},{make_name(rng)},{marks}\n")
+
+        db = Path(tmp) / "students.db"
+        manager = core.StudentManager(core.StudentStore(db))
+        rss_before = current_rss_kb()
+        results["import_csv"] = timed(lambda: manager.import_file(src), args.import_rows)
+        rss_growth = current_rss_kb() - rss_before
+        results["reimport_all_duplicates"] = timed(lambda: manager.import_file(src), args.import_rows)
+        results["export_jsonl"] = timed(lambda: manager.export_file(Path(tmp) / "out.jsonl"),
+                                        args.import_rows)
+        manager.store.close()
+
+        def reopen():
+            m = core.StudentManager(core.StudentStore(db))
+            m.get("S0000000")
+            m.store.close()
+        results["open_store_and_get"] = timed(reopen, 1)
+
+        m = core.StudentManager(core.StudentStore(db))
+        ids = [f"S{rng.randrange(args.import_rows):07d}" for _ in range(args.ops // 10)]
+        results["store_get_by_id"] = timed(lambda: [m.get(i) for i in ids], len(ids))
+        results["store_name_prefix_10"] = timed(lambda: [m.search_name(i[-3:], limit=10) for i in ids],
+                                                len(ids))
+        results["store_sort_index_total"] = timed(lambda: m.page("total", 0, 1), 1)
+        offsets = [rng.randrange(args.import_rows) for _ in range(200)]
+        results["store_page_40_by_total"] = timed(lambda: [m.page("total", o, 40, True) for o in offsets],
+                                                  len(offsets))
+        results["store_rank_by_average"] = timed(lambda: [m.rank(i) for i in ids[:1000]], len(ids[:1000]))
+        results["store_stats_and_histogram"] = timed(
+            lambda: [(m.stats(sub), m.histogram(sub)) for _ in range(100) for sub in core.DEFAULT_SUBJECTS],
+            100 * len(core.DEFAULT_SUBJECTS))
+        m.store.close()
+        run_cli(db, ids, results)
+    return rss_growth
+
+def run_cli(db, ids, results, runs=10):
+    """The batch CLI as a load test would drive it: one fresh process per command."""
+    def spawn(*argv, stdin=None):
+        subprocess.run([sys.executable, *argv], input=stdin, cwd=HERE, check=False,
+                       stdout=subprocess.DEVNULL, text=True)
+    cli = ("-m", "Student_Management_core", "--db", str(db))
+
+    results["python_startup_baseline"] = timed(lambda: [spawn("-c", "pass") for _ in range(runs)], runs)
+    results["cli_import_core"] = timed(lambda: [spawn("-c", "import Student_Management_core")
+                                                for _ in range(runs)], runs)
+    results["cli_stats_process"] = timed(lambda: [spawn(*cli, "stats") for _ in range(runs)], runs)
+    lookups = "\n".join(ids) + "\n"
+    results["cli_query_id_stream"] = timed(lambda: spawn(*cli, "query", "--id", "-", stdin=lookups), len(ids))
+    fields = core.RECORD_FIELDS
+    adds = "".join(json.dumps(dict(zip(fields, (f"N{i:07d}", "New Student", 50, 60, 70)))) + "\n"
+                   for i in range(len(ids)))
+    results["cli_add_stream"] = timed(lambda: spawn(*cli, "add", "-", stdin=adds), len(ids))
+
+def run(args):
+    rng = random.Random(args.seed)
+    manager = core.StudentManager()
+    results = {}
+
+    rss_before = current_rss_kb()
+    students = list(make_students(args.students, args.seed))
+    rss_students = current_rss_kb()
+
+    def build():
+        for s in students:
+            manager.add_student(s)
+    results["add"] = timed(build, args.students)
+    students = None
+    rss_indexed = current_rss_kb()
+
+    ids = [f"S{rng.randrange(args.students):07d}" for _ in range(args.ops)]
+    results["get_by_id"] = timed(lambda: [manager.get(i) for i in ids], args.ops)
+
+    prefixes = [manager.get(i).name[:3] for i in ids[:args.ops // 10]]
+    results["name_prefix_10"] = timed(lambda: [manager.search_name(p, limit=10) for p in prefixes],
+                                      len(prefixes))
+
+    renames = ids[:args.ops // 10]
+    results["rename"] = timed(lambda: [manager.update_student(i, name=make_name(rng)) for i in renames],
+                              len(renames))
+
+    doomed = list(dict.fromkeys(ids[:args.ops // 10]))
+
+    def delete_and_restore():
+        removed = [manager.delete_student(i) for i in doomed]
+        for s in removed:
+            manager.add_student(s)
+    results["delete_and_readd"] = timed(delete_and_restore, 2 * len(doomed))
+
+    results["sort_index_total"] = timed(lambda: manager.page("total", 0, 1), 1)
+    offsets = [rng.randrange(len(manager)) for _ in range(args.ops // 10)]
+    results["page_40_by_total"] = timed(lambda: [manager.page("total", o, 40, True) for o in offsets],
+                                        len(offsets))
+
+    queries = ids[:args.ops // 10]
+    results["top_10_by_average"] = timed(lambda: [manager.top(10) for _ in queries], len(queries))
+    results["rank_by_average"] = timed(lambda: [manager.rank(i) for i in queries], len(queries))
+    results["stats_per_subject"] = timed(
+        lambda: [manager.stats(sub) for _ in queries for sub in core.DEFAULT_SUBJECTS],
+        len(queries) * len(core.DEFAULT_SUBJECTS))
+    results["histogram_per_subject"] = timed(
+        lambda: [manager.histogram(sub) for _ in range(100) for sub in core.DEFAULT_SUBJECTS],
+        100 * len(core.DEFAULT_SUBJECTS))
+
+    results["subject_means"] = timed(lambda: [core.MARKS.subject_means() for _ in range(10)], 10)
+    results["all_averages"] = timed(lambda: [core.MARKS.averages() for _ in range(10)], 10)
+
+    # the previous search: one linear pass over all students per lookup
+    scan_ids = ids[:args.scan_ops]
+
+    def linear():
+        for target in scan_ids:
+            for s in manager.students:
+                if s.student_id == target:
+                    break
+    results["linear_scan_baseline"] = timed(linear, len(scan_ids))
+
+    # after the in-memory numbers: students built later reuse the memory the
+    # import freed, and the RSS deltas above would read close to zero
+    import_rss_kb = run_storage(args, results) if args.import_rows else None
+
+    report = {
+        "meta": {
+            "students": args.students, "ops": args.ops, "seed": args.seed,
+            "python": platform.python_version(), "platform": platform.platform(),
+            "sorted_index": f"{core.sorted_list_type().__module__}.{core.sorted_list_type().__name__}",
+            "numpy": bool(core.load_numpy()),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "bytes_per_student": (rss_students - rss_before) * 1024 / args.students,
+        "bytes_per_student_indexed": (rss_indexed - rss_before) * 1024 / args.students,
+        "import_rss_growth_kb": import_rss_kb,
+        "results": results,
+    }
+    for name, r in results.items():
+        print(f"{name:22} {r['ops']:>9,} ops {r['seconds']:9.3f} s {r['ops_per_sec']:14,.0f} ops/s")
+    print(f"peak RSS {report['peak_rss_kb'] / 1024:.1f} MiB, "
+          f"{report['bytes_per_student']:.0f} bytes/student "
+          f"({report['bytes_per_student_indexed']:.0f} with indexes)")
+    if import_rss_kb is not None:
+        print(f"RSS growth during import: {import_rss_kb / 1024:.1f} MiB")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to: {args.out}")
+    return report
+
+# -------------------------
+# CLI
+# -------------------------
+def parse_args():
+    p = argparse.ArgumentParser(description="Benchmarks for Student_Management_core.py")
+    p.add_argument("--students", type=int, default=1_000_000, help="Number of students to create")
+    p.add_argument("--ops", type=int, default=100_000, help="Lookups to time (searches/renames use a tenth)")
+    p.add_argument("--scan-ops", type=int, default=20, help="Lookups timed with the linear-scan baseline")
+    p.add_argument("--import-rows", type=int, default=1_000_000,
+                   help="Rows for the SQLite import/export benchmarks (0 to skip)")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--out", help="Write results JSON here")
+    return p.parse_args()
+
+if __name__ == "__main__":
+    run(parse_args())
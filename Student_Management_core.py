@@ -0,0 +1,1144 @@
+#!/usr/bin/env python3
+"""
+Student Management core (headless)
+- Student, the columnar marks store and StudentManager with its indexes
+- Rankings and statistics kept up to date on every change
+- SQLite StudentStore and streaming CSV/JSONL import/export
+- Batch CLI: add / import / query / stats, one transaction per batch
+No tkinter: the GUI and the interactive menu live in Student_Management_system.py.
+
+Usage examples:
+  python Student_Management_core.py --db students.db import students.csv more.jsonl
+  python Student_Management_core.py add S001 "Ann Lee" 90 80 70
+  cat new_students.jsonl | python Student_Management_core.py add -
+  python Student_Management_core.py query --top 10 --by Math
+  python Student_Management_core.py query --id S001 S002 --rank
+  cut -d, -f1 ids.csv | python Student_Management_core.py query --id -
+  python Student_Management_core.py stats --histogram 10
+
+Import stays cheap: sqlite3, csv, json, numpy and sortedcontainers load on
+first use (about 2.5 ms over interpreter startup once bytecode is cached).
+Check with: python -X importtime -c "import Student_Management_core"
+"""
+
+import os
+import sys
+from bisect import bisect_left, bisect_right, insort
+from array import array
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+from itertools import accumulate, chain, islice
+from operator import itemgetter
+
+# sqlite3, csv, json and the optional numpy are imported where they are used.
+_NUMPY = None
+
+
+def load_numpy():
+    """NumPy if it is installed, else False (imported on first use: it is slow to import)."""
+    global _NUMPY
+    if _NUMPY is None:
+        try:
+            import numpy
+            _NUMPY = numpy
+        except ImportError:
+            _NUMPY = False
+    return _NUMPY
+
+
+# 1️⃣ Tuple (fixed data)
+DEFAULT_SUBJECTS = ("Math", "Science", "English")
+MARK_RANGE = (0, 100)
+
+# 2️⃣ Sorted index (sortedcontainers if installed, else a small bucketed list)
+class BucketSortedList:
+    """
+    Minimal stand-in for sortedcontainers.SortedList: values are kept in
+    sorted buckets of about `load` items, so add/remove shift one bucket
+    instead of the whole list, and values can be read by position.
+    """
+    load = 1000
+
+    def __init__(self, iterable=()):
+        values = sorted(iterable)
+        self._lists = [values[i:i + self.load] for i in range(0, len(values), self.load)]
+        self._maxes = [b[-1] for b in self._lists]
+        self._len = len(values)
+        self._offsets = None   # start position of each bucket, rebuilt on demand
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return chain.from_iterable(self._lists)
+
+    def __contains__(self, value):
+        i = bisect_left(self._maxes, value)
+        if i == len(self._maxes):
+            return False
+        bucket = self._lists[i]
+        j = bisect_left(bucket, value)
+        return j < len(bucket) and bucket[j] == value
+
+    def add(self, value):
+        if not self._lists:
+            self._lists.append([value])
+            self._maxes.append(value)
+        else:
+            i = bisect_left(self._maxes, value)
+            if i == len(self._maxes):
+                i -= 1
+                self._lists[i].append(value)
+                self._maxes[i] = value
+            else:
+                insort(self._lists[i], value)
+            bucket = self._lists[i]
+            if len(bucket) > 2 * self.load:
+                half = bucket[self.load:]
+                del bucket[self.load:]
+                self._lists.insert(i + 1, half)
+                self._maxes[i] = bucket[-1]
+                self._maxes.insert(i + 1, half[-1])
+        self._len += 1
+        self._offsets = None
+
+    def remove(self, value):
+        i = bisect_left(self._maxes, value)
+        bucket = self._lists[i] if i < len(self._lists) else []
+        j = bisect_left(bucket, value)
+        if j == len(bucket) or bucket[j] != value:
+            raise ValueError(f"{value!r} not in list")
+        del bucket[j]
+        if bucket:
+            self._maxes[i] = bucket[-1]
+        else:
+            del self._lists[i]
+            del self._maxes[i]
+        self._len -= 1
+        self._offsets = None
+
+    def discard(self, value):
+        try:
+            self.remove(value)
+        except ValueError:
+            pass
+
+    def _offset(self, i):
+        if self._offsets is None:
+            self._offsets = [0, *accumulate(len(b) for b in self._lists)]
+        return self._offsets[i]
+
+    def bisect_left(self, value):
+        i = bisect_left(self._maxes, value)
+        if i == len(self._maxes):
+            return self._len
+        return self._offset(i) + bisect_left(self._lists[i], value)
+
+    def bisect_right(self, value):
+        i = bisect_right(self._maxes, value)
+        if i == len(self._maxes):
+            return self._len
+        return self._offset(i) + bisect_right(self._lists[i], value)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                return list(self)[index]
+            return list(self.islice(start, stop))
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("SortedList index out of range")
+        self._offset(0)
+        i = bisect_right(self._offsets, index) - 1
+        return self._lists[i][index - self._offsets[i]]
+
+    def islice(self, start=None, stop=None, reverse=False):
+        start, stop, _ = slice(start, stop).indices(self._len)
+        if start >= stop:
+            return iter(())
+        if reverse:
+            return (self[i] for i in range(stop - 1, start - 1, -1))
+        self._offset(0)
+        i = bisect_right(self._offsets, start) - 1
+        first = self._lists[i][start - self._offsets[i]:]
+        rest = chain.from_iterable(self._lists[i + 1:])
+        return (v for _, v in zip(range(stop - start), chain(first, rest)))
+
+    def irange(self, minimum=None, maximum=None, reverse=False):
+        start = 0 if minimum is None else self.bisect_left(minimum)
+        stop = self._len if maximum is None else self.bisect_right(maximum)
+        return self.islice(start, stop, reverse=reverse)
+
+
+_SORTED_LIST = None
+
+
+def sorted_list_type():
+    """sortedcontainers.SortedList if installed, else BucketSortedList (resolved on first use)."""
+    global _SORTED_LIST
+    if _SORTED_LIST is None:
+        try:
+            from sortedcontainers import SortedList
+            _SORTED_LIST = SortedList
+        except ImportError:
+            _SORTED_LIST = BucketSortedList
+    return _SORTED_LIST
+
+
+# 3️⃣ OOP Class (marks live in a shared columnar store)
+class MarksStore:
+    """
+    Marks of all students, one array column per subject plus a column of
+    totals, addressed by row number. Totals are kept up to date on every
+    write; class-wide aggregates run over whole columns (with NumPy when it
+    is installed). Rows of students that no longer exist are reused.
+    """
+
+    def __init__(self, subjects=DEFAULT_SUBJECTS):
+        self.subjects = tuple(subjects)
+        self.columns = {sub: array("i") for sub in self.subjects}
+        self.totals = array("q")
+        self._free = []
+
+    def __len__(self):
+        """Rows in use."""
+        return len(self.totals) - len(self._free)
+
+    def _check(self, marks):
+        unknown = set(marks) - set(self.subjects)
+        if unknown:
+            raise ValueError(f"Unknown subject(s): {', '.join(sorted(unknown))}")
+        missing = [sub for sub in self.subjects if sub not in marks]
+        if missing:
+            raise ValueError(f"Missing marks for: {', '.join(missing)}")
+
+    def add(self, marks):
+        """Store a {subject: mark} dict and return its row."""
+        self._check(marks)
+        total = sum(int(marks[sub]) for sub in self.subjects)
+        if self._free:
+            row = self._free.pop()
+            for sub in self.subjects:
+                self.columns[sub][row] = int(marks[sub])
+            self.totals[row] = total
+            return row
+        for sub in self.subjects:
+            self.columns[sub].append(int(marks[sub]))
+        self.totals.append(total)
+        return len(self.totals) - 1
+
+    def set_row(self, row, marks):
+        self._check(marks)
+        for sub in self.subjects:
+            self.columns[sub][row] = int(marks[sub])
+        self.totals[row] = sum(int(marks[sub]) for sub in self.subjects)
+
+    def set(self, row, subject, mark):
+        col = self.columns[subject]
+        self.totals[row] += int(mark) - col[row]
+        col[row] = int(mark)
+
+    def row(self, row):
+        return {sub: self.columns[sub][row] for sub in self.subjects}
+
+    def release(self, row):
+        for sub in self.subjects:
+            self.columns[sub][row] = 0
+        self.totals[row] = 0
+        self._free.append(row)
+
+    def subject_means(self):
+        """{subject: mean mark} over all students, one pass per column."""
+        n = len(self)
+        if not n:
+            return {sub: 0.0 for sub in self.subjects}
+        # released rows hold zeros, so they do not change the sums
+        np = load_numpy()
+        if np:
+            return {sub: float(np.frombuffer(col, dtype=np.int32).sum(dtype=np.int64)) / n
+                    for sub, col in self.columns.items()}
+        return {sub: sum(col) / n for sub, col in self.columns.items()}
+
+    def averages(self):
+        """Average mark of every row (released rows included), as one vector."""
+        k = len(self.subjects)
+        np = load_numpy()
+        if np:
+            return np.frombuffer(self.totals, dtype=np.int64) / k
+        return array("d", map(float(k).__rtruediv__, self.totals))
+
+
+MARKS = MarksStore()   # shared by every Student
+
+
+class Student:
+    __slots__ = ("student_id", "name", "_row")
+    store = MARKS
+
+    def __init__(self, student_id, name, marks_dict):
+        self.student_id = student_id
+        self.name = name
+        self._row = self.store.add(marks_dict)   # subject → marks, kept in MARKS
+
+    def __del__(self):
+        try:
+            self.store.release(self._row)
+        except (AttributeError, TypeError):
+            pass   # half-built student, or interpreter shutdown
+
+    # A student owns its row and frees it when it dies, so copies (and
+    # unpickled students) must take a row of their own, never share one.
+    def __copy__(self):
+        return type(self)(self.student_id, self.name, self.marks)
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
+
+    def __reduce__(self):
+        return type(self), (self.student_id, self.name, self.marks)
+
+    @property
+    def marks(self):
+        return self.store.row(self._row)
+
+    @marks.setter
+    def marks(self, marks_dict):
+        self.store.set_row(self._row, marks_dict)
+
+    def mark(self, subject):
+        return self.store.columns[subject][self._row]
+
+    def total_marks(self):
+        return self.store.totals[self._row]
+
+    def average(self):
+        return self.store.totals[self._row] / len(self.store.subjects)
+
+
+# 4️⃣ Student Manager
+SORT_COLUMNS = ("student_id", "name") + DEFAULT_SUBJECTS + ("total",)   # "total" also orders averages
+STAT_COLUMNS = DEFAULT_SUBJECTS + ("total",)   # queries also take "average" (the total / subjects)
+
+Stats = namedtuple("Stats", "count mean variance")           # population variance
+Standing = namedtuple("Standing", "rank count percentile")   # rank 1 = best, ties share a rank
+
+
+class RunningStats:
+    """
+    Count, sum and sum of squares of one column, plus a histogram of its
+    values, kept up to date one add/remove at a time. Marks are ints, so the
+    sums are exact and mean/variance never drift.
+    """
+    __slots__ = ("count", "sum", "squares", "counts")
+
+    def __init__(self):
+        self.count = self.sum = self.squares = 0
+        self.counts = {}   # value -> how many students have it
+
+    def add(self, value):
+        self.count += 1
+        self.sum += value
+        self.squares += value * value
+        counts = self.counts
+        counts[value] = counts.get(value, 0) + 1
+
+    def remove(self, value):
+        self.count -= 1
+        self.sum -= value
+        self.squares -= value * value
+        left = self.counts[value] - 1
+        if left:
+            self.counts[value] = left
+        else:
+            del self.counts[value]
+
+
+class StudentManager:
+    """
+    Owns the students and their indexes:
+    - primary hash index student_id -> Student (also keeps insertion order)
+    - sorted name index of (casefolded name, student_id) for prefix search
+    - sorted (value, student_id) index per SORT_COLUMNS column, built the
+      first time a page is sorted or ranked by it
+    - RunningStats per STAT_COLUMNS column for mean/variance/histograms
+    Change names, marks and delete through the manager so the indexes stay in step.
+
+    With a StudentStore the students live on disk instead: nothing is loaded
+    up front, every call goes to the store's indexes and Students are built
+    only for the rows asked for.
+    """
+
+    def __init__(self, store=None):
+        self.store = store
+        self._by_id = {}               # student_id -> Student
+        # in-memory indexes (a store has its own)
+        self._by_name = sorted_list_type()() if store is None else None   # (name.casefold(), student_id)
+        self._orders = {}              # column -> sorted list of _sort_key()s
+        self._stats = {column: RunningStats() for column in STAT_COLUMNS}
+
+    @property
+    def students(self):
+        if self.store is not None:
+            return self.store.students()
+        return self._by_id.values()
+
+    def __len__(self):
+        if self.store is not None:
+            return len(self.store)
+        return len(self._by_id)
+
+    def __contains__(self, student_id):
+        if self.store is not None:
+            return student_id in self.store
+        return student_id in self._by_id
+
+    def add_student(self, student):
+        if self.store is not None:
+            self.store.add(student)
+            return
+        if student.student_id in self._by_id:
+            raise ValueError(f"ID already used: {student.student_id}")
+        self._by_id[student.student_id] = student
+        self._by_name.add((student.name.casefold(), student.student_id))
+        for column, order in self._orders.items():
+            order.add(self._sort_key(column, student))
+        self._count_marks(student, RunningStats.add)
+
+    def get(self, student_id):
+        """Student with this ID, or None. O(1) in memory, one index lookup on disk."""
+        if self.store is not None:
+            return self.store.get(student_id)
+        return self._by_id.get(student_id)
+
+    def update_student(self, student_id, name=None, marks=None):
+        if self.store is not None:
+            return self.store.update(student_id, name, marks)
+        student = self._by_id[student_id]
+        if name is not None and name != student.name:
+            self._by_name.remove((student.name.casefold(), student_id))
+            student.name = name
+            self._by_name.add((name.casefold(), student_id))
+        if marks is not None:
+            resorted = [c for c in self._orders if c != "student_id"]
+            for column in resorted:
+                self._orders[column].remove(self._sort_key(column, student))
+            self._count_marks(student, RunningStats.remove)
+            try:
+                student.marks = marks
+            finally:
+                for column in resorted:
+                    self._orders[column].add(self._sort_key(column, student))
+                self._count_marks(student, RunningStats.add)
+        return student
+
+    def delete_student(self, student_id):
+        if self.store is not None:
+            return self.store.delete(student_id)
+        student = self._by_id.pop(student_id)
+        self._by_name.remove((student.name.casefold(), student_id))
+        for column, order in self._orders.items():
+            order.remove(self._sort_key(column, student))
+        self._count_marks(student, RunningStats.remove)
+        return student
+
+    def _count_marks(self, student, op):
+        stats = self._stats
+        for sub in DEFAULT_SUBJECTS:
+            op(stats[sub], student.mark(sub))
+        op(stats["total"], student.total_marks())
+
+    @staticmethod
+    def _sort_key(column, student):
+        if column == "student_id":
+            return student.student_id
+        if column == "total":
+            return (student.total_marks(), student.student_id)
+        return (student.mark(column), student.student_id)
+
+    def _order(self, column):
+        """Sorted index for column: built on first use, then kept in step."""
+        if column == "name":
+            return self._by_name
+        order = self._orders.get(column)
+        if order is None:
+            if column not in SORT_COLUMNS:
+                raise ValueError(f"Cannot sort by {column!r}")
+            order = sorted_list_type()(self._sort_key(column, s) for s in self._by_id.values())
+            self._orders[column] = order
+        return order
+
+    def page(self, column="student_id", start=0, count=50, descending=False):
+        """
+        The students at positions start .. start+count-1 when sorted by column
+        (one of SORT_COLUMNS). Positions are found on the column's index, so a
+        page costs O(log n + count) wherever it is.
+        """
+        if self.store is not None:
+            return self.store.page(column, start, count, descending)
+        order = self._order(column)
+        n = len(order)
+        if descending:
+            keys = order.islice(max(n - start - count, 0), max(n - start, 0), reverse=True)
+        else:
+            keys = order.islice(start, start + count)
+        if column == "student_id":
+            return [self._by_id[k] for k in keys]
+        return [self._by_id[k[1]] for k in keys]
+
+    # --- rankings and statistics ---
+    @staticmethod
+    def _stat_column(by):
+        """(column, scale): "average" is the total scaled down by the number of subjects."""
+        if by == "average":
+            return "total", len(DEFAULT_SUBJECTS)
+        if by not in STAT_COLUMNS:
+            raise ValueError(f"No statistics for {by!r} (use a subject, 'total' or 'average')")
+        return by, 1
+
+    def top(self, k=10, by="average"):
+        """The k best students by a subject, total or average, best first. O(log n + k)."""
+        return self.page(self._stat_column(by)[0], 0, k, descending=True)
+
+    def bottom(self, k=10, by="average"):
+        """The k weakest students, weakest first. O(log n + k)."""
+        return self.page(self._stat_column(by)[0], 0, k)
+
+    def _value_counts(self, column):
+        """(value, students with it) pairs of a STAT_COLUMNS column, in value order."""
+        if self.store is not None:
+            return self.store.value_counts(column)
+        return sorted(self._stats[column].counts.items())
+
+    def rank(self, student_id, by="average"):
+        """
+        Standing of one student: rank 1 is the best (equal values share a
+        rank) and percentile is the share of students below plus half of those
+        level with them. O(log n) on the sorted index in memory; on disk it
+        sums the store's histogram, which has one row per distinct value.
+        """
+        column, _ = self._stat_column(by)
+        student = self.get(student_id)
+        if student is None:
+            raise KeyError(student_id)
+        value = student.total_marks() if column == "total" else student.mark(column)
+        if self.store is not None:
+            below = level = count = 0
+            for v, n in self._value_counts(column):
+                count += n
+                below += n if v < value else 0
+                level += n if v == value else 0
+        else:
+            order = self._order(column)
+            count = len(order)
+            below = order.bisect_left((value,))        # keys are (value, student_id)
+            level = order.bisect_left((value + 1,)) - below
+        return Standing(count - below - level + 1, count, 100 * (below + level / 2) / count)
+
+    def stats(self, by):
+        """Count, mean and (population) variance of a subject, total or average. O(1) in memory."""
+        column, scale = self._stat_column(by)
+        if self.store is not None:
+            pairs = self._value_counts(column)
+            n = sum(c for _, c in pairs)
+            total = sum(v * c for v, c in pairs)
+            squares = sum(v * v * c for v, c in pairs)
+        else:
+            st = self._stats[column]
+            n, total, squares = st.count, st.sum, st.squares
+        if not n:
+            return Stats(0, 0.0, 0.0)
+        return Stats(n, total / n / scale, (n * squares - total * total) / (n * n * scale * scale))
+
+    def histogram(self, by, width=10):
+        """
+        {bin start: students} for a subject, total or average, in bins of
+        `width` marks from the bottom of MARK_RANGE (scaled for totals); the
+        top bin also holds the maximum. Empty bins inside the range are included.
+        """
+        column, scale = self._stat_column(by)
+        low, high = MARK_RANGE
+        if column == "total":
+            low, high = low * len(DEFAULT_SUBJECTS) // scale, high * len(DEFAULT_SUBJECTS) // scale
+        last = low + max(high - low - 1, 0) // width * width
+        bins = dict.fromkeys(range(low, last + 1, width), 0)
+        for value, n in self._value_counts(column):
+            value /= scale
+            start = int(low + (value - low) // width * width)
+            if value <= high:
+                start = min(start, last)
+            bins[start] = bins.get(start, 0) + n
+        return dict(sorted(bins.items()))
+
+    def search_name(self, prefix, limit=None):
+        """Students whose name starts with prefix (case-insensitive), in name order."""
+        if self.store is not None:
+            return self.store.search_name(prefix, limit)
+        key = prefix.casefold()
+        found = []
+        for name, student_id in self._by_name.irange((key, "")):
+            if not name.startswith(key) or len(found) == limit:
+                break
+            found.append(self._by_id[student_id])
+        return found
+
+    def show_all(self):
+        for s in self.students:
+            print(f"ID: {s.student_id} | Name: {s.name} | Avg: {s.average()}")
+
+    def rows(self):
+        """(student_id, name, *marks) tuples, marks in DEFAULT_SUBJECTS order."""
+        if self.store is not None:
+            return self.store.rows()
+        return ((s.student_id, s.name, *(s.marks[sub] for sub in DEFAULT_SUBJECTS))
+                for s in self._by_id.values())
+
+    # --- bulk import / export ---
+    def import_file(self, path, batch_size=50_000, max_errors=100, fmt=None):
+        """
+        Stream students from a CSV or JSONL file ("-" for standard input). Every
+        row is validated and its ID checked against the index (and the rest of
+        its batch); bad rows are skipped and reported, good ones added one
+        transaction per batch. Memory is bounded by batch_size, not by the
+        size of the file.
+        """
+        return self.import_records(read_records(path, fmt), batch_size, max_errors)
+
+    def import_records(self, records, batch_size=50_000, max_errors=100):
+        """import_file() for any iterable of (line, values) pairs, as read_records() yields them."""
+        report = ImportReport(max_errors)
+        batch = []
+        with self.store.bulk_load() if self.store is not None else nullcontext():
+            for line, record in records:
+                try:
+                    batch.append((line, parse_record(record)))
+                except ValueError as e:
+                    report.skip(line, e)
+                if len(batch) >= batch_size:
+                    self._import_batch(batch, report)
+                    batch = []
+            if batch:
+                self._import_batch(batch, report)
+        return report
+
+    def _import_batch(self, batch, report):
+        ids = [row[0] for _, row in batch]
+        if self.store is not None:
+            taken = self.store.existing_ids(ids)
+        else:
+            taken = {i for i in ids if i in self._by_id}
+        fresh = []
+        for line, row in batch:
+            if row[0] in taken:
+                report.skip(line, f"ID already used: {row[0]}")
+                continue
+            taken.add(row[0])
+            fresh.append(row)
+        if self.store is not None:
+            with self.store.batch():
+                self.store.insert_rows(fresh)
+        else:
+            for sid, name, *marks in fresh:
+                self.add_student(Student(sid, name, dict(zip(DEFAULT_SUBJECTS, marks))))
+        report.added += len(fresh)
+
+    def export_file(self, path):
+        """Write every student to a CSV or JSONL file, streaming. Returns the count."""
+        return write_records(path, self.rows())
+
+
+# 5️⃣ Storage: SQLite + streaming CSV/JSONL
+RECORD_FIELDS = ("student_id", "name") + DEFAULT_SUBJECTS
+
+
+class StudentStore:
+    """
+    Students on disk in one SQLite table, a column per subject. The primary
+    key is the ID index and name_key (the casefolded name) has its own index
+    for prefix search, so nothing has to be read into memory at startup.
+    Every other sort column gets an index the first time a page is sorted by it.
+    Triggers keep mark_counts (students per mark of each subject and per
+    total) in step, for statistics and ranks without a table scan.
+    Single writes commit on their own; writes inside `with store.batch():`
+    share one transaction.
+    """
+
+    def __init__(self, path, subjects=DEFAULT_SUBJECTS):
+        import sqlite3
+        self.path = str(path)
+        self.subjects = tuple(subjects)
+        self.db = sqlite3.connect(self.path, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA cache_size=-65536")   # 64 MiB: keeps index inserts off the disk
+        marks = ", ".join(f'"{sub}" INTEGER NOT NULL' for sub in self.subjects)
+        self.db.execute(
+            f"CREATE TABLE IF NOT EXISTS students ("
+            f"id TEXT PRIMARY KEY, name TEXT NOT NULL, name_key TEXT NOT NULL, {marks}"
+            f") WITHOUT ROWID")
+        columns = tuple(r[1] for r in self.db.execute("PRAGMA table_info(students)"))[3:]
+        if columns != self.subjects:
+            raise ValueError(f"{self.path} stores subjects {columns}, expected {self.subjects}")
+        total = " + ".join(f'"{sub}"' for sub in self.subjects)
+        self._sort_terms = {"student_id": ("id",), "name": ("name_key", "id"), "total": (f"({total})", "id")}
+        self._sort_terms.update((sub, (f'"{sub}"', "id")) for sub in self.subjects)
+        # sort column -> (index name, indexed columns); the ID needs none.
+        # The total's index also carries the marks so that it covers (total, id).
+        cols = ", ".join(f'"{sub}"' for sub in self.subjects)
+        self._indexes = {"name": ("students_name", "name_key, id"),
+                         "total": ("students_total", f"({total}), id, {cols}")}
+        self._indexes.update((sub, (f"students_mark{i}", f'"{sub}", id')) for i, sub in enumerate(self.subjects))
+        self._built = self._existing_indexes()
+        self._create_index("name")
+        self._count_triggers = {
+            "students_count_insert": f"AFTER INSERT ON students BEGIN {self._bump('NEW', 1)}END",
+            "students_count_delete": f"AFTER DELETE ON students BEGIN {self._bump('OLD', -1)}END",
+            "students_count_update": (f"AFTER UPDATE OF {cols} ON students "
+                                      f"BEGIN {self._bump('OLD', -1)}{self._bump('NEW', 1)}END"),
+        }
+        self._keep_counts()
+        self._select = f"SELECT id, name, {cols} FROM students"
+        self._insert = (f"INSERT INTO students (id, name, name_key, {cols}) "
+                        f"VALUES (?, ?, ?{', ?' * len(self.subjects)})")
+
+    def _existing_indexes(self):
+        names = {r[0] for r in self.db.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'students'")}
+        return {column for column, (name, _) in self._indexes.items() if name in names}
+
+    def _create_index(self, column):
+        if column in self._indexes and column not in self._built:
+            name, columns = self._indexes[column]
+            self.db.execute(f"CREATE INDEX IF NOT EXISTS {name} ON students({columns})")
+            self._built.add(column)
+
+    def _stat_exprs(self, ref=""):
+        """(STAT_COLUMNS name, SQL value) pairs, read from `ref` (NEW/OLD in triggers)."""
+        prefix = f"{ref}." if ref else ""
+        exprs = [(sub, f'{prefix}"{sub}"') for sub in self.subjects]
+        exprs.append(("total", " + ".join(e for _, e in exprs)))
+        return exprs
+
+    def _bump(self, ref, delta):
+        return "".join(f"INSERT INTO mark_counts VALUES ('{column}', {expr}, {delta}) "
+                       f"ON CONFLICT DO UPDATE SET n = n + {delta}; "
+                       for column, expr in self._stat_exprs(ref))
+
+    def _keep_counts(self, rebuild=False):
+        """Create mark_counts and its triggers (filled from the table) unless they are all there."""
+        have = {r[0] for r in self.db.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+        if not rebuild and "mark_counts" in have and have.issuperset(self._count_triggers):
+            return
+        with self.batch():
+            self.db.execute("CREATE TABLE IF NOT EXISTS mark_counts (subject TEXT NOT NULL, mark INTEGER NOT NULL, "
+                            "n INTEGER NOT NULL, PRIMARY KEY (subject, mark)) WITHOUT ROWID")
+            self.db.execute("DELETE FROM mark_counts")
+            for column, expr in self._stat_exprs():
+                self.db.execute(f"INSERT INTO mark_counts SELECT '{column}', {expr}, count(*) FROM students GROUP BY 2")
+            for name, body in self._count_triggers.items():
+                self.db.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+    def __len__(self):
+        return self.db.execute("SELECT count(*) FROM students").fetchone()[0]
+
+    def __contains__(self, student_id):
+        return self.db.execute("SELECT 1 FROM students WHERE id = ?", (student_id,)).fetchone() is not None
+
+    def close(self):
+        self.db.close()
+
+    @contextmanager
+    def batch(self):
+        """One transaction around the block (nested blocks join the outer one)."""
+        if self.db.in_transaction:
+            yield self
+            return
+        self.db.execute("BEGIN")
+        try:
+            yield self
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    @contextmanager
+    def bulk_load(self):
+        """
+        Loading into an empty store: drop the secondary indexes and the
+        mark_counts triggers for the duration, then build each index with one
+        sort and recount the marks with one GROUP BY at the end. Searches still
+        work meanwhile, just by scanning; an interrupted load gets its indexes
+        and counts back the next time the store is opened.
+        """
+        if self.db.execute("SELECT 1 FROM students LIMIT 1").fetchone():
+            yield self
+            return
+        dropped = self._built
+        for column in dropped:
+            self.db.execute(f"DROP INDEX IF EXISTS {self._indexes[column][0]}")
+        self._built = set()
+        for name in self._count_triggers:
+            self.db.execute(f"DROP TRIGGER IF EXISTS {name}")
+        try:
+            yield self
+        finally:
+            for column in sorted(dropped):
+                self._create_index(column)
+            self._keep_counts(rebuild=True)
+
+    def _student(self, row):
+        return Student(row[0], row[1], dict(zip(self.subjects, row[2:])))
+
+    def get(self, student_id):
+        row = self.db.execute(self._select + " WHERE id = ?", (student_id,)).fetchone()
+        return self._student(row) if row else None
+
+    def add(self, student):
+        import sqlite3
+        try:
+            self.insert_rows([(student.student_id, student.name,
+                               *(student.marks[sub] for sub in self.subjects))])
+        except sqlite3.IntegrityError:
+            raise ValueError(f"ID already used: {student.student_id}") from None
+
+    def insert_rows(self, rows):
+        """Insert (student_id, name, *marks) tuples; IDs must be new."""
+        self.db.executemany(self._insert, ((r[0], r[1], r[1].casefold(), *r[2:]) for r in rows))
+
+    def existing_ids(self, ids, chunk=500):
+        """The subset of ids already stored, as a set."""
+        found = set()
+        it = iter(ids)
+        while True:
+            part = list(islice(it, chunk))
+            if not part:
+                return found
+            marks = ", ".join("?" * len(part))
+            found.update(r[0] for r in self.db.execute(f"SELECT id FROM students WHERE id IN ({marks})", part))
+
+    def update(self, student_id, name=None, marks=None):
+        student = self.get(student_id)
+        if student is None:
+            raise KeyError(student_id)
+        with self.batch():
+            if name is not None:
+                self.db.execute("UPDATE students SET name = ?, name_key = ? WHERE id = ?",
+                                (name, name.casefold(), student_id))
+                student.name = name
+            if marks is not None:
+                student.marks = marks   # validates the subjects
+                sets = ", ".join(f'"{sub}" = ?' for sub in self.subjects)
+                self.db.execute(f"UPDATE students SET {sets} WHERE id = ?",
+                                (*(marks[sub] for sub in self.subjects), student_id))
+        return student
+
+    def delete(self, student_id):
+        student = self.get(student_id)
+        if student is None:
+            raise KeyError(student_id)
+        self.db.execute("DELETE FROM students WHERE id = ?", (student_id,))
+        return student
+
+    def rows(self):
+        """All rows as (student_id, name, *marks) tuples in ID order, read as they are used."""
+        return self.db.execute(self._select + " ORDER BY id")
+
+    def students(self):
+        return map(self._student, self.rows())
+
+    def search_name(self, prefix, limit=None):
+        key = prefix.casefold()
+        cur = self.db.execute(
+            self._select + " WHERE name_key >= ? AND name_key < ? ORDER BY name_key, id LIMIT ?",
+            (key, key + "\U0010ffff", -1 if limit is None else limit))
+        return [self._student(r) for r in cur]
+
+    def value_counts(self, column):
+        """(value, students with it) pairs of a STAT_COLUMNS column, in value order."""
+        return self.db.execute("SELECT mark, n FROM mark_counts WHERE subject = ? AND n > 0 ORDER BY mark",
+                               (column,)).fetchall()
+
+    def page(self, column, start, count, descending=False):
+        terms = self._sort_terms.get(column)
+        if terms is None:
+            raise ValueError(f"Cannot sort by {column!r}")
+        self._create_index(column)
+        order = ", ".join(t + (" DESC" if descending else "") for t in terms)
+        # OFFSET walks the (covering) index alone; only the page's rows are read from the table
+        cur = self.db.execute(
+            f"{self._select} JOIN (SELECT id AS pid FROM students ORDER BY {order} LIMIT ? OFFSET ?) "
+            f"ON id = pid ORDER BY {order}", (count, start))
+        return [self._student(r) for r in cur]
+
+
+class ImportReport:
+    """Outcome of an import: rows added, rows skipped and the first errors."""
+
+    def __init__(self, max_errors=100):
+        self.added = 0
+        self.skipped = 0
+        self.errors = []   # (line, message), at most max_errors of them
+        self.max_errors = max_errors
+
+    def skip(self, line, error):
+        self.skipped += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line, str(error)))
+
+    def __str__(self):
+        lines = [f"Added {self.added}, skipped {self.skipped}"]
+        lines += [f"  line {line}: {msg}" for line, msg in sorted(self.errors)]
+        if self.skipped > len(self.errors):
+            lines.append(f"  ... {self.skipped - len(self.errors)} more")
+        return "\n".join(lines)
+
+
+def file_format(path):
+    suffix = os.path.splitext(str(path))[1].lower()
+    if suffix == ".csv":
+        return "csv"
+    if suffix in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Unsupported file type {suffix or path!r} (use .csv or .jsonl)")
+
+
+def read_records(path, fmt=None):
+    """
+    Yield (line number, values in RECORD_FIELDS order) from a CSV file with a
+    header or a JSONL file, one record at a time; "-" reads standard input
+    (JSONL unless fmt is "csv"). A line that cannot be read yields a message
+    string instead, for parse_record to report.
+    """
+    import csv
+    import json
+    if path == "-":
+        fmt = fmt or "jsonl"
+        source = nullcontext(sys.stdin)
+    else:
+        fmt = fmt or file_format(path)
+        source = open(path, newline="", encoding="utf-8-sig")
+    with source as f:
+        if fmt == "csv":
+            reader = csv.reader(f)
+            header = next(reader, [])
+            missing = [k for k in RECORD_FIELDS if k not in header]
+            if missing:
+                raise ValueError(f"{path}: missing column(s) {', '.join(missing)}")
+            pick = itemgetter(*(header.index(k) for k in RECORD_FIELDS))
+            for row in reader:
+                try:
+                    yield reader.line_num, pick(row)
+                except IndexError:
+                    if row:   # blank lines are skipped
+                        yield reader.line_num, f"expected {len(header)} columns, got {len(row)}"
+            return
+        for line, text in enumerate(f, 1):
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError as e:
+                yield line, f"bad JSON: {e}"
+                continue
+            if isinstance(record, dict):
+                yield line, tuple(map(record.get, RECORD_FIELDS))
+            else:
+                yield line, "expected a JSON object"
+
+
+_MARK_TYPES = frozenset((int, str))
+
+
+def parse_record(values):
+    """(student_id, name, *marks) from one record read by read_records; ValueError says what is wrong."""
+    if isinstance(values, str):
+        raise ValueError(values)
+    sid, name, *marks = values
+    sid = "" if sid is None else str(sid).strip()
+    name = "" if name is None else str(name).strip()
+    if not sid:
+        raise ValueError("missing student_id")
+    if not name:
+        raise ValueError("missing name")
+    low, high = MARK_RANGE
+    # int("85") from CSV or 85 from JSON; not 85.5, True or None
+    try:
+        if not _MARK_TYPES.issuperset(map(type, marks)):
+            raise TypeError
+        ints = tuple(map(int, marks))
+        if low <= min(ints) and max(ints) <= high:
+            return (sid, name, *ints)
+    except (TypeError, ValueError):
+        pass
+    # some mark is wrong: say which
+    for sub, value in zip(DEFAULT_SUBJECTS, marks):
+        try:
+            mark = int(value) if type(value) in (int, str) else None
+        except ValueError:
+            mark = None
+        if mark is None:
+            raise ValueError(f"{sub}: not a whole number: {value!r}")
+        if not low <= mark <= high:
+            raise ValueError(f"{sub}: {mark} outside {low}-{high}")
+    raise ValueError(f"expected {len(DEFAULT_SUBJECTS)} marks")
+
+
+def write_records(path, rows):
+    """Write (student_id, name, *marks) rows to CSV or JSONL. Returns the count."""
+    import csv
+    import json
+    fmt = file_format(path)
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(RECORD_FIELDS)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            encode = json.JSONEncoder(ensure_ascii=False).encode
+            for row in rows:
+                f.write(encode(dict(zip(RECORD_FIELDS, row))) + "\n")
+                count += 1
+    return count
+
+
+# 6️⃣ Batch CLI (no prompts: for scripts, containers and load tests)
+def student_record(student, standing=None):
+    record = {"student_id": student.student_id, "name": student.name, **student.marks,
+              "total": student.total_marks(), "average": round(student.average(), 2)}
+    if standing is not None:
+        record.update(rank=standing.rank, of=standing.count, percentile=round(standing.percentile, 2))
+    return record
+
+
+def report_record(source, report):
+    return {"source": source, "added": report.added, "skipped": report.skipped,
+            "errors": [{"line": line, "error": msg} for line, msg in sorted(report.errors)]}
+
+
+def cmd_add(manager, args, emit):
+    if args.fields == ["-"]:
+        report = manager.import_file("-", args.batch_size, fmt=args.format)
+    elif len(args.fields) == len(RECORD_FIELDS):
+        report = manager.import_records([("args", tuple(args.fields))])
+    else:
+        emit({"error": f"add takes {' '.join(RECORD_FIELDS)} (or - to read students from stdin)"})
+        return 2
+    emit(report_record("stdin" if args.fields == ["-"] else "args", report))
+    return 1 if report.skipped else 0
+
+
+def cmd_import(manager, args, emit):
+    status = 0
+    for path in args.files:
+        try:
+            report = manager.import_file(path, args.batch_size, fmt=args.format)
+        except (OSError, ValueError) as e:
+            emit({"source": path, "error": str(e)})
+            status = 1
+            continue
+        emit(report_record(path, report))
+        if report.skipped:
+            status = 1
+    return status
+
+
+def cmd_query(manager, args, emit):
+    if args.id:
+        ids = (line.strip() for line in sys.stdin) if args.id == ["-"] else args.id
+        status = 0
+        for student_id in ids:
+            student = manager.get(student_id) if student_id else None
+            if student is None:
+                if student_id:
+                    emit({"student_id": student_id, "error": "not found"})
+                    status = 1
+                continue
+            emit(student_record(student, manager.rank(student_id, args.by) if args.rank else None))
+        return status
+    if args.name is not None:
+        found = manager.search_name(args.name, args.limit)
+    elif args.top is not None:
+        found = manager.top(args.top, args.by)
+    else:
+        found = manager.bottom(args.bottom, args.by)
+    for student in found:
+        emit(student_record(student, manager.rank(student.student_id, args.by) if args.rank else None))
+    return 0
+
+
+def cmd_stats(manager, args, emit):
+    for by in args.by or DEFAULT_SUBJECTS + ("average",):
+        st = manager.stats(by)
+        record = {"by": by, "count": st.count, "mean": st.mean, "variance": st.variance}
+        if args.histogram:
+            record["histogram"] = manager.histogram(by, args.histogram)
+        emit(record)
+    return 0
+
+
+COMMANDS = {"add": cmd_add, "import": cmd_import, "query": cmd_query, "stats": cmd_stats}
+
+
+def parse_args(argv=None):
+    import argparse
+    columns = DEFAULT_SUBJECTS + ("total", "average")
+    p = argparse.ArgumentParser(description="Student Management batch commands on a SQLite store "
+                                            "(one JSON object per output line)")
+    p.add_argument("--db", default="students.db", help="SQLite file (created if missing)")
+    p.add_argument("--batch-size", type=int, default=50_000, help="Rows per transaction for add/import")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    a = sub.add_parser("add", help="Add one student, or a stream of them from stdin")
+    a.add_argument("fields", nargs="+", metavar="FIELD",
+                   help=f"{' '.join(RECORD_FIELDS)}, or - to read records from stdin")
+    a.add_argument("--format", choices=("jsonl", "csv"), help="Format of stdin (default jsonl)")
+
+    i = sub.add_parser("import", help="Import CSV/JSONL files")
+    i.add_argument("files", nargs="+", metavar="FILE", help=".csv or .jsonl file, or - for stdin")
+    i.add_argument("--format", choices=("jsonl", "csv"), help="Override the format given by the suffix")
+
+    q = sub.add_parser("query", help="Look students up or rank them")
+    which = q.add_mutually_exclusive_group(required=True)
+    which.add_argument("--id", nargs="+", metavar="ID", help="These IDs (- reads one per line from stdin)")
+    which.add_argument("--name", metavar="PREFIX", help="Names starting with PREFIX")
+    which.add_argument("--top", type=int, metavar="K", help="The K best by --by")
+    which.add_argument("--bottom", type=int, metavar="K", help="The K weakest by --by")
+    q.add_argument("--by", choices=columns, default="average", help="Ranking column (default average)")
+    q.add_argument("--rank", action="store_true", help="Add each student's rank and percentile by --by")
+    q.add_argument("--limit", type=int, default=50, help="Most results for --name")
+
+    st = sub.add_parser("stats", help="Mean, variance and histograms")
+    st.add_argument("--by", nargs="+", choices=columns, help="Columns (default: every subject and the average)")
+    st.add_argument("--histogram", type=int, metavar="WIDTH", help="Add a histogram with bins this wide")
+    args = p.parse_args(argv)
+    if args.command == "query":
+        for flag in ("top", "bottom", "limit"):
+            if (getattr(args, flag) or 0) < 0:
+                q.error(f"--{flag} cannot be negative")
+    elif args.command == "stats" and args.histogram is not None and args.histogram < 1:
+        st.error("--histogram WIDTH must be at least 1")
+    return args
+
+
+def main(argv=None):
+    import json
+    args = parse_args(argv)
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    out = sys.stdout
+
+    def emit(record):
+        out.write(encode(record) + "\n")
+
+    store = StudentStore(args.db)
+    try:
+        return COMMANDS[args.command](StudentManager(store), args, emit)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
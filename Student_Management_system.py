@@ -1,70 +1,41 @@
 # ---------------------------------------------
 # STUDENT MANAGEMENT SYSTEM (OOP + ALL CONCEPTS)
 # ---------------------------------------------
+# The interactive menu and the Tk GUI. Students, the manager, storage,
+# rankings and the batch CLI are in Student_Management_core.py, which
+# imports without tkinter or a display.
+#   python Student_Management_system.py [students.db]         # GUI
+#   python Student_Management_system.py --cli [students.db]   # text menu
+import sys
 import tkinter as tk
-from tkinter import messagebox, ttk
-
-# 1️⃣ Tuple (fixed data)
-DEFAULT_SUBJECTS = ("Math", "Science", "English")
-
-# 2️⃣ Using Set to store unique IDs
-used_ids = set()
-
-
-# 3️⃣ OOP Class
-class Student:
-    def __init__(self, student_id, name, marks_dict):
-        self.student_id = student_id
-        self.name = name
-        self.marks = marks_dict   # Dictionary of subject → marks
-
-    def total_marks(self):
-        return sum(self.marks.values())
-
-    def average(self):
-        return self.total_marks() / len(self.marks)
-
-
-# 4️⃣ Student Manager
-class StudentManager:
-    def __init__(self):
-        self.students = []  # list of Student objects
-
-    def add_student(self, student):
-        self.students.append(student)
-
-    def search_recursive(self, student_list, target_id, index=0):
-        if index == len(student_list):
-            return None
-        if student_list[index].student_id == target_id:
-            return student_list[index]
-        return self.search_recursive(student_list, target_id, index + 1)
-
-    def show_all(self):
-        for s in self.students:
-            print(f"ID: {s.student_id} | Name: {s.name} | Avg: {s.average()}")
+from tkinter import filedialog, messagebox, ttk
 
+from Student_Management_core import DEFAULT_SUBJECTS, Student, StudentManager, StudentStore
 
 # ORIGINAL MAIN PROGRAM (CLI)
-def main():
-    manager = StudentManager()
+def main(manager=None):
+    if manager is None:
+        manager = StudentManager()
 
     while True:
         print("\n===== STUDENT MANAGEMENT SYSTEM =====")
         print("1. Add Student")
         print("2. Search Student by ID")
         print("3. Show All Students")
-        print("4. Exit")
+        print("4. Search Students by Name")
+        print("5. Import from CSV/JSONL")
+        print("6. Export to CSV/JSONL")
+        print("7. Rankings & Statistics")
+        print("8. Exit")
 
         choice = input("Enter choice: ")
 
         if choice == "1":
             student_id = input("Enter Student ID: ")
 
-            if student_id in used_ids:
+            if student_id in manager:
                 print("❌ ID already used!")
                 continue
-            used_ids.add(student_id)
 
             name = input("Enter Student Name: ")
 
@@ -78,7 +49,7 @@ def main():
 
         elif choice == "2":
             search_id = input("Enter ID to search: ")
-            result = manager.search_recursive(manager.students, search_id)
+            result = manager.get(search_id)
 
             if result:
                 print("\n🎉 Student Found!")
@@ -87,6 +58,8 @@ def main():
                 print(f"Marks: {result.marks}")
                 print(f"Total: {result.total_marks()}")
                 print(f"Average: {result.average()}")
+                standing = manager.rank(result.student_id)
+                print(f"Rank: {standing.rank} of {standing.count} ({standing.percentile:.1f} percentile)")
             else:
                 print("❌ Student not found")
 
@@ -94,6 +67,41 @@ def main():
             manager.show_all()
 
         elif choice == "4":
+            prefix = input("Enter name (or start of name): ")
+            found = manager.search_name(prefix, limit=50)
+            for s in found:
+                print(f"ID: {s.student_id} | Name: {s.name} | Avg: {s.average()}")
+            if not found:
+                print("❌ No student with that name")
+
+        elif choice == "5":
+            path = input("File to import (.csv or .jsonl): ")
+            try:
+                print(manager.import_file(path))
+            except (OSError, ValueError) as e:
+                print(f"❌ Import failed: {e}")
+
+        elif choice == "6":
+            path = input("File to write (.csv or .jsonl): ")
+            try:
+                print(f"✔ Exported {manager.export_file(path)} students")
+            except (OSError, ValueError) as e:
+                print(f"❌ Export failed: {e}")
+
+        elif choice == "7":
+            if not len(manager):
+                print("❌ No students yet")
+                continue
+            print("\n🏆 Top 10 by average:")
+            for i, s in enumerate(manager.top(10), 1):
+                print(f"{i:>2}. {s.student_id} | {s.name} | Avg: {round(s.average(), 2)}")
+            for subject in DEFAULT_SUBJECTS:
+                st = manager.stats(subject)
+                bars = "  ".join(f"{start}+: {n}" for start, n in manager.histogram(subject).items())
+                print(f"\n{subject}: mean {st.mean:.2f}, std dev {st.variance ** 0.5:.2f}")
+                print(f"  {bars}")
+
+        elif choice == "8":
             print("Goodbye!")
             break
 
@@ -131,11 +139,9 @@ def gui_add_student():
         sid = id_entry.get()
         name = name_entry.get()
 
-        if sid in used_ids:
+        if sid in manager:
             messagebox.showerror("Error", "ID already used")
             return
-        
-        used_ids.add(sid)
 
         marks = {}
         try:
@@ -158,65 +164,233 @@ def gui_search_student():
     win.title("Search Student")
     win.geometry("300x200")
 
-    tk.Label(win, text="Enter Student ID").pack()
+    tk.Label(win, text="Enter Student ID or Name").pack()
     id_entry = tk.Entry(win)
     id_entry.pack()
 
     def search():
         sid = id_entry.get()
-        result = manager.search_recursive(manager.students, sid)
+        result = manager.get(sid)
 
         if result:
+            standing = manager.rank(result.student_id)
             msg = (
                 f"ID: {result.student_id}\n"
                 f"Name: {result.name}\n"
                 f"Marks: {result.marks}\n"
                 f"Total: {result.total_marks()}\n"
-                f"Average: {result.average()}"
+                f"Average: {result.average()}\n"
+                f"Rank: {standing.rank} of {standing.count} ({standing.percentile:.1f} percentile)"
             )
             messagebox.showinfo("Found", msg)
+            return
+        # not an ID: try it as the start of a name
+        found = manager.search_name(sid, limit=20) if sid else []
+        if found:
+            msg = "\n".join(f"{s.student_id}: {s.name} (avg {round(s.average(), 2)})" for s in found)
+            messagebox.showinfo("Found by name", msg)
         else:
             messagebox.showerror("Not Found", "Student not found")
 
     tk.Button(win, text="Search", command=search).pack(pady=10)
 
 
+# (column, heading) pairs; subject columns come from DEFAULT_SUBJECTS
+TABLE_COLUMNS = (("student_id", "ID"), ("name", "Name"),
+                 *((sub, sub) for sub in DEFAULT_SUBJECTS),
+                 ("total", "Total"), ("average", "Average"))
+
+
+class PagedRows:
+    """
+    Display rows of the manager in one sort order, fetched a page at a time
+    through StudentManager.page() and kept in a small LRU cache, so only the
+    pages being looked at are ever built.
+    """
+
+    def __init__(self, manager, page_size=200, max_pages=8):
+        self.manager = manager
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.column = "student_id"
+        self.descending = False
+        self.refresh()
+
+    def refresh(self):
+        """Forget cached pages and recount (the students may have changed)."""
+        self._pages = {}
+        self.total = len(self.manager)
+
+    def sort(self, column, descending=False):
+        self.column, self.descending = column, descending
+        self._pages = {}
+
+    @staticmethod
+    def values(s):
+        return (s.student_id, s.name, *(s.mark(sub) for sub in DEFAULT_SUBJECTS),
+                s.total_marks(), round(s.average(), 2))
+
+    def _page(self, n):
+        rows = self._pages.pop(n, None)
+        if rows is None:
+            students = self.manager.page(self.column, n * self.page_size, self.page_size, self.descending)
+            rows = [self.values(s) for s in students]
+        self._pages[n] = rows   # most recently used last
+        if len(self._pages) > self.max_pages:
+            del self._pages[next(iter(self._pages))]
+        return rows
+
+    def rows(self, first, last):
+        """Rows at positions first .. last-1."""
+        size = self.page_size
+        found = []
+        for n in range(first // size, (last - 1) // size + 1 if last > first else 0):
+            found.extend(self._page(n)[max(first - n * size, 0):last - n * size])
+        return found
+
+
+class StudentTable(ttk.Frame):
+    """
+    Treeview holding only the rows on screen. The scrollbar is driven by hand
+    over the full row count; scrolling or resizing asks PagedRows for the new
+    window, and clicking a heading re-sorts on the manager's index for that
+    column instead of re-inserting rows.
+    """
+
+    def __init__(self, master, manager):
+        super().__init__(master)
+        self.rows = PagedRows(manager)
+        self.first = 0
+        self.visible = 20   # until the first row can be measured
+
+        self.table = ttk.Treeview(self, columns=[c for c, _ in TABLE_COLUMNS],
+                                  show="headings", selectmode="browse")
+        for col, title in TABLE_COLUMNS:
+            self.table.heading(col, text=title, command=lambda c=col: self.sort_by(c))
+            self.table.column(col, width=140 if col == "name" else 70,
+                              anchor=tk.W if col in ("student_id", "name") else tk.E)
+        self.scroll = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scroll.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.table.bind("<Configure>", lambda e: self.render())
+        self.table.bind("<MouseWheel>", lambda e: self._scroll("scroll", -3 if e.delta > 0 else 3, "units"))
+        self.table.bind("<Button-4>", lambda e: self._scroll("scroll", -3, "units"))   # X11 wheel
+        self.table.bind("<Button-5>", lambda e: self._scroll("scroll", 3, "units"))
+        self.table.bind("<Prior>", lambda e: self._scroll("scroll", -1, "pages"))
+        self.table.bind("<Next>", lambda e: self._scroll("scroll", 1, "pages"))
+        self.table.bind("<Home>", lambda e: self._scroll("moveto", 0))
+        self.table.bind("<End>", lambda e: self._scroll("moveto", 1))
+        self.render()
+
+    def refresh(self):
+        self.rows.refresh()
+        self.render()
+
+    def sort_by(self, column):
+        key = "total" if column == "average" else column
+        descending = key == self.rows.column and not self.rows.descending
+        self.rows.sort(key, descending)
+        for col, title in TABLE_COLUMNS:
+            shown = "total" if col == "average" else col
+            self.table.heading(col, text=title + ((" ▼" if descending else " ▲") if shown == key else ""))
+        self.first = 0
+        self.render()
+
+    def yview(self, *args):
+        """Scrollbar protocol: ("moveto", fraction) or ("scroll", n, "units"|"pages")."""
+        if args[0] == "moveto":
+            self.first = int(float(args[1]) * self.rows.total)
+        else:
+            step = self.visible if args[2] == "pages" else 1
+            self.first += int(args[1]) * step
+        self.render()
+
+    def _scroll(self, *args):
+        self.yview(*args)
+        return "break"   # the Treeview has nothing of its own to scroll
+
+    def _visible_rows(self):
+        items = self.table.get_children()
+        box = self.table.bbox(items[0]) if items else ""
+        if not box:
+            return self.visible
+        return max(1, (self.table.winfo_height() - box[1]) // box[3])
+
+    def render(self):
+        self.visible = self._visible_rows()
+        total = self.rows.total
+        self.first = max(0, min(self.first, total - self.visible))
+        last = min(self.first + self.visible, total)
+        self.table.delete(*self.table.get_children())
+        for values in self.rows.rows(self.first, last):
+            self.table.insert("", tk.END, values=values)
+        if total:
+            self.scroll.set(self.first / total, last / total)
+        else:
+            self.scroll.set(0, 1)
+
+
 def gui_show_all():
     win = tk.Toplevel(root)
     win.title("All Students")
-    win.geometry("500x300")
-
-    table = ttk.Treeview(win, columns=("ID","Name","Math","Science","English","Total","Average"), show="headings")
-
-    for col in ("ID","Name","Math","Science","English","Total","Average"):
-        table.heading(col, text=col)
-        table.column(col, width=70)
-
-    for s in manager.students:
-        table.insert("", tk.END, values=(
-            s.student_id, 
-            s.name, 
-            s.marks["Math"],
-            s.marks["Science"],
-            s.marks["English"],
-            s.total_marks(),
-            round(s.average(), 2)
-        ))
+    win.geometry("640x400")
 
+    table = StudentTable(win, manager)
     table.pack(fill=tk.BOTH, expand=True)
+    # students may have been added in another window meanwhile
+    win.bind("<FocusIn>", lambda e: table.refresh() if e.widget is win else None)
+
+
+def gui_import():
+    path = filedialog.askopenfilename(filetypes=[("Students", "*.csv *.jsonl *.ndjson")])
+    if not path:
+        return
+    try:
+        report = manager.import_file(path)
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Import failed", str(e))
+        return
+    messagebox.showinfo("Import", str(report))
+
+
+def gui_export():
+    path = filedialog.asksaveasfilename(defaultextension=".csv",
+                                        filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")])
+    if not path:
+        return
+    try:
+        count = manager.export_file(path)
+    except (OSError, ValueError) as e:
+        messagebox.showerror("Export failed", str(e))
+        return
+    messagebox.showinfo("Export", f"Exported {count} students")
 
 
 # ---- MAIN GUI WINDOW ----
-root = tk.Tk()
-root.title("Student Management System (GUI)")
-root.geometry("300x300")
-
-tk.Label(root, text="Student Management System", font=("Arial", 14)).pack(pady=10)
-
-tk.Button(root, text="Add Student", width=20, command=gui_add_student).pack(pady=5)
-tk.Button(root, text="Search Student", width=20, command=gui_search_student).pack(pady=5)
-tk.Button(root, text="Show All Students", width=20, command=gui_show_all).pack(pady=5)
-
-tk.Button(root, text="Exit", width=20, command=root.quit).pack(pady=10)
-
-root.mainloop()
+# (only when run as a script; --cli runs the text menu instead)
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    use_cli = "--cli" in argv
+    paths = [a for a in argv if a != "--cli"]
+    # students are kept in a SQLite file (default students.db, or the argument)
+    manager = StudentManager(StudentStore(paths[0] if paths else "students.db"))
+    if use_cli:
+        main(manager)
+        sys.exit()
+
+    root = tk.Tk()
+    root.title("Student Management System (GUI)")
+    root.geometry("300x380")
+
+    tk.Label(root, text="Student Management System", font=("Arial", 14)).pack(pady=10)
+
+    tk.Button(root, text="Add Student", width=20, command=gui_add_student).pack(pady=5)
+    tk.Button(root, text="Search Student", width=20, command=gui_search_student).pack(pady=5)
+    tk.Button(root, text="Show All Students", width=20, command=gui_show_all).pack(pady=5)
+    tk.Button(root, text="Import...", width=20, command=gui_import).pack(pady=5)
+    tk.Button(root, text="Export...", width=20, command=gui_export).pack(pady=5)
+
+    tk.Button(root, text="Exit", width=20, command=root.quit).pack(pady=10)
+
+    root.mainloop()
@@ -5,83 +5,821 @@ File Renamer & Organizer (MVP)
 - Apply mode
 - Rule config via YAML or command-line flags
 - Action logging for undo
-- Optional folder watching (requires watchdog)
+- Optional folder watching (watchdog, or built-in inotify on Linux)
+- Scheduled passes in one long-running process (--daemon)
 
 Usage examples:
   python file_organizer.py --config rules.yaml --preview
   python file_organizer.py --config rules.yaml --apply
   python file_organizer.py --src /path/to/folder --organize-by extension --apply
+  python file_organizer.py --src ~/Downloads ~/Desktop --config rules.yaml --workers 4 --apply
+  python file_organizer.py --config rules.yaml --preview --plan-out plan.jsonl
+  python file_organizer.py --apply --plan plan.jsonl
+  python -m file_organizer --config rules.yaml --apply --daemon --interval 600
+
+Startup target: under 100 ms from exec to the first scanned file with an
+unchanged config (about 85 ms measured on Linux, CPython 3.11, where the
+interpreter alone takes about 20 ms). To stay there, use `python -m
+file_organizer` from cron so the module's bytecode cache is used (a script
+path is recompiled on every run). Parsed configs are cached under LOG_DIR,
+and heavy or optional modules load only when a feature needs them.
+Check with: python -X importtime -m file_organizer --help
 """
 
 import argparse
+import errno
+import hashlib
+import os
+import queue
+import re
+import select
 import shutil
+import stat
+import string
+import struct
 import sys
+import threading
 import time
-import yaml
 import json
-from pathlib import Path
+from collections import deque, namedtuple
+from pathlib import Path, PurePosixPath
 from datetime import datetime
-import logging
-
-# Try import optional libs
-try:
-    from watchdog.observers import Observer
-    from watchdog.events import FileSystemEventHandler
-    WATCHDOG_AVAILABLE = True
-except Exception:
-    WATCHDOG_AVAILABLE = False
 
+# Optional / heavier modules (yaml, watchdog, sqlite3, multiprocessing,
+# concurrent.futures) are imported where they are used, so a run only
+# pays for what it needs. Nothing is written at import time.
 LOG_DIR = Path(".file_organizer_logs")
-LOG_DIR.mkdir(exist_ok=True)
+_LOG_DIR_READY = False
 
 # -------------------------
 # Helpers
 # -------------------------
+def log_dir():
+    """LOG_DIR, created on first use."""
+    global _LOG_DIR_READY
+    if not _LOG_DIR_READY:
+        LOG_DIR.mkdir(exist_ok=True)
+        _LOG_DIR_READY = True
+    return LOG_DIR
+
 def timestamp():
     return datetime.now().strftime("%Y%m%d_%H%M%S")
 
-def safe_move(src: Path, dest: Path):
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    # if dest exists, add suffix
-    if dest.exists():
-        base = dest.stem
-        ext = dest.suffix
-        i = 1
+# -------------------------
+# Instrumentation (--stats / --metrics-file)
+# -------------------------
+STATS = None
+
+# module functions / methods timed when stats are enabled
+TIMED_FUNCTIONS = ("organize_target", "rename_pattern", "safe_move", "write_log")
+TIMED_METHODS = (("Journal", "plan"), ("Journal", "done"))
+
+class Stats:
+    """
+    Time and call counters per phase, plus hits and match cost per rule.
+    Only created by enable_stats(); with STATS = None the hot paths pay a
+    single `is None` check.
+    """
+
+    def __init__(self):
+        self.phases = {}     # phase -> [calls, seconds]
+        self.rules = {}      # rule index (None = no match) -> [hits, match seconds]
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds, calls=1):
+        with self._lock:
+            slot = self.phases.get(phase)
+            if slot is None:
+                slot = self.phases[phase] = [0, 0.0]
+            slot[0] += calls
+            slot[1] += seconds
+
+    def rule(self, idx, seconds):
+        slot = self.rules.get(idx)
+        if slot is None:
+            slot = self.rules[idx] = [0, 0.0]
+        slot[0] += 1
+        slot[1] += seconds
+
+    def wrap(self, fn, phase):
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(phase, time.perf_counter() - t0)
+        timed.__wrapped__ = fn
+        return timed
+
+    def timed_iter(self, it, phase):
+        """Yield from `it`, charging the time spent producing items to `phase`."""
+        it = iter(it)
+        perf = time.perf_counter
         while True:
-            new = dest.with_name(f"{base}_{i}{ext}")
-            if not new.exists():
-                dest = new
+            t0 = perf()
+            try:
+                item = next(it)
+            except StopIteration:
+                self.add(phase, perf() - t0, calls=0)
+                return
+            self.add(phase, perf() - t0)
+            yield item
+
+    def report(self, rules=()):
+        lines = [f"{'phase':<20}{'calls':>12}{'seconds':>12}{'us/call':>12}"]
+        for phase, (calls, secs) in sorted(self.phases.items(), key=lambda kv: -kv[1][1]):
+            per = secs / calls * 1e6 if calls else 0.0
+            lines.append(f"{phase:<20}{calls:>12}{secs:>12.3f}{per:>12.1f}")
+        lines.append("")
+        lines.append(f"{'rule':<40}{'hits':>12}{'match s':>12}")
+        for idx, (hits, secs) in sorted(self.rules.items(), key=lambda kv: -kv[1][0]):
+            lines.append(f"{rule_label(idx, rules):<40}{hits:>12}{secs:>12.3f}")
+        return "\n".join(lines)
+
+    def write_prometheus(self, path, rules=()):
+        """Write metrics in Prometheus text format (atomically, for the node exporter)."""
+        def esc(v):
+            return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+        out = [
+            "# HELP file_organizer_phase_seconds_total Time spent per phase.",
+            "# TYPE file_organizer_phase_seconds_total counter",
+        ]
+        out += [f'file_organizer_phase_seconds_total{{phase="{esc(k)}"}} {v[1]:.6f}'
+                for k, v in sorted(self.phases.items())]
+        out += [
+            "# HELP file_organizer_phase_calls_total Calls per phase.",
+            "# TYPE file_organizer_phase_calls_total counter",
+        ]
+        out += [f'file_organizer_phase_calls_total{{phase="{esc(k)}"}} {v[0]}'
+                for k, v in sorted(self.phases.items())]
+        out += [
+            "# HELP file_organizer_rule_hits_total Files matched per rule.",
+            "# TYPE file_organizer_rule_hits_total counter",
+        ]
+        out += [f'file_organizer_rule_hits_total{{rule="{esc(rule_label(i, rules))}"}} {v[0]}'
+                for i, v in sorted(self.rules.items(), key=lambda kv: str(kv[0]))]
+        out += [
+            "# HELP file_organizer_rule_match_seconds_total Time spent matching, per resulting rule.",
+            "# TYPE file_organizer_rule_match_seconds_total counter",
+        ]
+        out += [f'file_organizer_rule_match_seconds_total{{rule="{esc(rule_label(i, rules))}"}} {v[1]:.6f}'
+                for i, v in sorted(self.rules.items(), key=lambda kv: str(kv[0]))]
+        out += [
+            "# HELP file_organizer_last_run_timestamp_seconds Start of the last run.",
+            "# TYPE file_organizer_last_run_timestamp_seconds gauge",
+            f"file_organizer_last_run_timestamp_seconds {self.started:.0f}",
+        ]
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(out) + "\n")
+        os.replace(tmp, path)
+
+def describe_rule(r, idx=None):
+    what = r.get("target_folder") or r.get("organize_by") or r.get("pattern") or ""
+    text = f"{r.get('action', 'move')} {what}".strip()
+    return f"#{idx} {text}" if idx is not None else text
+
+def rule_label(idx, rules=()):
+    if idx is None:
+        return "no match"
+    if isinstance(idx, int) and idx < len(rules):
+        return describe_rule(rules[idx], idx)
+    return str(idx)
+
+def enable_stats():
+    """Turn on instrumentation: wraps the timed functions and returns the Stats."""
+    global STATS
+    if STATS is not None:
+        return STATS
+    STATS = Stats()
+    g = globals()
+    for name in TIMED_FUNCTIONS:
+        g[name] = STATS.wrap(g[name], name)
+    for cls, meth in TIMED_METHODS:
+        klass = g[cls]
+        setattr(klass, meth, STATS.wrap(getattr(klass, meth), f"{cls.lower()}.{meth}"))
+    return STATS
+
+# -------------------------
+# Output (--output)
+# -------------------------
+OUTPUT_MODES = ("human", "summary", "ndjson", "quiet")
+
+class Reporter:
+    """
+    Per-file output of a run.
+      human   - one line per action ([MATCH] ..., [DUP] ..., [ERROR] ...)
+      summary - only counts per rule and destination folder, at the end
+      ndjson  - one JSON object per line on stdout, other messages on stderr
+      quiet   - errors only
+    Lines are written in blocks of up to `buffer_size` characters (or after
+    `flush_interval` seconds), not one write per file. Output goes to the
+    current sys.stdout unless a stream is given.
+    """
+
+    def __init__(self, mode="human", stream=None, buffer_size=256 * 1024, flush_interval=0.5):
+        if mode not in OUTPUT_MODES:
+            raise ValueError(f"unknown output mode: {mode}")
+        self.mode = mode
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.events = {}       # kind -> count
+        self.counts = {}       # (rule label, dest folder) -> count
+        self._labels = {}      # (id(rule), idx) -> label; rules live for the whole run
+        self._buf = []
+        self._size = 0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _label(self, rule, idx):
+        key = (id(rule), idx)
+        label = self._labels.get(key)
+        if label is None:
+            label = self._labels[key] = describe_rule(rule, idx)
+        return label
+
+    def _emit(self, text):
+        self._buf.append(text)
+        self._size += len(text)
+        now = time.monotonic()
+        if self._size >= self.buffer_size or now - self._last >= self.flush_interval:
+            self._flush()
+
+    def _flush(self):
+        if self._buf:
+            stream = self.stream or sys.stdout
+            stream.write("".join(self._buf))
+            stream.flush()
+            self._buf.clear()
+            self._size = 0
+        self._last = time.monotonic()
+
+    def event(self, kind, text, rule=None, rule_idx=None, **fields):
+        """
+        One per-file event (match, dup, stale, restore, error). `text` is the
+        human line; `fields` (plus the rule's label) form the ndjson record.
+        """
+        with self._lock:
+            self.events[kind] = self.events.get(kind, 0) + 1
+            if self.mode == "ndjson":
+                record = {"event": kind}
+                if rule is not None:
+                    record["rule"] = self._label(rule, rule_idx)
+                record.update(fields)
+                self._emit(json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n")
+            elif self.mode == "human" or kind == "error":
+                self._emit(text + "\n")
+            if self.mode == "summary" and kind == "match":
+                key = (self._label(rule, rule_idx) if rule is not None else "-",
+                       os.path.dirname(fields.get("dest", "")))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def error(self, text, **fields):
+        fields.setdefault("error", text)
+        self.event("error", text, **fields)
+
+    def info(self, text):
+        """Anything that is not a per-file event; dropped in quiet mode."""
+        if self.mode == "quiet":
+            return
+        with self._lock:
+            if self.mode == "ndjson":
+                self._flush()
+                print(text, file=sys.stderr)
+            else:
+                self._emit(text + "\n")
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def summary(self):
+        counts = ", ".join(f"{n} {kind}" for kind, n in sorted(self.events.items()))
+        lines = [f"Summary: {counts or 'no actions'}"]
+        if self.counts:
+            lines.append(f"{'count':>9}  {'rule':30} destination")
+            for (label, dest), n in sorted(self.counts.items(), key=lambda kv: (-kv[1], kv[0])):
+                lines.append(f"{n:9d}  {label:30} {dest}")
+        return "\n".join(lines)
+
+    def finish(self):
+        """Flush, printing the table first in summary mode."""
+        if self.mode == "summary":
+            with self._lock:
+                self._emit(self.summary() + "\n")
+        self.flush()
+
+OUTPUT = Reporter()
+
+def set_output(mode):
+    global OUTPUT
+    OUTPUT = Reporter(mode)
+    return OUTPUT
+
+VERIFY_MODES = ("size", "hash")
+
+class MoveEngine:
+    """
+    Moves single files without ever replacing an existing destination.
+    - device of each (source dir, dest dir) pair is looked up once
+    - same device: hard link + unlink (or an O_EXCL placeholder + rename on
+      filesystems without hard links)
+    - different devices: O_EXCL placeholder, then a kernel-side copy with
+      os.copy_file_range / os.sendfile in `chunk` sized steps, metadata copied,
+      optional verify ('size' or 'hash'), then the source is unlinked.
+      A failed copy removes the partial destination.
+    Raises FileExistsError if another writer owns dest.
+    """
+
+    def __init__(self, verify=None, chunk=64 * 1024 * 1024):
+        if verify not in (None,) + VERIFY_MODES:
+            raise ValueError(f"unknown verify mode: {verify}")
+        self.verify = verify
+        self.chunk = chunk
+        self._same_dev = {}
+
+    def same_device(self, src_dir, dest_dir):
+        key = (str(src_dir), str(dest_dir))
+        same = self._same_dev.get(key)
+        if same is None:
+            try:
+                same = os.stat(src_dir).st_dev == os.stat(dest_dir).st_dev
+            except OSError:
+                same = False
+            self._same_dev[key] = same
+        return same
+
+    def move(self, src: Path, dest: Path):
+        if self.same_device(src.parent, dest.parent):
+            try:
+                os.link(src, dest, follow_symlinks=False)
+            except FileExistsError:
+                raise
+            except OSError as e:
+                if e.errno == errno.EXDEV:
+                    return self._copy_move(src, dest)
+                # no hard link support: claim the name, then rename over it
+                self._placeholder(dest)
+                try:
+                    os.replace(src, dest)
+                except BaseException:
+                    self._discard(dest)
+                    raise
+                return
+            os.unlink(src)
+            return
+        self._copy_move(src, dest)
+
+    @staticmethod
+    def _placeholder(dest):
+        fd = os.open(dest, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+        os.close(fd)
+
+    @staticmethod
+    def _discard(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def _copy_move(self, src: Path, dest: Path):
+        if os.path.islink(src):
+            os.symlink(os.readlink(src), dest)
+            os.unlink(src)
+            return
+        self._placeholder(dest)
+        try:
+            with open(src, "rb", buffering=0) as fsrc, open(dest, "wb", buffering=0) as fdst:
+                size = os.fstat(fsrc.fileno()).st_size
+                copied = self._copy_data(fsrc.fileno(), fdst.fileno(), size)
+            if copied != size:
+                raise OSError(f"copied {copied} of {size} bytes; source changed during move")
+            shutil.copystat(src, dest)
+            self._verify(src, dest, size)
+        except BaseException:
+            self._discard(dest)
+            raise
+        os.unlink(src)
+
+    def _copy_data(self, src_fd, dst_fd, size):
+        offset = 0
+        if hasattr(os, "copy_file_range"):
+            try:
+                while offset < size:
+                    n = os.copy_file_range(src_fd, dst_fd, min(self.chunk, size - offset), offset, offset)
+                    if n == 0:
+                        return offset
+                    offset += n
+                return offset
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM):
+                    raise
+        os.lseek(dst_fd, offset, os.SEEK_SET)
+        if hasattr(os, "sendfile"):
+            try:
+                while offset < size:
+                    n = os.sendfile(dst_fd, src_fd, offset, min(self.chunk, size - offset))
+                    if n == 0:
+                        return offset
+                    offset += n
+                return offset
+            except OSError as e:
+                if e.errno not in (errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                    raise
+                os.lseek(dst_fd, offset, os.SEEK_SET)
+        while offset < size:
+            data = os.pread(src_fd, min(1024 * 1024, size - offset), offset)
+            if not data:
                 break
-            i += 1
-    shutil.move(str(src), str(dest))
-    return dest
+            os.write(dst_fd, data)
+            offset += len(data)
+        return offset
+
+    def _verify(self, src, dest, size):
+        if self.verify is None:
+            return
+        if os.stat(dest).st_size != size:
+            raise OSError(f"verify failed: size mismatch for {dest}")
+        if self.verify == "hash" and _file_digest(src) != _file_digest(dest):
+            raise OSError(f"verify failed: content mismatch for {dest}")
+
+def _file_digest(path, chunk=1024 * 1024):
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.digest()
+
+DEFAULT_ENGINE = MoveEngine()
+
+def safe_move(src: Path, dest: Path, reservations=None, engine=None):
+    """
+    Move src to dest, adding _1, _2, ... if the name is taken.
+    With a DestReservations the name was already claimed at plan time and is
+    only re-resolved if a concurrent writer took it in the meantime.
+    """
+    engine = engine or DEFAULT_ENGINE
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    want = dest
+    i = 0
+    while True:
+        try:
+            engine.move(src, dest)
+            return dest
+        except FileExistsError:
+            if reservations is not None:
+                reservations.mark_taken(dest)
+                dest = reservations.claim(want)
+            else:
+                i += 1
+                dest = want.with_name(f"{want.stem}_{i}{want.suffix}")
+
+class DestReservations:
+    """
+    Per-directory index of taken destination names.
+    Each directory is listed once; repeated names get the next free _N suffix
+    from a per-name counter, so resolving a collision is O(1) instead of one
+    exists() per probe. Preview and apply use the same index, so the preview
+    shows the names apply will use.
+    Moves claimed with queue() are released with done(): the source stops
+    counting as occupied, and once no queued move targets a directory its
+    listing is dropped (the `keep_idle` most recently used idle ones are
+    kept, so a directory fed one move at a time is not listed per file). A
+    dropped directory is listed afresh, moved files included, when needed
+    again. Names claimed for queued moves are kept for is_claimed(), so the
+    scan skips files this run wrote; with `reachable(dir)` (False once the
+    scan can no longer get to dir) they are kept only where it still can,
+    and sweep() drops those the scan has passed since.
+    """
+
+    def __init__(self, keep_idle=64, reachable=None):
+        self.keep_idle = keep_idle
+        self.reachable = reachable
+        self._dirs = {}        # dir -> set of taken names
+        self._claimed = {}     # dir -> set of names claimed by this run
+        self._next = {}        # dir -> {(stem, suffix): next suffix to try}
+        self._sources = set()  # sources of queued moves, still occupied until moved
+        self._pending = {}     # dir -> queued moves into it
+        self._idle = {}        # dirs with no queued moves, least recently used first
+        self._lock = threading.Lock()
+
+    def _names(self, d: str):
+        names = self._dirs.get(d)
+        if names is None:
+            try:
+                names = {os.path.normcase(n) for n in os.listdir(d)}
+            except OSError:
+                names = set()
+            self._dirs[d] = names
+        return names
+
+    def _taken(self, d, names, name):
+        return os.path.normcase(name) in names or os.path.join(d, name) in self._sources
+
+    def queue(self, src: Path, dest: Path):
+        """claim() for a move of src that will run; call done() when it has."""
+        d = str(dest.parent)
+        with self._lock:
+            self._sources.add(str(src))
+            self._pending[d] = self._pending.get(d, 0) + 1
+            self._idle.pop(d, None)
+        return self.claim(dest)
+
+    def done(self, src: Path, dest: Path):
+        """A queued move of src to (planned) dest finished or failed."""
+        d = str(dest.parent)
+        with self._lock:
+            self._sources.discard(str(src))
+            n = self._pending.pop(d, 1) - 1
+            if n > 0:
+                self._pending[d] = n
+                return
+            self._idle[d] = None
+            while len(self._idle) > self.keep_idle:
+                old = next(iter(self._idle))
+                del self._idle[old]
+                self._dirs.pop(old, None)
+                self._next.pop(old, None)
+
+    def mark_taken(self, dest: Path):
+        d = str(dest.parent)
+        with self._lock:
+            self._names(d).add(os.path.normcase(dest.name))
+
+    def is_claimed(self, path: str):
+        d, name = os.path.split(path)
+        claimed = self._claimed.get(d)
+        return claimed is not None and os.path.normcase(name) in claimed
+
+    def sweep(self):
+        """Forget the claims in directories the scan can no longer reach."""
+        if self.reachable is None:
+            return
+        with self._lock:
+            for d in [d for d in self._claimed if not self.reachable(d)]:
+                del self._claimed[d]
+
+    def claim(self, dest: Path):
+        """Reserve and return a free name for dest."""
+        d = str(dest.parent)
+        with self._lock:
+            names = self._names(d)
+            name = dest.name
+            if self._taken(d, names, name):
+                stem, suffix = dest.stem, dest.suffix
+                key = (stem, suffix)
+                counters = self._next.setdefault(d, {})
+                i = counters.get(key, 1)
+                while self._taken(d, names, f"{stem}_{i}{suffix}"):
+                    i += 1
+                counters[key] = i + 1
+                name = f"{stem}_{i}{suffix}"
+                dest = dest.with_name(name)
+            names.add(os.path.normcase(name))
+            if d in self._pending and (self.reachable is None or self.reachable(d)):
+                # a move will write it where the scan may still find it (preview claims are never written)
+                self._claimed.setdefault(d, set()).add(os.path.normcase(name))
+        return dest
+
+# -------------------------
+# Move executor
+# -------------------------
+class MoveExecutor:
+    """
+    Plans moves in scan order and runs them on a pool of worker threads.
+    - final names are claimed at plan time from a DestReservations, so
+      actual_dest does not depend on --jobs or thread timing
+    - a bounded queue applies back-pressure to the scanner
+    - workers claim destinations atomically (see MoveEngine), so moves into the
+      same directory need no lock
+    - an exception from on_done (journal or index write) does not kill the
+      worker: it is raised from the next submit() or from close()
+    """
+
+    def __init__(self, jobs=1, backlog=None, on_done=None, reservations=None, engine=None):
+        self.jobs = max(1, int(jobs))
+        self.engine = engine or DEFAULT_ENGINE
+        self.on_done = on_done
+        self.reservations = reservations or DestReservations()
+        self.errors = []
+        self._failures = []    # on_done exceptions from the workers
+        self._raised = False
+        self._queue = None
+        self._workers = []
+        if self.jobs > 1:
+            self._queue = queue.Queue(maxsize=backlog or self.jobs * 64)
+            for _ in range(self.jobs):
+                t = threading.Thread(target=self._worker, daemon=True)
+                t.start()
+                self._workers.append(t)
+
+    def plan(self, src: Path, dest: Path):
+        """Claim a free name for dest (adding _1, _2, ... like safe_move)."""
+        return self.reservations.queue(src, dest)
+
+    def submit(self, entry: dict, src: Path, dest: Path, tag=None):
+        """
+        Queue a planned move; entry gets 'actual_dest' (or 'error') when done.
+        on_done(entry, tag) is then called from the worker.
+        """
+        if self._queue is None:
+            self._run(entry, src, dest, tag)
+        else:
+            self._raise_failure()
+            self._queue.put((entry, src, dest, tag))
+
+    def _run(self, entry, src, dest, tag=None):
+        try:
+            actual_dest = safe_move(src, dest, self.reservations, self.engine)
+            entry["actual_dest"] = str(actual_dest)
+        except Exception as e:
+            entry["error"] = str(e)
+            self.errors.append(entry)
+            OUTPUT.error(f"[ERROR] {src} -> {dest}: {e}", src=str(src), dest=str(dest), error=str(e))
+        finally:
+            self.reservations.done(src, dest)
+        if self.on_done is not None:
+            self.on_done(entry, tag)
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._run(*item)
+            except Exception as e:
+                item[0].setdefault("error", str(e))
+                self._failures.append(e)
+            finally:
+                self._queue.task_done()
+
+    def close(self):
+        """Wait for all queued moves to finish."""
+        for _ in self._workers:
+            self._queue.put(None)
+        for t in self._workers:
+            t.join()
+        self._workers = []
+        self._raise_failure()
+
+    def _raise_failure(self):
+        if self._failures and not self._raised:
+            self._raised = True
+            raise self._failures[0]
 
 # -------------------------
 # Core transforms
 # -------------------------
-def rename_pattern(path: Path, pattern: str, seq=None):
+_EXIFREAD = None
+
+def read_exif_date(path):
+    """EXIF DateTimeOriginal as YYYYMMDD, or None (needs the optional exifread)."""
+    global _EXIFREAD
+    if _EXIFREAD is None:
+        try:
+            import exifread
+            _EXIFREAD = exifread
+        except Exception:
+            _EXIFREAD = False
+    if not _EXIFREAD:
+        return None
+    try:
+        with open(path, "rb") as f:
+            tags = _EXIFREAD.process_file(f, details=False, stop_tag="EXIF DateTimeOriginal")
+    except Exception:
+        return None
+    value = tags.get("EXIF DateTimeOriginal") or tags.get("Image DateTime")
+    if not value:
+        return None
+    digits = str(value).split(" ")[0].replace(":", "")
+    return digits if len(digits) == 8 and digits.isdigit() else None
+
+class FileContext:
+    """
+    Metadata of one file for rename patterns and organize_target.
+    Every field is computed at most once, and only when something asks for it;
+    stat comes from the scan's DirEntry when there is one. {date} and {time}
+    are taken from the run's start so a whole batch gets the same values.
+    """
+    __slots__ = ("path", "entry", "run", "seq", "_stat", "_exif")
+
+    def __init__(self, path: Path, entry=None, run=None, seq=None):
+        self.path = path
+        self.entry = entry
+        self.run = run or run_clock()
+        self.seq = seq
+        self._stat = None
+        self._exif = False
+
+    def stat(self):
+        if self._stat is None:
+            self._stat = self.entry.stat() if self.entry is not None else self.path.stat()
+        return self._stat
+
+    def get(self, name):
+        return getattr(self, "_f_" + name)()
+
+    def _f_orig(self):
+        return self.path.stem
+
+    def _f_ext(self):
+        return self.path.suffix.lstrip(".")
+
+    def _f_date(self):
+        return self.run[0]
+
+    def _f_time(self):
+        return self.run[1]
+
+    def _f_seq(self):
+        return f"{self.seq:03d}" if self.seq is not None else ""
+
+    def _f_size(self):
+        return self.stat().st_size
+
+    def _f_mtime(self):
+        return datetime.fromtimestamp(self.stat().st_mtime).strftime("%Y%m%d_%H%M%S")
+
+    def _f_exif_date(self):
+        if self._exif is False:
+            self._exif = read_exif_date(self.path)
+        if self._exif is None:
+            # no EXIF data: fall back to the modification date
+            return datetime.fromtimestamp(self.stat().st_mtime).strftime("%Y%m%d")
+        return self._exif
+
+def run_clock(now=None):
+    """(date, time) strings for a run; computed once per process_folder call."""
+    now = now or datetime.now()
+    return now.strftime("%Y%m%d"), now.strftime("%H%M%S")
+
+PLACEHOLDERS = ("orig", "ext", "date", "time", "seq", "size", "mtime", "exif_date")
+
+class RenamePattern:
+    """
+    A rename pattern parsed once (at rule load). Rendering only computes the
+    placeholders the pattern uses, so {exif_date} costs nothing elsewhere.
+    """
+    _formatter = string.Formatter()
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.parts = []
+        for literal, field, spec, conv in self._formatter.parse(pattern):
+            if field is not None and field not in PLACEHOLDERS:
+                raise ValueError(f"unknown placeholder {{{field}}} in pattern {pattern!r}")
+            self.parts.append((literal, field, spec or "", conv))
+        self.fields = {f for _, f, _, _ in self.parts if f}
+
+    def render(self, ctx: FileContext):
+        out = []
+        for literal, field, spec, conv in self.parts:
+            out.append(literal)
+            if field is None:
+                continue
+            value = ctx.get(field)
+            if conv:
+                value = self._formatter.convert_field(value, conv)
+            out.append(format(value, spec) if spec else str(value))
+        return "".join(out)
+
+_PATTERNS = {}
+
+def compile_pattern(pattern):
+    if isinstance(pattern, RenamePattern):
+        return pattern
+    compiled = _PATTERNS.get(pattern)
+    if compiled is None:
+        compiled = _PATTERNS[pattern] = RenamePattern(pattern)
+    return compiled
+
+def rename_pattern(path: Path, pattern, seq=None, ctx=None):
     """
     Pattern example: "{date}_{orig}" or "project_{seq}_{orig}"
     Supported placeholders:
       {orig} - original filename (without extension)
       {ext} - extension without dot
-      {date} - YYYYMMDD
-      {time} - HHMMSS
+      {date} - YYYYMMDD (start of the run)
+      {time} - HHMMSS (start of the run)
       {seq} - sequence number (if provided)
+      {size} - file size in bytes
+      {mtime} - modification time, YYYYMMDD_HHMMSS
+      {exif_date} - photo date from EXIF (YYYYMMDD; needs exifread, else mtime date)
+    pattern may be a string or a RenamePattern; ctx a FileContext to reuse.
     """
-    orig = path.stem
+    if ctx is None:
+        ctx = FileContext(path, seq=seq)
     ext = path.suffix.lstrip(".")
-    ctx = {
-        "orig": orig,
-        "ext": ext,
-        "date": datetime.now().strftime("%Y%m%d"),
-        "time": datetime.now().strftime("%H%M%S"),
-        "seq": f"{seq:03d}" if seq is not None else "",
-    }
-    name = pattern.format(**ctx)
+    name = compile_pattern(pattern).render(ctx)
     return f"{name}.{ext}" if ext else name
 
-def organize_target(path: Path, mode: str):
+def organize_target(path: Path, mode: str, ctx=None):
     """
     mode: 'extension' | 'date' | 'type' (basic) or custom folder name
     """
@@ -89,15 +827,812 @@ def organize_target(path: Path, mode: str):
         ext = path.suffix.lstrip(".").lower() or "no_ext"
         return Path(ext) / path.name
     if mode == "date":
-        d = datetime.fromtimestamp(path.stat().st_mtime).strftime("%Y/%m/%d")
+        st = ctx.stat() if ctx is not None else path.stat()
+        d = datetime.fromtimestamp(st.st_mtime).strftime("%Y/%m/%d")
         return Path(d) / path.name
     # fallback: treat mode as fixed folder name
     return Path(mode) / path.name
 
+# -------------------------
+# Rule compiler
+# -------------------------
+def glob_to_regex(pattern: str):
+    """
+    Translate a match_glob pattern into a regex with Path.match semantics:
+    the pattern is normalised like a path ('dir/', './x' and 'a//b' work),
+    relative patterns match from the right, and each part is matched like
+    fnmatch with '*', '?' and '[...]' never crossing '/'.
+    """
+    pure = PurePosixPath(pattern)
+    if not pure.parts:
+        raise ValueError(f"empty match_glob pattern: {pattern!r}")
+    if pure.is_absolute():
+        return "/" + "/".join(_glob_part(p) for p in pure.parts[1:]) + r"\Z"
+    return r"(?:.*/)?" + "/".join(_glob_part(p) for p in pure.parts) + r"\Z"
+
+def _glob_part(pattern: str):
+    """Regex for one path part of a glob (fnmatch rules)."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        i += 1
+        if c == "*":
+            while i < n and pattern[i] == "*":
+                i += 1
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = i
+            if j < n and pattern[j] == "!":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 1
+            if j >= n:
+                out.append("\\[")
+            else:
+                out.append(_glob_set(pattern[i:j]))
+                i = j + 1
+        else:
+            out.append(re.escape(c))
+    return "".join(out)
+
+
+def _glob_set(body: str):
+    """Regex for the inside of a glob '[...]'; reversed ranges match nothing, as in fnmatch."""
+    negate = body.startswith("!")
+    if negate:
+        body = body[1:]
+    # split on range hyphens; a leading '-' (or ']') and a trailing '-' are literal
+    chunks, start = [], 0
+    k = body.find("-", 1)
+    while 0 < k < len(body) - 1:
+        chunks.append(body[start:k])
+        start = k + 1
+        k = body.find("-", k + 3)
+    chunks.append(body[start:])
+    for k in range(len(chunks) - 1, 0, -1):
+        if chunks[k - 1][-1] > chunks[k][0]:
+            chunks[k - 1] = chunks[k - 1][:-1] + chunks[k][1:]
+            del chunks[k]
+    body = "-".join("".join("\\" + ch if ch in "\\[]^&~|-" else ch for ch in c) for c in chunks)
+    if negate:
+        return f"[^/{body}]"
+    return f"[{body}]" if body else "(?!)"
+
+
+KNOWN_ACTIONS = ("move", "rename")
+
+def rules_hash(rules):
+    """Stable hash of a rules list; changes whenever the config changes."""
+    data = json.dumps(rules, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+_SIZE_UNITS = {"": 1, "b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}
+_SIZE_RE = re.compile(r"^\s*(>=|<=|>|<|=)?\s*([0-9]*\.?[0-9]+)\s*([kmgt]?)i?b?\s*$", re.IGNORECASE)
+
+def parse_size(text):
+    """'50MB' / '1.5G' / '700' -> bytes (K/M/G/T are powers of 1024)."""
+    if isinstance(text, (int, float)):
+        return int(text)
+    m = _SIZE_RE.match(str(text))
+    if not m or m.group(1):
+        raise ValueError(f"bad size: {text!r}")
+    return int(float(m.group(2)) * _SIZE_UNITS[m.group(3).lower()])
+
+def parse_size_rule(value):
+    """
+    match_size value -> inclusive (low, high) bounds, None meaning open.
+    Accepts '>50MB', '<=1G', '=0' or {min: '10MB', max: '1GB'}.
+    """
+    if isinstance(value, dict):
+        low = parse_size(value["min"]) if "min" in value else None
+        high = parse_size(value["max"]) if "max" in value else None
+        return low, high
+    m = _SIZE_RE.match(str(value))
+    if not m:
+        raise ValueError(f"bad match_size: {value!r}")
+    op = m.group(1) or ">="
+    n = int(float(m.group(2)) * _SIZE_UNITS[m.group(3).lower()])
+    return {
+        ">": (n + 1, None), ">=": (n, None), "<": (None, n - 1), "<=": (None, n), "=": (n, n),
+    }[op]
+
+CONTENT_MAX_BYTES = 1024 * 1024
+
+def parse_content_rule(value):
+    """
+    match_content value -> (bytes regex, flags, max_bytes).
+    A plain string is a case-insensitive keyword; a dict may give `keyword`
+    or `regex`, `ignore_case` and `max_bytes` (only that prefix is read).
+    Matching is on raw bytes, so compressed formats will not match.
+    """
+    if isinstance(value, str):
+        value = {"keyword": value}
+    if "regex" in value:
+        pattern = str(value["regex"]).encode("utf-8")
+        ignore_case = value.get("ignore_case", False)
+    else:
+        pattern = re.escape(str(value["keyword"]).encode("utf-8"))
+        ignore_case = value.get("ignore_case", True)
+    flags = re.IGNORECASE if ignore_case else 0
+    re.compile(pattern, flags)  # fail at load time on a bad regex
+    return pattern, flags, parse_size(value.get("max_bytes", CONTENT_MAX_BYTES))
+
+class CompiledRules:
+    """
+    Rules from load_rules compiled for first-match lookup.
+    - by_ext: extension -> rule indexes that can match it, in rule order
+    - any_ext: rule indexes without match_ext (used for unknown extensions)
+    - glob_re: one regex with a named group per match_glob rule
+    - patterns: rename patterns parsed once, by rule index
+    - sizes / content: match_size bounds and match_content specs, by rule index
+    Checks run cheapest first: extension, glob, size (scan stat), and content
+    last, only for rules that passed everything else.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules or [])
+        self.hash = rules_hash(self.rules)
+        exts = {}
+        any_ext = []
+        globs = []
+        for idx, r in enumerate(self.rules):
+            if r.get("action", "move") not in KNOWN_ACTIONS:
+                # unknown actions never apply; later rules get a chance
+                continue
+            if "match_ext" in r:
+                for e in r["match_ext"]:
+                    exts.setdefault(str(e).lower(), set()).add(idx)
+            else:
+                any_ext.append(idx)
+            if "match_glob" in r:
+                globs.append((idx, r["match_glob"]))
+        self.sizes = {
+            idx: parse_size_rule(r["match_size"])
+            for idx, r in enumerate(self.rules) if "match_size" in r
+        }
+        self.content = {
+            idx: parse_content_rule(r["match_content"])
+            for idx, r in enumerate(self.rules) if "match_content" in r
+        }
+        self.patterns = {
+            idx: compile_pattern(r.get("pattern", "{date}_{orig}"))
+            for idx, r in enumerate(self.rules) if r.get("action") == "rename"
+        }
+        self.needs_glob = {idx for idx, _ in globs}
+        self.any_ext = tuple(any_ext)
+        self.by_ext = {
+            e: tuple(sorted(idxs.union(any_ext))) for e, idxs in exts.items()
+        }
+        self.glob_re = None
+        if globs:
+            flags = re.IGNORECASE if os.name == "nt" else 0
+            parts = [f"(?:(?={glob_to_regex(g)})(?P<g{idx}>))?" for idx, g in globs]
+            self.glob_re = re.compile("".join(parts), flags | re.DOTALL)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match(self, ext: str, rel: str, entry=None):
+        """
+        Return (index, rule) of the first rule matching a file, or (None, None).
+        ext is the suffix without dot, rel the posix path relative to --src.
+        entry (os.DirEntry / PathEntry) is needed for match_size/match_content;
+        content is checked inline here (process_folder uses a ContentScanner).
+        """
+        if not self.sizes and not self.content:
+            candidates = self.by_ext.get(ext.lower(), self.any_ext)
+            hits = None
+            for idx in candidates:
+                if idx in self.needs_glob:
+                    if hits is None:
+                        hits = self.glob_re.match(rel)
+                    if hits.group(f"g{idx}") is None:
+                        continue
+                return idx, self.rules[idx]
+            return None, None
+        cands = self.candidates(ext, rel, entry)
+        need = self.content_specs(cands)
+        found = _content_hits(entry.path, need) if need else ()
+        return self.resolve(cands, found)
+
+    def candidates(self, ext: str, rel: str, entry=None):
+        """
+        Rules passing every check except content, in rule order, up to and
+        including the first one that has no content check.
+        """
+        out = []
+        hits = None
+        for idx in self.by_ext.get(ext.lower(), self.any_ext):
+            if idx in self.needs_glob:
+                if hits is None:
+                    hits = self.glob_re.match(rel)
+                if hits.group(f"g{idx}") is None:
+                    continue
+            bounds = self.sizes.get(idx)
+            if bounds is not None:
+                try:
+                    size = entry.stat().st_size
+                except OSError:
+                    continue
+                if (bounds[0] is not None and size < bounds[0]) or (bounds[1] is not None and size > bounds[1]):
+                    continue
+            out.append(idx)
+            if idx not in self.content:
+                break
+        return out
+
+    def content_specs(self, cands):
+        return tuple((idx,) + self.content[idx] for idx in cands if idx in self.content)
+
+    def resolve(self, cands, content_hits):
+        """First candidate without a content check, or whose content matched."""
+        for idx in cands:
+            if idx not in self.content or idx in content_hits:
+                return idx, self.rules[idx]
+        return None, None
+
+
+def compile_rules(rules):
+    if isinstance(rules, CompiledRules):
+        return rules
+    return CompiledRules(rules)
+
+# -------------------------
+# Directory scan
+# -------------------------
+SCAN_ORDERS = ("sorted", "none")
+
+def scan_files(src: Path, order: str = "sorted"):
+    """
+    Stream regular files under src as os.DirEntry objects.
+    order:
+      'sorted' - per-directory name order, depth first (same order as
+                 sorted(src.rglob("*"))); holds one listing per open level
+      'none'   - filesystem order, one directory open at a time
+    Symlinked directories are not followed; unreadable directories are skipped,
+    and so is LOG_DIR: the run writes its journal and index there while it scans.
+    """
+    if order not in SCAN_ORDERS:
+        raise ValueError(f"unknown scan order: {order}")
+    if order == "sorted":
+        yield from _scan_sorted(str(src), _own_dir())
+    else:
+        yield from _scan_unordered(str(src), _own_dir())
+
+def _own_dir():
+    """LOG_DIR as an absolute path, to compare with scanned directories."""
+    return str(LOG_DIR.resolve())
+
+def _scan_key(path: str, prefix: str):
+    """Sort key of a path under `prefix` (ending in a separator) in sorted scan order."""
+    return os.path.normcase(path[len(prefix):]).split(os.sep)
+
+def _scan_listing(path: str):
+    try:
+        with os.scandir(path) as it:
+            return sorted(it, key=lambda e: os.path.normcase(e.name))
+    except OSError:
+        return []
+
+def _is_dir(entry):
+    try:
+        return entry.is_dir(follow_symlinks=False)
+    except OSError:
+        return False
+
+def _is_file(entry):
+    try:
+        return entry.is_file()
+    except OSError:
+        return False
+
+def _scan_sorted(root: str, skip: str):
+    stack = [iter(_scan_listing(root))]
+    while stack:
+        entry = next(stack[-1], None)
+        if entry is None:
+            stack.pop()
+        elif _is_dir(entry):
+            if entry.path != skip:
+                stack.append(iter(_scan_listing(entry.path)))
+        elif _is_file(entry):
+            yield entry
+
+def _scan_unordered(root: str, skip: str):
+    pending = [root]
+    while pending:
+        path = pending.pop()
+        try:
+            it = os.scandir(path)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if _is_dir(entry):
+                    if entry.path != skip:
+                        pending.append(entry.path)
+                elif _is_file(entry):
+                    yield entry
+
+class PathEntry:
+    """Minimal os.DirEntry stand-in for a path that did not come from a scan."""
+    __slots__ = ("path", "name", "_stat")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._stat = None
+
+    def stat(self):
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+    def is_file(self):
+        try:
+            return stat.S_ISREG(self.stat().st_mode)
+        except OSError:
+            return False
+
+def iter_paths(paths, order: str = "sorted"):
+    """Entries for an explicit set of paths; directories are scanned recursively."""
+    seen = set()
+    own = _own_dir()
+    for path in paths:
+        path = str(path)
+        if path == own or path.startswith(os.path.join(own, "")):
+            continue
+        if os.path.isdir(path) and not os.path.islink(path):
+            found = scan_files(Path(path), order)
+        else:
+            found = [PathEntry(path)]
+        for e in found:
+            if e.path not in seen and e.is_file():
+                seen.add(e.path)
+                yield e
+
+# -------------------------
+# Scan index
+# -------------------------
+class ScanIndex:
+    """
+    Optional on-disk record of files already handled, kept in SQLite under
+    LOG_DIR (one database per source folder).
+    Rows are keyed by path (relative to the folder) and store device, inode,
+    size, mtime and the index of the matched rule (NULL for no match). Moved
+    files are recorded at their destination. A file is skipped when the same
+    file is still at that path, unchanged; a file put back by --undo-log is
+    therefore scanned again. Editing the rules clears the index.
+    """
+
+    def __init__(self, src: Path, rules_hash: str, path=None, commit_every=5000, readonly=False):
+        if path is None:
+            key = hashlib.sha1(str(src).encode("utf-8")).hexdigest()[:12]
+            path = log_dir() / f"index_{key}.sqlite"
+        self.path = Path(path)
+        self._prefix = os.path.join(str(src), "")
+        self.commit_every = commit_every
+        self._pending = 0
+        self._lock = threading.Lock()
+        import sqlite3
+        if readonly:
+            # lookups only (SubtreePool workers); the owner keeps it current
+            self.db = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True,
+                                      check_same_thread=False)
+            return
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(files)")]
+        if columns and columns[0] != "path":
+            # keyed by (dev, ino) before: renames (and undo) kept rows valid
+            self.db.execute("DROP TABLE files")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER,"
+            " rule INTEGER) WITHOUT ROWID"
+        )
+        row = self.db.execute("SELECT value FROM meta WHERE key='rules_hash'").fetchone()
+        if row is None or row[0] != rules_hash:
+            self.db.execute("DELETE FROM files")
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('rules_hash', ?)", (rules_hash,))
+        self.db.commit()
+
+    def _key(self, path: str):
+        return path[len(self._prefix):] if path.startswith(self._prefix) else path
+
+    def unchanged(self, path: str, st):
+        """True if the file at `path` (stat result `st`) was handled there before and is unchanged."""
+        with self._lock:
+            row = self.db.execute(
+                "SELECT dev, ino, size, mtime_ns FROM files WHERE path=?", (self._key(path),)
+            ).fetchone()
+        return row is not None and row == (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def record(self, path: str, st, rule=None):
+        """Remember the file now at `path`; `st` is its stat from the scan."""
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                (self._key(path), st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, rule),
+            )
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self.db.commit()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self.db.commit()
+            self.db.close()
+
+# -------------------------
+# Duplicate detection
+# -------------------------
+DEDUPE_ACTIONS = ("skip", "move", "hardlink")
+DUPLICATES_FOLDER = "Duplicates"
+
+class DuplicateFinder:
+    """
+    Tiered duplicate detection; each tier only reads the survivors of the last:
+      1. group by size (no reads; empty files are ignored). Names of one
+         inode count once: hard links of each other are not duplicates
+      2. hash the first and last `block` bytes
+      3. hash the whole file, chunked, only if it is larger than head + tail
+    Hashing runs on `jobs` threads. bytes_read / bytes_total show the savings.
+    """
+
+    def __init__(self, jobs=4, block=64 * 1024, chunk=1024 * 1024):
+        self.jobs = max(1, int(jobs))
+        self.block = block
+        self.chunk = chunk
+        self.bytes_read = 0
+        self.bytes_total = 0
+        self._lock = threading.Lock()
+
+    def _count(self, n):
+        with self._lock:
+            self.bytes_read += n
+
+    def _edge_hash(self, path, size):
+        h = hashlib.blake2b(digest_size=20)
+        with open(path, "rb") as f:
+            head = f.read(self.block)
+            h.update(head)
+            n = len(head)
+            if size > 2 * self.block:
+                f.seek(size - self.block)
+                tail = f.read(self.block)
+                h.update(tail)
+                n += len(tail)
+            elif size > self.block:
+                rest = f.read()
+                h.update(rest)
+                n += len(rest)
+        self._count(n)
+        return h.digest()
+
+    def _full_hash(self, path, size):
+        h = hashlib.blake2b(digest_size=20)
+        buf = bytearray(self.chunk)
+        view = memoryview(buf)
+        n = 0
+        with open(path, "rb", buffering=0) as f:
+            while True:
+                got = f.readinto(buf)
+                if not got:
+                    break
+                h.update(view[:got])
+                n += got
+        self._count(n)
+        return h.digest()
+
+    def _refine(self, pool, groups, fn):
+        """Split each group of (path, size) by fn(path, size); drop singletons."""
+        out = []
+        for group in groups:
+            keys = pool.map(lambda item: self._safe(fn, *item), group)
+            split = {}
+            for item, key in zip(group, keys):
+                if key is not None:
+                    split.setdefault(key, []).append(item)
+            out.extend(g for g in split.values() if len(g) > 1)
+        return out
+
+    @staticmethod
+    def _safe(fn, path, size):
+        try:
+            return fn(path, size)
+        except OSError:
+            return None
+
+    def find(self, entries):
+        """
+        entries: iterable of os.DirEntry (scan order).
+        Returns {duplicate path: original path}; the first file of each set in
+        scan order is the original.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        by_size = {}
+        inodes = set()
+        for de in entries:
+            try:
+                st = de.stat()
+            except OSError:
+                continue
+            if st.st_nlink > 1:
+                if (st.st_dev, st.st_ino) in inodes:
+                    continue
+                inodes.add((st.st_dev, st.st_ino))
+            size = st.st_size
+            self.bytes_total += size
+            if size:
+                by_size.setdefault(size, []).append((de.path, size))
+        groups = [g for g in by_size.values() if len(g) > 1]
+        by_size = None
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            groups = self._refine(pool, groups, self._edge_hash)
+            small = [g for g in groups if g[0][1] <= 2 * self.block]
+            large = [g for g in groups if g[0][1] > 2 * self.block]
+            # head + tail already covered every byte of small files
+            groups = small + self._refine(pool, large, self._full_hash)
+
+        dups = {}
+        for group in groups:
+            original = group[0][0]
+            for path, _ in group[1:]:
+                dups[path] = original
+        return dups
+
+def hardlink_replace(dup: Path, original: Path, moved_to=None):
+    """
+    Replace dup with a hard link to original (atomic via a temp name).
+    moved_to is where the original is being moved by this run, if anywhere;
+    it is only used once the original path is gone, i.e. the move finished.
+    """
+    tmp = dup.with_name(f".{dup.name}.dedupe_tmp")
+    try:
+        os.link(original, tmp)
+    except FileNotFoundError:
+        if moved_to is None:
+            raise
+        os.link(moved_to, tmp)
+    try:
+        os.replace(tmp, dup)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def unlink_copy(path: Path, mode=None, mtime_ns=None):
+    """Turn a hard link back into an independent copy (undo of hardlink_replace)."""
+    tmp = path.with_name(f".{path.name}.undo_tmp")
+    shutil.copyfile(path, tmp)
+    if mode is not None:
+        os.chmod(tmp, stat.S_IMODE(mode))
+    if mtime_ns is not None:
+        os.utime(tmp, ns=(mtime_ns, mtime_ns))
+    os.replace(tmp, path)
+
+def find_duplicates(src: Path, order="sorted", jobs=4, exclude=DUPLICATES_FOLDER):
+    """Run DuplicateFinder over src, ignoring files already under `exclude`."""
+    src = Path(src).resolve()
+    skip = os.path.join(str(src), exclude, "") if exclude else None
+    finder = DuplicateFinder(jobs=jobs)
+    entries = (de for de in scan_files(src, order) if not (skip and de.path.startswith(skip)))
+    dups = finder.find(entries)
+    OUTPUT.info(f"Dedupe: {len(dups)} duplicate(s); read {finder.bytes_read} of {finder.bytes_total} bytes")
+    return dups
+
+# -------------------------
+# Content matching
+# -------------------------
+def _content_hits(path, specs):
+    """
+    Rule indexes whose match_content pattern occurs in the file's prefix.
+    specs: (idx, bytes pattern, flags, max_bytes) tuples. Runs in the pool.
+    The prefix is read, not mmapped: a file truncated by its writer
+    meanwhile would raise SIGBUS and take the whole pool down.
+    """
+    hits = set()
+    try:
+        with open(path, "rb") as f:
+            data = f.read(max(s[3] for s in specs))
+    except OSError:
+        return frozenset()
+    for idx, pattern, flags, max_bytes in specs:
+        if re.compile(pattern, flags).search(data, 0, max_bytes):
+            hits.add(idx)
+    return frozenset(hits)
+
+def spawn_pool(workers):
+    """ProcessPoolExecutor using the spawn start method."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+class ContentScanner:
+    """
+    Runs match_content checks on a process pool.
+    Results are cached by (device, inode, mtime) and the checks asked for, so
+    an unchanged file is never read twice (e.g. repeated watch events).
+    """
+
+    def __init__(self, jobs=None, cache_size=100000):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.cache_size = cache_size
+        self._cache = {}
+        self._pool = spawn_pool(self.jobs)
+
+    def submit(self, entry, specs):
+        """Future of the frozenset of matching rule indexes."""
+        try:
+            st = entry.stat()
+            key = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size, specs)
+        except OSError:
+            key = None
+        hit = self._cache.get(key) if key is not None else None
+        if hit is not None:
+            from concurrent.futures import Future
+            fut = Future()
+            fut.set_result(hit)
+            return fut
+        fut = self._pool.submit(_content_hits, entry.path, specs)
+        if key is not None:
+            fut.add_done_callback(lambda f: self._remember(key, f))
+        return fut
+
+    def _remember(self, key, fut):
+        if fut.exception() is None:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[key] = fut.result()
+
+    def close(self):
+        self._pool.shutdown()
+
+# -------------------------
+# Work partitioning (multiple roots / --workers)
+# -------------------------
+StatKey = namedtuple("StatKey", "st_dev st_ino st_size st_mtime_ns")
+
+def split_root(root: Path, order="sorted"):
+    """
+    Work units for one root, in scan order: every top-level directory is a
+    unit and each run of top-level files between them is one more.
+    Concatenating the units' scans gives the same order as scan_files(root).
+    """
+    root = str(root)
+    if order == "sorted":
+        listing = _scan_listing(root)
+    else:
+        try:
+            with os.scandir(root) as it:
+                listing = list(it)
+        except OSError:
+            listing = []
+    units, files = [], []
+    own = _own_dir()
+    for e in listing:
+        if _is_dir(e):
+            if e.path == own:
+                continue
+            if files:
+                units.append(("files", files))
+                files = []
+            units.append(("dir", e.path))
+        elif _is_file(e):
+            files.append(e.path)
+    if files:
+        units.append(("files", files))
+    return units
+
+_WORKER_RULES = {}
+
+def _classify_unit(root, unit, rules, order, index_path, timed=False):
+    """
+    Scan one work unit and evaluate the rules (including match_content) on
+    every file. Runs in the pool; returns ([(path, rule index, StatKey,
+    match seconds)] in scan order, phases). StatKey is only filled in when an
+    index is used; files the index reports unchanged are left out.
+    With `timed`, phases holds the unit's walk and stat times as
+    Stats.phases does, and match seconds are measured; else None and 0.0.
+    """
+    key = rules_hash(rules)
+    compiled = _WORKER_RULES.get(key)
+    if compiled is None:
+        compiled = _WORKER_RULES[key] = compile_rules(rules)
+    index = ScanIndex(Path(root), key, path=index_path, readonly=True) if index_path else None
+    kind, target = unit
+    found = scan_files(Path(target), order) if kind == "dir" else (PathEntry(f) for f in target)
+    prefix = os.path.join(root, "")
+    stats = Stats() if timed else None
+    if stats is not None:
+        found = stats.timed_iter(found, "walk")
+    perf = time.perf_counter
+    out = []
+    try:
+        for de in found:
+            sk = None
+            if index is not None:
+                t0 = perf() if timed else 0
+                try:
+                    st = de.stat()
+                except OSError:
+                    continue
+                if timed:
+                    stats.add("stat", perf() - t0)
+                if index.unchanged(de.path, st):
+                    continue
+                sk = StatKey(st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+            t0 = perf() if timed else 0
+            name = de.name
+            i = name.rfind(".")
+            ext = name[i + 1:] if 0 < i < len(name) - 1 else ""
+            rel = de.path[len(prefix):].replace(os.sep, "/")
+            rule_idx, _ = compiled.match(ext, rel, de)
+            out.append((de.path, rule_idx, sk, perf() - t0 if timed else 0.0))
+    finally:
+        if index is not None:
+            index.close()
+    return out, stats.phases if timed else None
+
+class SubtreePool:
+    """
+    Scans and evaluates the rules for many roots on a process pool, split
+    into top-level subtrees (see split_root). Results are handed back per
+    root in scan order so process_folder can plan, journal and move them
+    in this process exactly as for a single-process scan: rule order,
+    collision names and seq_key counters come out the same.
+    At most `window` units are in flight, ahead of the consumer and across
+    root boundaries.
+    """
+
+    def __init__(self, roots, rules, workers=None, order="sorted", indexes=None, window=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.timed = STATS is not None
+        self.window = window or self.workers * 4
+        self.rules = rules.rules if isinstance(rules, CompiledRules) else rules
+        self.order = order
+        self._index_paths = {str(r): str(i.path) for r, i in (indexes or {}).items()}
+        self._units = deque((str(r), u) for r in roots for u in split_root(r, order))
+        self._running = deque()
+        self._pool = spawn_pool(self.workers)
+
+    def _fill(self):
+        while self._units and len(self._running) < self.window:
+            root, unit = self._units.popleft()
+            fut = self._pool.submit(_classify_unit, root, unit, self.rules, self.order,
+                                    self._index_paths.get(root), self.timed)
+            self._running.append((root, fut))
+
+    def results(self, root):
+        """Yield the _classify_unit results of `root`'s units; roots must be taken in order."""
+        root = str(root)
+        self._fill()
+        while self._running and self._running[0][0] == root:
+            _, fut = self._running.popleft()
+            self._fill()
+            yield fut.result()
+
+    def close(self):
+        for _, fut in self._running:
+            fut.cancel()
+        self._pool.shutdown()
+
 # -------------------------
 # Rule engine
 # -------------------------
-def process_folder(src: Path, rules: dict, preview=True):
+def process_folder(src: Path, rules: dict, preview=True, order="sorted", jobs=1, paths=None,
+                   index=None, duplicates=None, dedupe="move", dedupe_folder=DUPLICATES_FOLDER,
+                   journal=None, engine=None, content_jobs=None, classified=None, content_scanner=None):
     """
     rules example (from YAML):
     - match_ext: ['jpg','jpeg','png']
@@ -110,144 +1645,1213 @@ def process_folder(src: Path, rules: dict, preview=True):
     - match_ext: ['pdf']
       action: move
       organize_by: date
+
+    Files are streamed from scan_files and acted on as they are found.
+    If `paths` is given only those files (and directories) are processed.
+    With a ScanIndex, files unchanged since an earlier apply run are skipped
+    and apply mode records every file it evaluated.
+    In apply mode moves are planned here and run by a MoveExecutor with
+    `jobs` worker threads.
+    `duplicates` ({path: original}, see find_duplicates) takes precedence over
+    the rules: duplicates are skipped, moved under dedupe_folder or replaced
+    by a hard link to the original, depending on `dedupe`.
+    With a Journal every entry is streamed to it as it happens and nothing is
+    kept in memory (the returned list is empty); otherwise entries are returned.
+    match_content checks run on `content_scanner` (a ContentScanner the caller
+    keeps open across calls, so its pool and cache are reused), or else on
+    one with `content_jobs` processes made for this call; a bounded window
+    keeps results in scan order.
+    `classified` replaces the local scan and rule evaluation with results
+    from another source (SubtreePool.results): per work unit, (path, rule
+    index, stat, match seconds) tuples in scan order and the unit's phase
+    times. Planning, journaling, moves and stats still happen here.
     """
     log_entries = []
     seq_counters = {}
+    compiled = compile_rules(rules)
+    run = run_clock()
 
-    files = sorted([p for p in src.rglob("*") if p.is_file()])
-    for i, p in enumerate(files, start=1):
-        rel = p.relative_to(src)
-        applied = False
-        for r in rules:
-            # match by extension
-            if "match_ext" in r:
-                if p.suffix.lstrip(".").lower() not in [e.lower() for e in r["match_ext"]]:
+    src = Path(src).resolve()
+    dedupe_rule = {"action": "dedupe", "dedupe": dedupe}
+    # originals that this run moves, so hard links can follow them
+    originals = set(duplicates.values()) if duplicates and dedupe == "hardlink" else ()
+    moved_originals = {}
+    add_entry = journal.plan if journal is not None else log_entries.append
+
+    def on_done(entry, tag):
+        if journal is not None:
+            journal.done(entry)
+        # successful moves are recorded at their destination, with the stat taken at scan time
+        if tag is not None and "actual_dest" in entry:
+            index.record(entry["actual_dest"], *tag)
+
+    # path of the entry the scan is at: in sorted order, directories it has
+    # passed are never listed again, so claims there are not needed
+    scan_pos = [None]
+    ordered = order == "sorted" and paths is None
+
+    def reachable(d):
+        if d != src_str and not d.startswith(src_prefix):
+            return False
+        pos = scan_pos[0]
+        if not ordered or pos is None or pos.startswith(os.path.join(d, "")):
+            return True
+        return _scan_key(d, src_prefix) > _scan_key(pos, src_prefix)
+
+    reservations = DestReservations(reachable=reachable)
+    executor = None if preview else MoveExecutor(jobs, on_done=on_done, reservations=reservations,
+                                                 engine=engine)
+
+    content = None
+    if compiled.content and classified is None:
+        content = content_scanner or ContentScanner(content_jobs)
+    stats = STATS
+    src_str = str(src)
+    src_prefix = os.path.join(src_str, "")
+
+    def at(path, n):
+        """Record the scan position; now and then drop the claims it has passed."""
+        scan_pos[0] = path
+        if not n & 4095:
+            reservations.sweep()
+
+    def classify(found):
+        """Yield (entry, stat, duplicate_of, rule index, rule) in scan order."""
+        window = deque()
+        limit = content.jobs * 32 if content is not None else 0
+        for n, de in enumerate(found, 1):
+            at(de.path, n)
+            if reservations.is_claimed(de.path):
+                # written by this run; the streaming scan may reach it later
+                continue
+            st = None
+            if index is not None:
+                t0 = time.perf_counter() if stats is not None else 0
+                try:
+                    st = de.stat()
+                except OSError:
                     continue
-            if "match_glob" in r:
-                # glob match relative path
-                if not rel.match(r["match_glob"]):
+                if stats is not None:
+                    stats.add("stat", time.perf_counter() - t0)
+                if index.unchanged(de.path, st):
+                    continue
+            dup_of = duplicates.get(de.path) if duplicates else None
+            if dup_of is not None:
+                window.append((de, st, dup_of, None, None, 0.0))
+            else:
+                t0 = time.perf_counter() if stats is not None else 0
+                # same values as Path.suffix / relative_to, without building Paths
+                name = de.name
+                i = name.rfind(".")
+                ext = name[i + 1:] if 0 < i < len(name) - 1 else ""
+                if de.path.startswith(src_prefix):
+                    rel = de.path[len(src_prefix):].replace(os.sep, "/")
+                else:
+                    rel = Path(de.path).relative_to(src).as_posix()
+                if content is None:
+                    # first matching rule wins
+                    rule_idx, r = compiled.match(ext, rel, de)
+                    if stats is not None:
+                        stats.rule(rule_idx, time.perf_counter() - t0)
+                    yield de, st, None, rule_idx, r
+                    continue
+                cands = compiled.candidates(ext, rel, de)
+                specs = compiled.content_specs(cands)
+                fut = content.submit(de, specs) if specs else None
+                window.append((de, st, None, cands, fut, time.perf_counter() - t0 if stats else 0.0))
+            while window and (window[0][4] is None or window[0][4].done() or len(window) > limit):
+                yield resolve(window.popleft())
+        while window:
+            yield resolve(window.popleft())
+
+    def from_pool(units):
+        """classify() for results evaluated elsewhere."""
+        n = 0
+        for items, phases in units:
+            if stats is not None and phases:
+                for phase, (calls, seconds) in phases.items():
+                    stats.add(phase, seconds, calls)
+            for path, rule_idx, st, dt in items:
+                n += 1
+                at(path, n)
+                if reservations.is_claimed(path):
+                    continue
+                de = PathEntry(path)
+                dup_of = duplicates.get(path) if duplicates else None
+                if dup_of is not None:
+                    yield de, st, dup_of, None, dedupe_rule
+                    continue
+                if stats is not None:
+                    stats.rule(rule_idx, dt)
+                if rule_idx is None:
+                    yield de, st, None, None, None
+                else:
+                    yield de, st, None, rule_idx, compiled.rules[rule_idx]
+
+    def resolve(item):
+        de, st, dup_of, cands, fut, dt = item
+        if dup_of is not None:
+            return de, st, dup_of, None, dedupe_rule
+        t0 = time.perf_counter() if stats is not None else 0
+        rule_idx, r = compiled.resolve(cands, fut.result() if fut is not None else ())
+        if stats is not None:
+            stats.rule(rule_idx, dt + time.perf_counter() - t0)
+        return de, st, None, rule_idx, r
+
+    try:
+        if classified is not None:
+            items = from_pool(classified)
+        else:
+            found = scan_files(src, order) if paths is None else iter_paths(paths, order)
+            if stats is not None:
+                found = stats.timed_iter(found, "walk")
+            items = classify(found)
+        for de, st, dup_of, rule_idx, r in items:
+            p = Path(de.path)
+            rel = p.relative_to(src)
+            if dup_of is not None:
+                if dedupe == "skip":
+                    OUTPUT.event("dup", f"[DUP] {p} (duplicate of {dup_of}) — skipped",
+                                 src=str(p), original=dup_of, action="skip")
                     continue
+                if dedupe == "hardlink":
+                    entry = {"src": str(p), "dest": dup_of, "timestamp": timestamp(), "rule": r,
+                             "action": "hardlink"}
+                    OUTPUT.event("dup", f"[DUP] {p} -> hard link to {dup_of}",
+                                 src=str(p), original=dup_of, action="hardlink")
+                    if preview:
+                        add_entry(entry)
+                        continue
+                    try:
+                        st = de.stat()
+                        entry["mode"], entry["mtime_ns"] = st.st_mode, st.st_mtime_ns
+                    except OSError as e:
+                        entry["error"] = str(e)
+                    # journal first, so a crash mid-way still leaves an undo record
+                    add_entry(entry)
+                    if "error" not in entry:
+                        try:
+                            hardlink_replace(p, Path(dup_of), moved_originals.get(dup_of))
+                        except OSError as e:
+                            entry["error"] = str(e)
+                            if journal is not None:
+                                journal.done(entry)
+                    if "error" in entry:
+                        OUTPUT.error(f"[ERROR] {p}: {entry['error']}", src=str(p), error=entry["error"])
+                    continue
+            if r is None:
+                if st is not None and not preview:
+                    index.record(de.path, st)
+                # optionally default rule; skip for now
+                continue
             # matched — determine action
             action = r.get("action", "move")
             target_folder = r.get("target_folder")
-            if action == "rename":
-                pattern = r.get("pattern", "{date}_{orig}")
+            if action == "dedupe":
+                dest_rel = (Path(dedupe_folder) / rel).as_posix()
+            elif action == "rename":
                 key = r.get("seq_key", "default")
                 seq_counters.setdefault(key, 0)
                 seq_counters[key] += 1
-                new_name = rename_pattern(p, pattern, seq=seq_counters[key])
+                ctx = FileContext(p, de, run, seq_counters[key])
+                new_name = rename_pattern(p, compiled.patterns[rule_idx], ctx=ctx)
                 dest_rel = (Path(r.get("target_folder", "")) / new_name).as_posix()
-            elif action == "move":
+            else:
                 organize_by = r.get("organize_by")
                 if organize_by:
-                    dest_rel = organize_target(p, organize_by).as_posix()
+                    dest_rel = organize_target(p, organize_by, FileContext(p, de, run)).as_posix()
                 elif target_folder:
                     dest_rel = (Path(target_folder) / p.name).as_posix()
                 else:
                     dest_rel = p.name
-            else:
-                # unknown action
-                continue
 
-            dest_path = (src / Path(dest_rel)).resolve()
-            entry = {"src": str(p.resolve()), "dest": str(dest_path), "timestamp": timestamp(), "rule": r}
-            log_entries.append(entry)
+            # src is already resolved: normalising the join is enough, no per-file syscalls
+            dest_path = Path(os.path.normpath(os.path.join(src, dest_rel)))
+            entry = {"src": de.path, "dest": str(dest_path), "timestamp": timestamp(), "rule": r,
+                     "rule_idx": rule_idx}
+            if dup_of is not None:
+                entry["duplicate_of"] = dup_of
 
-            print(f"[MATCH] {p} -> {dest_path}")
+            if preview:
+                # nothing moves, so every source is still in its directory's listing
+                planned = reservations.claim(dest_path)
+            else:
+                planned = executor.plan(p, dest_path)
+                if de.path in originals:
+                    moved_originals[de.path] = planned
+            if planned != dest_path:
+                # journaled before the move, so undo finds the file even without a done record
+                entry["planned_dest"] = str(planned)
+            add_entry(entry)
+            OUTPUT.event("match", f"[MATCH] {p} -> {planned}", rule=r, rule_idx=rule_idx,
+                         src=str(p), dest=str(planned))
             if not preview:
                 # move/rename
-                actual_dest = safe_move(p, dest_path)
-                entry["actual_dest"] = str(actual_dest)
-            applied = True
-            break  # stop at first matching rule
-        if not applied:
-            # optionally default rule; skip for now
-            pass
+                executor.submit(entry, p, planned, tag=(st, rule_idx) if st is not None else None)
+    finally:
+        if content is not None and content is not content_scanner:
+            content.close()
+        if executor is not None:
+            executor.close()
+        OUTPUT.flush()
 
     return log_entries
 
 # -------------------------
 # Logging / Undo
 # -------------------------
+class Journal:
+    """
+    Append-only JSONL action log, written while the run is in progress.
+    Records (one JSON object per line):
+      {"t": "rule", "id": 0, "idx": 2, "rule": {...}}   first use of a rule (idx: its place in the config)
+      {"t": "plan", "n": 7, "src": ..., "dest": ..., "rule": 0, ...}
+      {"t": "done", "n": 7, "dest": <actual dest>}
+      {"t": "error", "n": 7, "error": ...}
+    With durable=True each record reaches the OS immediately and fsync is
+    batched (every `fsync_every` records or `fsync_interval` seconds).
+    """
+
+    def __init__(self, path, durable=True, fsync_every=256, fsync_interval=1.0):
+        self.path = Path(path)
+        self.durable = durable
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.count = 0
+        self._rules = {}     # id(rule) -> (journal id, rule); holding rule keeps id() unique
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+        self._f = open(self.path, "a", encoding="utf-8", buffering=1024 * 1024)
+
+    def _write(self, record):
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+        self._f.write(line)
+        if self.durable:
+            self._f.flush()
+            self._unsynced += 1
+            now = time.monotonic()
+            if self._unsynced >= self.fsync_every or now - self._last_sync >= self.fsync_interval:
+                os.fsync(self._f.fileno())
+                self._unsynced = 0
+                self._last_sync = now
+
+    def _rule_id(self, rule, idx=None):
+        known = self._rules.get(id(rule))
+        if known is None:
+            known = self._rules[id(rule)] = (len(self._rules), rule)
+            record = {"t": "rule", "id": known[0]}
+            if idx is not None:
+                record["idx"] = idx
+            record["rule"] = rule
+            self._write(record)
+        return known[0]
+
+    def plan(self, entry):
+        """Record a planned action; entry gets its journal number in entry['n']."""
+        with self._lock:
+            record = {"t": "plan", "n": self.count}
+            for k, v in entry.items():
+                if k in ("actual_dest", "error", "rule_idx"):
+                    continue
+                record[k] = self._rule_id(v, entry.get("rule_idx")) if k == "rule" else v
+            entry["n"] = self.count
+            self.count += 1
+            self._write(record)
+            if "error" in entry or "actual_dest" in entry:
+                self._write_outcome(entry)
+
+    def _write_outcome(self, entry):
+        if "error" in entry:
+            self._write({"t": "error", "n": entry["n"], "error": entry["error"]})
+        elif "actual_dest" in entry:
+            self._write({"t": "done", "n": entry["n"], "dest": entry["actual_dest"]})
+
+    def append(self, record):
+        """Append any JSON-serialisable record."""
+        with self._lock:
+            self._write(record)
+
+    def done(self, entry):
+        """Record the outcome of a planned move (called from move workers)."""
+        with self._lock:
+            self._write_outcome(entry)
+
+    def close(self):
+        with self._lock:
+            self._f.flush()
+            if self.durable:
+                os.fsync(self._f.fileno())
+            self._f.close()
+
+def new_log_path(tag=None):
+    base = f"log_{timestamp()}{('_'+tag) if tag else ''}"
+    path = log_dir() / f"{base}.jsonl"
+    i = 1
+    while path.exists():
+        path = log_dir() / f"{base}_{i}.jsonl"
+        i += 1
+    return path
+
 def write_log(entries, tag=None):
+    """Write an in-memory list of entries as a journal."""
     if not entries:
         return None
-    fname = LOG_DIR / f"log_{timestamp()}{('_'+tag) if tag else ''}.json"
-    with open(fname, "w", encoding="utf-8") as f:
-        json.dump(entries, f, indent=2)
-    print(f"Actions logged to: {fname}")
+    fname = new_log_path(tag)
+    journal = Journal(fname)
+    for e in entries:
+        journal.plan(e)
+    journal.close()
+    OUTPUT.info(f"Actions logged to: {fname}")
     return fname
 
-def undo_log(logfile):
-    with open(logfile, "r", encoding="utf-8") as f:
-        entries = json.load(f)
-    # undo in reverse order
-    for e in reversed(entries):
-        src = Path(e.get("actual_dest") or e["dest"])
+def read_lines_reversed(path, block=64 * 1024):
+    """Yield the lines of a text file last to first, reading it in blocks."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        tail = b""
+        while pos > 0:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step) + tail
+            lines = chunk.split(b"\n")
+            tail = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line.decode("utf-8")
+        if tail.strip():
+            yield tail.decode("utf-8")
+
+def iter_undo_entries(logfile):
+    """
+    Entries of a log, last to first, with 'actual_dest' / 'error' filled in.
+    Journals (.jsonl) are streamed backwards; old .json logs are loaded whole.
+    """
+    if str(logfile).endswith(".json"):
+        with open(logfile, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        for n in range(len(entries) - 1, -1, -1):
+            entries[n].setdefault("n", n)
+            yield entries[n]
+        return
+    # outcomes follow their plan record, so walking backwards sees them first
+    outcomes = {}
+    for line in read_lines_reversed(logfile):
+        record = json.loads(line)
+        t = record.pop("t", None)
+        if t in ("done", "error"):
+            outcomes[record["n"]] = record
+        elif t == "plan":
+            outcome = outcomes.pop(record["n"], None)
+            if outcome is not None and "error" in outcome:
+                record["error"] = outcome["error"]
+            elif outcome is not None:
+                record["actual_dest"] = outcome["dest"]
+            yield record
+
+def undo_source(e):
+    """Where an entry's file should be now: its recorded outcome, else the name claimed for it."""
+    return e.get("actual_dest") or e.get("planned_dest") or e["dest"]
+
+class UndoRunner:
+    """
+    Restores journal entries, last to first, on `jobs` threads.
+    Entries that share a path (A->B then B->C) run in log order relative to
+    each other; independent entries run in parallel. Restored entry numbers
+    go to a checkpoint file next to the log, so a second invocation resumes
+    where an interrupted one stopped. Entries without a done record (the
+    run stopped first) are restored from their planned name if the file is
+    there, and skipped otherwise.
+    """
+
+    def __init__(self, logfile, jobs=1, max_pending=None, engine=None):
+        self.logfile = Path(logfile)
+        self.jobs = max(1, int(jobs))
+        self.engine = engine or DEFAULT_ENGINE
+        self.checkpoint = self.logfile.with_name(self.logfile.name + ".undo")
+        self.done = set()
+        if self.checkpoint.exists():
+            with open(self.checkpoint, "r", encoding="utf-8") as f:
+                self.done = {int(line) for line in f if line.strip()}
+        self._ckpt = Journal(self.checkpoint)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending or self.jobs * 64)
+        self.failed = 0
+
+    def restore(self, e):
+        if e.get("action") == "hardlink":
+            path = Path(e["src"])
+            if "error" in e or not path.exists():
+                OUTPUT.error(f"Cannot restore, not found: {path}", src=str(path), error="not found")
+                return
+            OUTPUT.event("restore", f"Restoring independent copy of {path}", src=str(path), action="unlink")
+            unlink_copy(path, e.get("mode"), e.get("mtime_ns"))
+            return
+        src = Path(undo_source(e))
         orig = Path(e["src"])
-        if src.exists():
-            print(f"Restoring {src} -> {orig}")
-            orig.parent.mkdir(parents=True, exist_ok=True)
-            safe_move(src, orig)
+        if "error" in e:
+            OUTPUT.event("restore", f"Move failed, nothing to restore: {orig}", src=str(src), dest=str(orig),
+                         action="none")
+            return
+        if not src.exists():
+            if "actual_dest" not in e:
+                OUTPUT.event("restore", f"Never moved, nothing to restore: {orig}", src=str(src),
+                             dest=str(orig), action="none")
+            elif orig.exists():
+                OUTPUT.event("restore", f"Already restored: {orig}", src=str(src), dest=str(orig),
+                             action="none")
+            else:
+                OUTPUT.error(f"Cannot restore, not found: {src}", src=str(src), error="not found")
+            return
+        OUTPUT.event("restore", f"Restoring {src} -> {orig}", src=str(src), dest=str(orig), action="move")
+        orig.parent.mkdir(parents=True, exist_ok=True)
+        if not os.path.lexists(orig) and self.engine.same_device(src.parent, orig.parent):
+            os.rename(src, orig)
         else:
-            print(f"Cannot restore, not found: {src}")
-    print("Undo complete.")
+            safe_move(src, orig, engine=self.engine)
+
+    def _run(self, e, deps):
+        try:
+            for dep in deps:
+                dep.result()
+            self.restore(e)
+            self._ckpt.append(e["n"])
+        except Exception as err:
+            with self._lock:
+                self.failed += 1
+            OUTPUT.error(f"[ERROR] undo of entry {e.get('n')} failed: {err}", n=e.get("n"), error=str(err))
+            raise
+        finally:
+            self._slots.release()
+
+    def run(self):
+        from concurrent.futures import ThreadPoolExecutor
+        last = {}      # path -> future of the latest restore touching it
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            for i, e in enumerate(iter_undo_entries(self.logfile)):
+                if e.get("n") in self.done:
+                    continue
+                paths = {e["src"], undo_source(e)}
+                deps = [last[q] for q in paths if q in last]
+                self._slots.acquire()
+                # workers take jobs in submit order, so every dep has already started
+                fut = pool.submit(self._run, e, deps)
+                for q in paths:
+                    last[q] = fut
+                if i % 4096 == 4095:
+                    last = {q: f for q, f in last.items() if not f.done()}
+        self._ckpt.close()
+        return self.failed
+
+def undo_log(logfile, jobs=1, engine=None):
+    # undo in reverse order, resuming from the checkpoint if there is one
+    failed = UndoRunner(logfile, jobs=jobs, engine=engine).run()
+    if failed:
+        OUTPUT.error("Undo incomplete — run it again to retry the remaining entries.",
+                     error="undo incomplete", failed=failed)
+    else:
+        OUTPUT.info("Undo complete.")
+
+# -------------------------
+# Plans (--plan-out / --plan)
+# -------------------------
+PLAN_VERSION = 1
+
+def _stat_key(st):
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+class PlanWriter(Journal):
+    """
+    Journal variant written by --preview --plan-out: the exact actions apply
+    should take, with the source's stat at planning time for drift checks.
+      {"t": "header", "v": 1, "roots": [...], "rules_hash": ...}
+      {"t": "rule", "id": 0, "idx": 2, "rule": {...}}
+      {"t": "plan", "n": 0, "src": ..., "dest": <final name>, "rule": 0, "stat": [size, mtime_ns, ino]}
+      {"t": "end", "count": 1, "sha256": <hash of every line above>}
+    Hard-link entries carry "action" and the original's stat in "ostat".
+    """
+
+    def __init__(self, path, roots=(), rules=()):
+        self._hash = hashlib.sha256()
+        super().__init__(path, durable=False)
+        self._f.truncate(0)
+        self._write({"t": "header", "v": PLAN_VERSION, "roots": [str(r) for r in roots],
+                     "rules_hash": rules_hash(rules), "created": timestamp()})
+
+    def _write(self, record):
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+        self._hash.update(line.encode("utf-8"))
+        self._f.write(line)
+
+    def plan(self, entry):
+        record = {"t": "plan", "n": self.count, "src": entry["src"],
+                  "dest": entry.get("planned_dest", entry["dest"])}
+        try:
+            record["stat"] = _stat_key(os.stat(entry["src"]))
+            if entry.get("action") == "hardlink":
+                record["action"] = "hardlink"
+                record["ostat"] = _stat_key(os.stat(entry["dest"]))
+        except OSError as e:
+            OUTPUT.error(f"[ERROR] {entry['src']}: {e} — left out of the plan", src=entry["src"], error=str(e))
+            return
+        if "duplicate_of" in entry:
+            record["duplicate_of"] = entry["duplicate_of"]
+        with self._lock:
+            record["rule"] = self._rule_id(entry["rule"], entry.get("rule_idx"))
+            entry["n"] = self.count
+            self.count += 1
+            self._write(record)
+
+    def done(self, entry):
+        pass
+
+    def close(self):
+        with self._lock:
+            self._f.write(json.dumps({"t": "end", "count": self.count, "sha256": self._hash.hexdigest()},
+                                     separators=(",", ":")) + "\n")
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._f.close()
+
+def read_plan(path, expect_hash=None):
+    """
+    Read a plan file once into a private copy and check its hash.
+    Returns (header, originals of hard-link entries, copy); iterate the copy
+    (a binary file at offset 0) with iter_plan, so what runs is exactly what
+    was checked even if the plan file changes meanwhile. The caller closes it.
+    Raises ValueError for a truncated, edited or unknown plan, or one made
+    with rules whose hash is not `expect_hash` (when given).
+    """
+    import tempfile
+    h = hashlib.sha256()
+    header, end, originals = None, None, set()
+    copy = tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024)
+    try:
+        with open(path, "rb") as f:
+            for line in f:
+                if end is not None:
+                    raise ValueError("data after the end record")
+                if line.startswith(b'{"t":"end"'):
+                    end = json.loads(line)
+                    continue
+                h.update(line)
+                copy.write(line)
+                if header is None:
+                    header = json.loads(line)
+                elif b'"hardlink"' in line:
+                    record = json.loads(line)
+                    if record.get("action") == "hardlink":
+                        originals.add(record["dest"])
+        if header is None or header.get("t") != "header" or header.get("v") != PLAN_VERSION:
+            raise ValueError("not a plan file")
+        if end is None:
+            raise ValueError("plan is incomplete (no end record)")
+        if end.get("sha256") != h.hexdigest():
+            raise ValueError("plan does not match its hash")
+        if expect_hash is not None and header.get("rules_hash") != expect_hash:
+            raise ValueError("plan was made with different rules than --config")
+    except BaseException:
+        copy.close()
+        raise
+    copy.seek(0)
+    return header, originals, copy
+
+def iter_plan(lines):
+    """Plan entries of read_plan's copy in order, with 'rule' resolved and the rule's config index in 'rule_idx'."""
+    rules = {}
+    for line in lines:
+        record = json.loads(line)
+        t = record.pop("t", None)
+        if t == "rule":
+            rules[record["id"]] = (record["rule"], record.get("idx"))
+        elif t == "plan":
+            record["rule"], record["rule_idx"] = rules.get(record["rule"], (None, None))
+            yield record
+
+def _drifted(path, expected, same_inode=True):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return True
+    key = _stat_key(st)
+    return key != expected if same_inode else key[:2] != expected[:2]
+
+def apply_plan(planfile, preview=False, jobs=1, journal=None, engine=None, expect_hash=None):
+    """
+    Run the actions of a plan written by --plan-out, without scanning or
+    evaluating rules. Entries whose source (or, for hard links, original)
+    changed since planning are skipped as stale. Returns (done, stale).
+    With `expect_hash` (the current rules' hash), a plan made with other
+    rules is refused with ValueError.
+    """
+    header, originals, plan = read_plan(planfile, expect_hash)
+    moved_originals = {}
+    reservations = DestReservations(reachable=lambda d: False)   # nothing is scanned
+    executor = None if preview else MoveExecutor(
+        jobs, on_done=(lambda e, tag: journal.done(e)) if journal is not None else None,
+        reservations=reservations, engine=engine)
+    done = stale = 0
+    try:
+        for e in iter_plan(plan):
+            src, dest = e["src"], e["dest"]
+            if _drifted(src, e["stat"]):
+                OUTPUT.event("stale", f"[STALE] {src} changed since the plan was made — skipped", src=src)
+                stale += 1
+                continue
+            rule, rule_idx = e["rule"], e["rule_idx"]
+            entry = {"src": src, "dest": dest, "timestamp": timestamp(), "rule": rule, "rule_idx": rule_idx}
+            if "duplicate_of" in e:
+                entry["duplicate_of"] = e["duplicate_of"]
+            if e.get("action") == "hardlink":
+                moved_to = moved_originals.get(dest)
+                if _drifted(dest if moved_to is None or os.path.exists(dest) else str(moved_to),
+                            e["ostat"], same_inode=False):
+                    OUTPUT.event("stale", f"[STALE] {dest} changed since the plan was made — {src} skipped",
+                                 src=src, original=dest)
+                    stale += 1
+                    continue
+                entry["action"] = "hardlink"
+                OUTPUT.event("dup", f"[DUP] {src} -> hard link to {dest}", rule=rule, rule_idx=rule_idx,
+                             src=src, original=dest, action="hardlink")
+                done += 1
+                if preview:
+                    continue
+                entry["mode"], entry["mtime_ns"] = os.stat(src).st_mode, e["stat"][1]
+                if journal is not None:
+                    journal.plan(entry)
+                try:
+                    hardlink_replace(Path(src), Path(dest), moved_to)
+                except OSError as err:
+                    entry["error"] = str(err)
+                    OUTPUT.error(f"[ERROR] {src}: {err}", src=src, error=str(err))
+                    if journal is not None:
+                        journal.done(entry)
+                continue
+            done += 1
+            if preview:
+                OUTPUT.event("match", f"[MATCH] {src} -> {dest}", rule=rule, rule_idx=rule_idx,
+                             src=src, dest=dest)
+                continue
+            planned = executor.plan(Path(src), Path(dest))
+            if planned != Path(dest):
+                # something new took the planned name since; fall back to the next free one
+                entry["planned_dest"] = str(planned)
+            if src in originals:
+                moved_originals[src] = planned
+            if journal is not None:
+                journal.plan(entry)
+            OUTPUT.event("match", f"[MATCH] {src} -> {planned}", rule=rule, rule_idx=rule_idx,
+                         src=src, dest=str(planned))
+            executor.submit(entry, Path(src), planned)
+    finally:
+        plan.close()
+        if executor is not None:
+            executor.close()
+        OUTPUT.flush()
+    return done, stale
 
 # -------------------------
 # Watcher (optional)
 # -------------------------
-class FolderWatcher(FileSystemEventHandler):
-    def __init__(self, src: Path, rules: dict, preview=False):
+class WatchJournal(Journal):
+    """Journal of one watch batch that also keeps the files it moved, so their events can be ignored."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.moved = []
+
+    def done(self, entry):
+        super().done(entry)
+        if "actual_dest" in entry:
+            self.moved.append(entry["actual_dest"])
+
+class FolderWatcher:
+    """
+    Collects created/moved/modified events and runs the rules on just those
+    paths once the folder has been quiet for `debounce` seconds (or at the
+    latest after `max_wait` seconds of continuous events).
+    Files the watcher moved itself are ignored for `own_ttl` seconds.
+    In apply mode each batch streams its actions to its own journal.
+    match_content checks use `content_scanner` if given (the owner closes
+    it), else one ContentScanner kept until stop().
+    """
+
+    def __init__(self, src: Path, rules: dict, preview=False, debounce=1.0,
+                 max_wait=10.0, jobs=1, own_ttl=30.0, content_scanner=None, content_jobs=None):
         self.src = src
-        self.rules = rules
+        self.rules = compile_rules(rules)
+        self._own_scanner = content_scanner is None and bool(self.rules.content)
+        self.content = ContentScanner(content_jobs) if self._own_scanner else content_scanner
         self.preview = preview
+        self.debounce = debounce
+        self.max_wait = max_wait
+        self.jobs = jobs
+        self.own_ttl = own_ttl
+        self.log_dir = str(LOG_DIR.resolve())
+        self._pending = {}     # path -> None, keeps event order
+        self._own = {}         # path we moved -> expiry time
+        self._first = self._last = 0.0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def dispatch(self, event):
+        """Entry point for watchdog's Observer (no watchdog base class needed)."""
+        handler = getattr(self, f"on_{event.event_type}", None)
+        if handler is not None:
+            handler(event)
 
     def on_created(self, event):
-        if event.is_directory:
+        # watchdog reports the files of a new directory on their own
+        if not event.is_directory:
+            self._add(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._add(event.src_path)
+
+    def on_moved(self, event):
+        self._add(event.dest_path)
+
+    def _add(self, path):
+        self.on_paths((path,))
+
+    def on_paths(self, paths):
+        """Queue changed paths; InotifyObserver delivers a whole read buffer at once."""
+        now = time.monotonic()
+        with self._cond:
+            added = False
+            for path in paths:
+                if path.startswith(self.log_dir):
+                    continue
+                expiry = self._own.get(path)
+                if expiry is not None:
+                    if expiry > now:
+                        continue
+                    del self._own[path]
+                if not self._pending:
+                    self._first = now
+                self._pending[path] = None
+                added = True
+            if added:
+                self._last = now
+                self._cond.notify()
+
+    def on_overflow(self):
+        """Events were lost (inotify queue overflow): rescan the whole folder."""
+        OUTPUT.info(f"[WARN] watch events lost — rescanning {self.src}")
+        self.on_paths((str(self.src),))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped and not self._pending:
+                    return
+                now = time.monotonic()
+                due = min(self._last + self.debounce, self._first + self.max_wait)
+                if now < due and not self._stopped:
+                    self._cond.wait(due - now)
+                    continue
+                batch = list(self._pending)
+                self._pending.clear()
+            try:
+                self.flush(batch)
+            except Exception as e:
+                OUTPUT.error(f"[ERROR] watch batch failed: {e}", error=str(e))
+
+    def flush(self, batch):
+        OUTPUT.info(f"{len(batch)} changed path(s) detected — running rules")
+        if self.preview:
+            process_folder(self.src, self.rules, preview=True, jobs=self.jobs, paths=batch,
+                           content_scanner=self.content)
             return
-        print(f"New file detected: {event.src_path} — running rules")
-        entries = process_folder(self.src, self.rules, preview=self.preview)
-        if entries and not self.preview:
-            write_log(entries, tag="watch")
+        # journaled while the moves run, so a crash mid-batch still leaves undo records
+        journal = WatchJournal(new_log_path("watch"))
+        try:
+            process_folder(self.src, self.rules, preview=False, jobs=self.jobs, paths=batch,
+                           journal=journal, content_scanner=self.content)
+        finally:
+            journal.close()
+            if journal.count:
+                OUTPUT.info(f"Actions logged to: {journal.path}")
+            else:
+                journal.path.unlink()
+        if journal.moved:
+            now = time.monotonic()
+            expiry = now + self.own_ttl
+            with self._cond:
+                self._own = {k: v for k, v in self._own.items() if v > now}
+                for dest in journal.moved:
+                    self._own[dest] = expiry
+                    # events for our own moves may have arrived while we ran
+                    self._pending.pop(dest, None)
+
+    def stop(self):
+        """Process whatever is still pending and stop the batching thread."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join()
+        if self._own_scanner:
+            self.content.close()
+
+# -------------------------
+# Native inotify backend (Linux, no watchdog needed)
+# -------------------------
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+# IN_CREATE is only acted on for directories (to watch them); a new file is
+# reported when its writer closes it, never half-written
+INOTIFY_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_ONLYDIR | IN_DONT_FOLLOW
+_INOTIFY_EVENT = struct.Struct("iIII")   # wd, mask, cookie, len; then len bytes of name
+
+WATCH_BACKENDS = ("auto", "watchdog", "inotify")
+
+_LIBC = None
+
+def _inotify_libc():
+    global _LIBC
+    if _LIBC is None:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        _LIBC = libc
+    return _LIBC
+
+def inotify_available():
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        return hasattr(_inotify_libc(), "inotify_init1")
+    except OSError:
+        return False
+
+def _libc_error():
+    import ctypes
+    err = ctypes.get_errno()
+    return OSError(err, os.strerror(err))
+
+class InotifyObserver:
+    """
+    Minimal stand-in for watchdog's Observer on top of inotify (via ctypes).
+    - schedule() watches every directory below the root; directories created
+      or moved in later get a watch as their event arrives
+    - the reader thread drains the non-blocking descriptor in `bufsize` reads
+      and hands each handler all its paths at once (handler.on_paths)
+    - on IN_Q_OVERFLOW the watches are re-synced and handler.on_overflow()
+      asks for a rescan
+    Only files closed after writing or moved in are reported.
+    """
+
+    def __init__(self, bufsize=256 * 1024):
+        self._libc = _inotify_libc()
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise _libc_error()
+        self.bufsize = bufsize
+        self.overflows = 0
+        self._roots = []       # (path, handler)
+        self._wds = {}         # wd -> (dir path, handler)
+        self._full = False
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def schedule(self, handler, path, recursive=True):
+        path = os.path.abspath(path)
+        self._roots.append((path, handler))
+        if recursive:
+            self._watch_tree(path, handler)
+        else:
+            self._watch(path, handler)
+
+    def _watch(self, path, handler):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), INOTIFY_MASK)
+        if wd < 0:
+            err = _libc_error()
+            if err.errno == errno.ENOSPC and not self._full:
+                self._full = True
+                OUTPUT.info("[WARN] inotify watch limit reached (fs.inotify.max_user_watches); "
+                            "some folders are not watched")
+            return False
+        # a directory renamed inside the tree keeps its wd: the new path replaces the old
+        self._wds[wd] = (path, handler)
+        return True
+
+    def _watch_tree(self, root, handler, found=None):
+        """Watch root and every directory below it; files seen are added to `found`."""
+        pending = [root]
+        while pending:
+            path = pending.pop()
+            # watch before listing, so nothing created in between is missed
+            if not self._watch(path, handler):
+                continue
+            try:
+                with os.scandir(path) as it:
+                    for e in it:
+                        if _is_dir(e):
+                            pending.append(e.path)
+                        elif found is not None and _is_file(e):
+                            found[e.path] = None
+            except OSError:
+                pass
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        poller = select.poll()
+        poller.register(self.fd, select.POLLIN)
+        poller.register(self._wake_r, select.POLLIN)
+        while True:
+            ready = [fd for fd, _ in poller.poll()]
+            if self._wake_r in ready:
+                return
+            chunks = []
+            while True:
+                try:
+                    data = os.read(self.fd, self.bufsize)
+                except BlockingIOError:
+                    break
+                except OSError as e:
+                    OUTPUT.error(f"[ERROR] inotify read failed: {e}", error=str(e))
+                    return
+                chunks.append(data)
+                if len(data) < self.bufsize // 2:
+                    break
+            if chunks:
+                self._dispatch(b"".join(chunks))
+
+    def _dispatch(self, data):
+        batches = {}
+        overflow = False
+        off, end, size = 0, len(data), _INOTIFY_EVENT.size
+        while off < end:
+            wd, mask, _, length = _INOTIFY_EVENT.unpack_from(data, off)
+            name = data[off + size:off + size + length].rstrip(b"\0")
+            off += size + length
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            if mask & IN_IGNORED:
+                self._wds.pop(wd, None)
+                continue
+            watch = self._wds.get(wd)
+            if watch is None or not name:
+                continue
+            dirpath, handler = watch
+            path = os.path.join(dirpath, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                # files in a new directory may predate its watch: report what is there
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch_tree(path, handler, batches.setdefault(handler, {}))
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                batches.setdefault(handler, {})[path] = None
+        if overflow:
+            self.overflows += 1
+            for root, handler in self._roots:
+                self._watch_tree(root, handler)
+        for handler, paths in batches.items():
+            handler.on_paths(list(paths))
+        if overflow:
+            for _, handler in self._roots:
+                handler.on_overflow()
+
+    def stop(self):
+        os.write(self._wake_w, b"x")
+
+    def join(self, timeout=None):
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        for fd in (self.fd, self._wake_r, self._wake_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+def make_observer(backend="auto"):
+    """Observer for --watch: watchdog when installed, else native inotify (or None)."""
+    if backend in ("auto", "watchdog"):
+        try:
+            from watchdog.observers import Observer
+            return Observer()
+        except ImportError:
+            if backend == "watchdog":
+                return None
+    if backend in ("auto", "inotify") and inotify_available():
+        return InotifyObserver()
+    return None
 
 # -------------------------
 # CLI
 # -------------------------
 def parse_args():
     p = argparse.ArgumentParser(description="File Renamer & Organizer (MVP)")
-    p.add_argument("--src", required=False, default=".", help="Source folder to operate on")
+    p.add_argument("--src", nargs="+", default=["."],
+                   help="Source folder(s) to operate on; several roots share one log")
     p.add_argument("--config", required=False, help="YAML rules config file")
     p.add_argument("--preview", action="store_true", help="Show what will be done but don't move/rename")
     p.add_argument("--apply", action="store_true", help="Actually perform changes")
     p.add_argument("--watch", action="store_true", help="Watch folder and auto-apply on new files (requires watchdog)")
-    p.add_argument("--undo-log", required=False, help="Path to a log json file to undo actions")
+    p.add_argument("--undo-log", required=False, help="Path to a log (.jsonl journal or older .json) to undo actions")
+    p.add_argument("--watch-backend", choices=WATCH_BACKENDS, default="auto",
+                   help="'auto' uses watchdog if installed, else the built-in inotify backend (Linux)")
+    p.add_argument("--plan-out", help="With --preview: write the planned actions to this plan file")
+    p.add_argument("--plan", help="Run the actions of a plan file (from --plan-out) instead of scanning; "
+                                  "with --config, refuse it if it was made with other rules")
+    p.add_argument("--daemon", action="store_true",
+                   help="With --apply: stay running and repeat the run every --interval seconds (uses a scan index)")
+    p.add_argument("--interval", type=float, default=300.0, help="Seconds between --daemon passes")
+    p.add_argument("--debounce", type=float, default=1.0,
+                   help="Seconds of quiet before a batch of watch events is processed")
+    p.add_argument("--jobs", type=int, default=1, help="Number of parallel move workers in apply and undo mode")
+    p.add_argument("--workers", type=int, default=1,
+                   help="Processes that scan and match subtrees in parallel (moves stay in one process)")
+    p.add_argument("--index", action="store_true",
+                   help="Keep a scan index under the log folder and skip files unchanged since the last apply")
+    p.add_argument("--dedupe", choices=DEDUPE_ACTIONS,
+                   help="Detect duplicate files first and skip them, move them to Duplicates/ or hard-link them")
+    p.add_argument("--verify", choices=VERIFY_MODES,
+                   help="Verify cross-device copies by size or by hash before deleting the source")
+    p.add_argument("--output", choices=OUTPUT_MODES, default="human",
+                   help="human lines, a per-rule summary, an ndjson stream, or quiet (errors only)")
+    p.add_argument("--stats", action="store_true", help="Print per-phase timings and per-rule hit counts")
+    p.add_argument("--metrics-file", help="Write the stats in Prometheus text format (e.g. for node exporter)")
+    p.add_argument("--content-jobs", type=int,
+                   help="Processes for match_content checks (default: CPU count)")
+    p.add_argument("--scan-order", choices=SCAN_ORDERS, default="sorted",
+                   help="'sorted' for deterministic per-directory order, 'none' for filesystem order (fastest)")
     return p.parse_args()
 
+_COMPILED_RULES = {}   # config file hash -> CompiledRules
+
 def load_rules(path):
+    """
+    Rules from a YAML config. The parsed rules are cached as JSON under
+    LOG_DIR, keyed by the file's hash, so an unchanged config skips
+    importing and running the YAML parser.
+    """
+    return load_compiled_rules(path).rules
+
+def load_compiled_rules(path):
+    """CompiledRules for a config file, cached in memory by the file's hash."""
     if not path:
-        return []
-    with open(path, "r", encoding="utf-8") as f:
-        data = yaml.safe_load(f)
-    return data or []
+        return compile_rules([])
+    with open(path, "rb") as f:
+        data = f.read()
+    key = hashlib.sha1(data).hexdigest()
+    compiled = _COMPILED_RULES.get(key)
+    if compiled is not None:
+        return compiled
+    cache = log_dir() / f"rules_{key[:16]}.json"
+    try:
+        with open(cache, "r", encoding="utf-8") as f:
+            rules = json.load(f)
+    except (OSError, ValueError):
+        try:
+            import yaml
+        except ImportError:
+            raise SystemExit("PyYAML required. Install with: pip install pyyaml")
+        rules = yaml.safe_load(data) or []
+        try:
+            tmp = cache.with_name(cache.name + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(rules, f)
+            os.replace(tmp, cache)
+        except (OSError, TypeError, ValueError):
+            # not JSON-serialisable (e.g. YAML dates): just not cached
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+    compiled = _COMPILED_RULES[key] = compile_rules(rules)
+    return compiled
+
+def nested_roots(roots):
+    """Pairs (outer, inner) of roots where one contains the other."""
+    return [(a, b) for a in roots for b in roots if a != b and a in b.parents]
 
 def main():
     args = parse_args()
-    src = Path(args.src).resolve()
+    set_output(args.output)
+    try:
+        run(args)
+    finally:
+        OUTPUT.finish()
+
+def run(args):
+    roots = list(dict.fromkeys(Path(s).resolve() for s in args.src))
+    engine = MoveEngine(verify=args.verify)
     if args.undo_log:
-        undo_log(args.undo_log)
+        undo_log(args.undo_log, jobs=args.jobs, engine=engine)
+        return
+
+    nested = nested_roots(roots)
+    if nested:
+        outer, inner = nested[0]
+        OUTPUT.error(f"Source folders overlap: {inner} is inside {outer}")
+        return
+    if args.plan:
+        preview_mode = not args.apply
+        # with --config, the plan must have been made with these rules
+        expect_hash = load_compiled_rules(args.config).hash if args.config else None
+        logpath = new_log_path("dry" if preview_mode else "applied")
+        journal = Journal(logpath, durable=not preview_mode)
+        try:
+            done, stale = apply_plan(args.plan, preview=preview_mode, jobs=args.jobs,
+                                     journal=journal, engine=engine, expect_hash=expect_hash)
+        except ValueError as e:
+            OUTPUT.error(f"Cannot use plan {args.plan}: {e}")
+            return
+        finally:
+            journal.close()
+            if not journal.count:
+                logpath.unlink()
+        if journal.count:
+            OUTPUT.info(f"Actions logged to: {logpath}")
+        OUTPUT.info(f"\n{done} planned action(s) {'still valid' if preview_mode else 'applied'}, {stale} stale.")
         return
 
-    rules = load_rules(args.config)
+    rules = load_compiled_rules(args.config)
     preview_mode = args.preview or not args.apply
+    if args.plan_out and not preview_mode:
+        OUTPUT.error("--plan-out is only used with --preview")
+        return
+    if args.daemon and (args.watch or args.plan_out):
+        OUTPUT.error("--daemon cannot be combined with --watch or --plan-out")
+        return
+    if args.daemon and preview_mode:
+        # the index only records applied files: every preview pass would report and log everything again
+        OUTPUT.error("--daemon needs --apply")
+        return
+    stats = enable_stats() if args.stats or args.metrics_file else None
 
     if args.watch:
-        if not WATCHDOG_AVAILABLE:
-            print("watchdog not available. Install: pip install watchdog")
+        observer = make_observer(args.watch_backend)
+        if observer is None:
+            OUTPUT.error(f"No watch backend available ({args.watch_backend}). Install: pip install watchdog")
             return
-        print(f"Watching {src} — preview={preview_mode}")
-        event_handler = FolderWatcher(src, rules, preview=preview_mode)
-        observer = Observer()
-        observer.schedule(event_handler, str(src), recursive=True)
+        # one match_content pool and cache for every root and batch
+        scanner = ContentScanner(args.content_jobs) if rules.content else None
+        handlers = []
+        for src in roots:
+            OUTPUT.info(f"Watching {src} — preview={preview_mode}")
+            handler = FolderWatcher(src, rules, preview=preview_mode, debounce=args.debounce,
+                                    jobs=args.jobs, content_scanner=scanner)
+            observer.schedule(handler, str(src), recursive=True)
+            handlers.append(handler)
         observer.start()
         try:
             while True:
@@ -255,23 +2859,121 @@ def main():
         except KeyboardInterrupt:
             observer.stop()
         observer.join()
+        for handler in handlers:
+            handler.stop()
+        if scanner is not None:
+            scanner.close()
         return
 
-    entries = process_folder(src, rules, preview=preview_mode)
-    if entries:
-        logpath = write_log(entries, tag="dry" if preview_mode else "applied")
+    if args.daemon:
+        run_daemon(roots, args, engine, preview_mode, stats)
+        return
+    indexes = {}
+    if args.index:
+        indexes = {src: ScanIndex(src, rules.hash) for src in roots}
+    # --workers runs the content checks in its own processes
+    scanner = ContentScanner(args.content_jobs) if rules.content and args.workers <= 1 else None
+    try:
+        run_pass(roots, rules, args, engine, preview_mode, indexes, scanner)
+    finally:
+        if scanner is not None:
+            scanner.close()
+        for index in indexes.values():
+            index.close()
+    if stats is not None:
+        if args.stats:
+            OUTPUT.info("\n" + stats.report(rules.rules))
+        if args.metrics_file:
+            stats.write_prometheus(args.metrics_file, rules.rules)
+
+def run_pass(roots, rules, args, engine, preview_mode, indexes, content_scanner=None):
+    """One scan over every root: a normal run, or one pass of --daemon."""
+    if args.plan_out:
+        logpath = Path(args.plan_out)
+        journal = PlanWriter(logpath, roots, rules.rules)
+    else:
+        logpath = new_log_path("dry" if preview_mode else "applied")
+        # one journal for every root, so one --undo-log reverts the whole run
+        journal = Journal(logpath, durable=not preview_mode)
+    pool = None
+    if args.workers > 1:
+        pool = SubtreePool(roots, rules, workers=args.workers, order=args.scan_order,
+                           indexes=indexes)
+    try:
+        for src in roots:
+            duplicates = None
+            if args.dedupe:
+                duplicates = find_duplicates(src, order=args.scan_order, jobs=max(args.jobs, 4))
+            process_folder(src, rules, preview=preview_mode, order=args.scan_order,
+                           jobs=args.jobs, index=indexes.get(src), duplicates=duplicates,
+                           dedupe=args.dedupe or "move", journal=journal, engine=engine,
+                           content_jobs=args.content_jobs, content_scanner=content_scanner,
+                           classified=pool.results(src) if pool is not None else None)
+    finally:
+        if pool is not None:
+            pool.close()
+        journal.close()
+    if args.plan_out:
+        OUTPUT.info(f"Plan with {journal.count} action(s) written to: {logpath}")
+        OUTPUT.info(f"\nTo apply exactly this plan run with --apply --plan {logpath}")
+    elif journal.count:
+        OUTPUT.info(f"Actions logged to: {logpath}")
         if preview_mode:
-            print("\nPreview mode — no changes made. To apply run with --apply")
+            OUTPUT.info("\nPreview mode — no changes made. To apply run with --apply")
         else:
-            print("\nChanges applied.")
+            OUTPUT.info("\nChanges applied.")
     else:
-        print("No files matched the rules.")
+        logpath.unlink()
+        OUTPUT.info("No files matched the rules.")
+    return journal.count
 
-if __name__ == "__main__":
+def _stop_on_sigterm(signum, frame):
+    raise KeyboardInterrupt
+
+def run_daemon(roots, args, engine, preview_mode, stats=None):
+    """
+    --daemon: a pass every `--interval` seconds in this process. The config
+    is re-read each pass but only recompiled when its hash changes, and a
+    scan index per root (kept open) limits each pass to new or changed files.
+    The match_content pool and its cache also live as long as the daemon.
+    """
+    import signal
+    signal.signal(signal.SIGTERM, _stop_on_sigterm)
+    rules, indexes, scanner = None, {}, None
+    OUTPUT.info(f"Daemon: a pass every {args.interval:g}s over {len(roots)} folder(s)")
     try:
-        import yaml  # ensure yaml available
-    except Exception:
-        print("PyYAML required. Install with: pip install pyyaml")
-        sys.exit(1)
+        while True:
+            start = time.monotonic()
+            try:
+                current = load_compiled_rules(args.config)
+            except Exception as e:
+                if rules is None:
+                    raise
+                OUTPUT.error(f"[ERROR] cannot reload {args.config}: {e} — keeping the previous rules")
+                current = rules
+            if current is not rules:
+                for index in indexes.values():
+                    index.close()
+                rules = current
+                indexes = {src: ScanIndex(src, rules.hash) for src in roots}
+                if scanner is None and rules.content and args.workers <= 1:
+                    scanner = ContentScanner(args.content_jobs)
+            try:
+                run_pass(roots, rules, args, engine, preview_mode, indexes, scanner)
+            except Exception as e:
+                OUTPUT.error(f"[ERROR] pass failed: {e}")
+            if stats is not None and args.metrics_file:
+                stats.write_prometheus(args.metrics_file, rules.rules)
+            OUTPUT.flush()
+            time.sleep(max(0.0, args.interval - (time.monotonic() - start)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for index in indexes.values():
+            index.close()
+        if scanner is not None:
+            scanner.close()
+
+if __name__ == "__main__":
     main()
 
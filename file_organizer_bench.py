@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for file_organizer.py
+- Synthetic tree generator (file count, depth, extension mix, name collisions)
+- Rule scenarios (built in, or a YAML rules file)
+- Benchmarks: scan, preview, apply, undo, watch (event -> action latency),
+  events (filesystem events/sec delivered by a watch backend)
+- Each run happens in a fresh process; reports files/sec, peak RSS and
+  read/write syscall counts (from /proc/self/io where available)
+- Results are saved as JSON and can be compared between commits
+
+Usage examples:
+  python file_organizer_bench.py --files 100000 --out results.json
+  python file_organizer_bench.py --bench apply --scenario by_ext --jobs 8 --repeat 5
+  python file_organizer_bench.py --bench events --watch-backend inotify --watch-backend watchdog
+  python file_organizer_bench.py --compare before.json after.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+# -------------------------
+# Rule scenarios
+# -------------------------
+SCENARIOS = {
+    "by_ext": [
+        {"match_ext": ["jpg", "jpeg", "png"], "action": "move", "target_folder": "Photos"},
+        {"match_ext": ["pdf", "docx"], "action": "move", "target_folder": "Documents"},
+        {"match_ext": ["mp4", "mov"], "action": "move", "organize_by": "extension"},
+    ],
+    "glob": [
+        {"match_glob": "invoices/*.pdf", "action": "move", "target_folder": "Finance/Invoices"},
+        {"match_glob": "IMG_*.jpg", "action": "move", "target_folder": "Photos"},
+        {"match_glob": "*.txt", "action": "move", "target_folder": "Text"},
+    ],
+    "rename": [
+        {"match_ext": ["jpg", "png"], "action": "rename", "pattern": "{orig}_{seq}",
+         "target_folder": "Renamed"},
+    ],
+    # 100 extension rules that never match, then the real ones
+    "many_rules": [
+        {"match_ext": [f"x{i:03d}"], "action": "move", "target_folder": f"X{i:03d}"} for i in range(100)
+    ] + [
+        {"match_glob": "*/*.pdf", "action": "move", "target_folder": "Documents"},
+        {"match_ext": ["jpg", "png", "txt", "mp4"], "action": "move", "organize_by": "extension"},
+    ],
+}
+
+BENCHES = ("scan", "preview", "apply", "undo", "watch", "events")
+DEFAULT_EXT_MIX = "jpg:40,png:10,pdf:15,txt:20,mp4:5,docx:5,log:5"
+
+# -------------------------
+# Synthetic tree generator
+# -------------------------
+def parse_ext_mix(spec: str):
+    exts, weights = [], []
+    for part in spec.split(","):
+        ext, _, w = part.partition(":")
+        exts.append(ext.strip())
+        weights.append(float(w or 1))
+    return exts, weights
+
+def generate_tree(root: Path, files=10000, depth=3, fanout=8, ext_mix=DEFAULT_EXT_MIX,
+                  collision_rate=0.1, size=64, seed=1):
+    """
+    Build a tree of `files` files under root.
+    Directories are nested up to `depth` levels with `fanout` children each;
+    `collision_rate` of the files draw their name from a small pool
+    (IMG_0000..IMG_0099) so destinations collide.
+    """
+    rng = random.Random(seed)
+    exts, weights = parse_ext_mix(ext_mix)
+    root.mkdir(parents=True, exist_ok=True)
+    dirs = [root]
+    frontier = [root]
+    for _ in range(depth):
+        nxt = []
+        for d in frontier:
+            for j in range(fanout):
+                sub = d / ("invoices" if j == 0 else f"d{j}")
+                sub.mkdir(exist_ok=True)
+                nxt.append(sub)
+        dirs.extend(nxt)
+        frontier = nxt
+    payload = b"x" * size
+    for i in range(files):
+        d = dirs[rng.randrange(len(dirs))]
+        ext = rng.choices(exts, weights)[0]
+        if rng.random() < collision_rate:
+            stem = f"IMG_{rng.randrange(100):04d}"
+        else:
+            stem = f"file_{i:07d}"
+        path = d / f"{stem}.{ext}"
+        if path.exists():
+            path = d / f"{stem}_{i}.{ext}"
+        with open(path, "wb") as f:
+            f.write(payload)
+    return len(dirs)
+
+# what a run leaves in the work directory: the trees and file_organizer's LOG_DIR
+WORK_ITEMS = ("tree", ".file_organizer_logs")
+
+def default_workdir():
+    shm = Path("/dev/shm")
+    base = shm if shm.is_dir() and os.access(shm, os.W_OK) else Path(tempfile.gettempdir())
+    return base / "file_organizer_bench"
+
+# -------------------------
+# Measurement (runs inside the child process)
+# -------------------------
+def _proc_io():
+    counters = {}
+    try:
+        with open("/proc/self/io", "r") as f:
+            for line in f:
+                k, _, v = line.partition(":")
+                counters[k.strip()] = int(v)
+    except OSError:
+        pass
+    return counters
+
+def _peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+def _count_files(root: Path):
+    return sum(len(names) for _, _, names in os.walk(root))
+
+def _run_bench(cfg):
+    """Run one benchmark in this (fresh) process and return its metrics."""
+    work = Path(cfg["work"])
+    os.chdir(work)            # file_organizer keeps its logs in the cwd
+    sys.path.insert(0, str(HERE))
+    import contextlib
+    import file_organizer as fo
+
+    tree = work / "tree"
+    rules = cfg["rules"]
+    bench = cfg["bench"]
+    devnull = open(os.devnull, "w")
+    extra = {}
+
+    if bench in ("apply", "undo", "watch", "events"):
+        shutil.rmtree(tree, ignore_errors=True)
+        generate_tree(tree, **cfg["tree"])
+    files = _count_files(tree)
+
+    if bench == "undo":
+        with contextlib.redirect_stdout(devnull):
+            journal = fo.Journal(fo.new_log_path("bench"))
+            fo.process_folder(tree, rules, preview=False, jobs=cfg["jobs"], journal=journal)
+            journal.close()
+        logfile = journal.path
+
+    io_before = _proc_io()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(devnull):
+        if bench == "scan":
+            files = sum(1 for _ in fo.scan_files(tree, cfg["order"]))
+        elif bench == "preview":
+            journal = fo.Journal(fo.new_log_path("bench"), durable=False)
+            fo.process_folder(tree, rules, preview=True, order=cfg["order"], journal=journal)
+            journal.close()
+            extra["actions"] = journal.count
+        elif bench == "apply":
+            journal = fo.Journal(fo.new_log_path("bench"))
+            fo.process_folder(tree, rules, preview=False, order=cfg["order"], jobs=cfg["jobs"],
+                              journal=journal)
+            journal.close()
+            extra["actions"] = journal.count
+        elif bench == "undo":
+            fo.undo_log(logfile, jobs=cfg["jobs"])
+        elif bench == "watch":
+            extra.update(_watch_latency(fo, tree, rules, cfg))
+            files = cfg["events"]
+        elif bench == "events":
+            extra.update(_event_rate(fo, tree, cfg))
+            files = cfg["events"]
+    elapsed = time.perf_counter() - start
+    io_after = _proc_io()
+
+    result = {
+        "files": files,
+        "seconds": elapsed,
+        "files_per_sec": files / elapsed if elapsed else None,
+        "peak_rss_kb": _peak_rss_kb(),
+        "syscr": io_after.get("syscr", 0) - io_before.get("syscr", 0) if io_after else None,
+        "syscw": io_after.get("syscw", 0) - io_before.get("syscw", 0) if io_after else None,
+    }
+    result.update(extra)
+    return result
+
+def _watch_latency(fo, tree, rules, cfg):
+    """Feed created events for new files and time event -> processed batch."""
+    class Event:
+        is_directory = False
+
+        def __init__(self, path):
+            self.src_path = path
+
+    done_at = {}
+    watcher = fo.FolderWatcher(tree, rules, preview=False, debounce=cfg["debounce"], jobs=cfg["jobs"])
+    flush = watcher.flush
+
+    def timed_flush(batch):
+        flush(batch)
+        now = time.perf_counter()
+        for path in batch:
+            done_at[path] = now
+
+    watcher.flush = timed_flush
+    incoming = tree / "incoming"
+    incoming.mkdir(exist_ok=True)
+    sent = {}
+    for i in range(cfg["events"]):
+        path = str(incoming / f"new_{i:06d}.jpg")
+        with open(path, "wb") as f:
+            f.write(b"x")
+        sent[path] = time.perf_counter()
+        watcher.on_created(Event(path))
+    watcher.stop()
+    lat = sorted(done_at[p] - t for p, t in sent.items() if p in done_at)
+    if not lat:
+        return {"events": len(sent)}
+    return {
+        "events": len(sent),
+        "latency_p50_ms": lat[len(lat) // 2] * 1000,
+        "latency_p95_ms": lat[min(len(lat) - 1, int(len(lat) * 0.95))] * 1000,
+        "latency_max_ms": lat[-1] * 1000,
+    }
+
+def _event_rate(fo, tree, cfg):
+    """
+    Create files under a watched tree and time until the watcher has seen
+    them all. Watch setup (one watch per directory) is reported separately.
+    """
+    import threading
+    n = cfg["events"]
+    incoming = tree / "burst"
+    incoming.mkdir(exist_ok=True)
+    sent = {str(incoming / f"ev_{i:06d}.dat") for i in range(n)}
+    seen = set()
+    all_seen = threading.Event()
+    watcher = fo.FolderWatcher(tree, [], preview=True, debounce=cfg["debounce"])
+
+    def count(batch):
+        seen.update(p for p in batch if p in sent)
+        if len(seen) >= n:
+            all_seen.set()
+
+    watcher.flush = count
+    t0 = time.perf_counter()
+    observer = fo.make_observer(cfg["watch_backend"])
+    if observer is None:
+        raise RuntimeError(f"watch backend not available: {cfg['watch_backend']}")
+    observer.schedule(watcher, str(tree), recursive=True)
+    observer.start()
+    setup = time.perf_counter() - t0
+    start = time.perf_counter()
+    for path in sorted(sent):
+        with open(path, "wb") as f:
+            f.write(b"x")
+    all_seen.wait(timeout=60)
+    elapsed = time.perf_counter() - start
+    observer.stop()
+    observer.join()
+    watcher.stop()
+    return {
+        "backend": type(observer).__name__,
+        "events": len(seen),
+        "events_per_sec": len(seen) / elapsed if elapsed else None,
+        "setup_ms": setup * 1000,
+    }
+
+def _child(cfg, out):
+    try:
+        out.put(_run_bench(cfg))
+    except Exception as e:
+        out.put({"error": repr(e)})
+
+def run_isolated(cfg, timeout=None):
+    """
+    One benchmark run in a fresh process. A run that takes longer than
+    `timeout` seconds is killed, and one that dies without a result is
+    recorded as failed; either way the suite goes on.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(cfg, out))
+    proc.start()
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        wait = 1 if deadline is None else max(0, min(1, deadline - time.monotonic()))
+        try:
+            result = out.get(timeout=wait)
+            break
+        except queue.Empty:
+            pass
+        if not proc.is_alive():
+            try:
+                # the result may still be in the pipe
+                result = out.get(timeout=1)
+            except queue.Empty:
+                result = {"error": f"benchmark process died (exit code {proc.exitcode})"}
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            proc.terminate()
+            result = {"error": f"timed out after {timeout:g} s"}
+            break
+    proc.join()
+    return result
+
+# -------------------------
+# Suite
+# -------------------------
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def clean_workdir(work: Path, created: bool):
+    """Remove what the harness wrote; the directory itself only if the harness made it."""
+    for name in WORK_ITEMS:
+        shutil.rmtree(work / name, ignore_errors=True)
+    if created:
+        try:
+            work.rmdir()
+        except OSError:
+            pass
+
+def run_suite(args):
+    work = Path(args.workdir) if args.workdir else default_workdir()
+    created = not work.exists()
+    work.mkdir(parents=True, exist_ok=True)
+    tree_cfg = {
+        "files": args.files, "depth": args.depth, "fanout": args.fanout, "ext_mix": args.ext_mix,
+        "collision_rate": args.collision_rate, "size": args.size, "seed": args.seed,
+    }
+    if args.rules:
+        import yaml
+        with open(args.rules, "r", encoding="utf-8") as f:
+            scenarios = {Path(args.rules).stem: yaml.safe_load(f) or []}
+    else:
+        names = args.scenario or list(SCENARIOS)
+        scenarios = {n: SCENARIOS[n] for n in names}
+    benches = args.bench or list(BENCHES)
+
+    # read-only benchmarks share one tree
+    if any(b in ("scan", "preview") for b in benches):
+        shutil.rmtree(work / "tree", ignore_errors=True)
+        print(f"Generating {args.files} files under {work / 'tree'}")
+        generate_tree(work / "tree", **tree_cfg)
+
+    results = []
+    for bench in benches:
+        # rules do not affect the scan, so it runs once; events runs once per backend
+        if bench == "events":
+            items = [(b, []) for b in args.watch_backend or ["auto"]]
+        elif bench == "scan":
+            items = list(scenarios.items())[:1]
+        else:
+            items = scenarios.items()
+        for name, rules in items:
+            runs = []
+            for _ in range(args.repeat):
+                cfg = {
+                    "work": str(work), "bench": bench, "rules": rules, "tree": tree_cfg,
+                    "jobs": args.jobs, "order": args.scan_order, "debounce": args.debounce,
+                    "events": args.events, "watch_backend": name if bench == "events" else None,
+                }
+                runs.append(run_isolated(cfg, args.timeout))
+            ok = [r for r in runs if "error" not in r]
+            row = {"bench": bench, "scenario": "-" if bench == "scan" else name, "runs": runs}
+            if ok:
+                row["files_per_sec"] = statistics.median(r["files_per_sec"] for r in ok)
+                row["peak_rss_kb"] = max(r["peak_rss_kb"] or 0 for r in ok)
+                if "latency_p95_ms" in ok[0]:
+                    row["latency_p95_ms"] = statistics.median(r["latency_p95_ms"] for r in ok)
+                if "events_per_sec" in ok[0]:
+                    row["events_per_sec"] = statistics.median(r["events_per_sec"] for r in ok)
+            results.append(row)
+            print(format_row(row))
+
+    report = {
+        "meta": {
+            "revision": git_revision(), "python": platform.python_version(),
+            "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "tree": tree_cfg, "jobs": args.jobs, "scan_order": args.scan_order, "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to: {args.out}")
+    if not args.keep:
+        clean_workdir(work, created)
+    return report
+
+def format_row(row):
+    if "files_per_sec" not in row:
+        return f"{row['bench']:8} {row['scenario']:12} ERROR {row['runs'][0].get('error')}"
+    text = (f"{row['bench']:8} {row['scenario']:12} {row['files_per_sec']:12,.0f} files/s"
+            f"  peak RSS {row['peak_rss_kb'] / 1024:8.1f} MiB")
+    if "latency_p95_ms" in row:
+        text += f"  p95 latency {row['latency_p95_ms']:.1f} ms"
+    if "events_per_sec" in row:
+        text += f"  {row['events_per_sec']:,.0f} events/s"
+    return text
+
+def compare(old_path, new_path):
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    before = {(r["bench"], r["scenario"]): r for r in old["results"]}
+    print(f"{old['meta'].get('revision')} -> {new['meta'].get('revision')}")
+    for r in new["results"]:
+        o = before.get((r["bench"], r["scenario"]))
+        if not o or "files_per_sec" not in o or "files_per_sec" not in r:
+            continue
+        speed = r["files_per_sec"] / o["files_per_sec"]
+        rss = r["peak_rss_kb"] / o["peak_rss_kb"] if o["peak_rss_kb"] else float("nan")
+        print(f"{r['bench']:8} {r['scenario']:12} speed x{speed:5.2f}  RSS x{rss:5.2f}")
+
+# -------------------------
+# CLI
+# -------------------------
+def parse_args():
+    p = argparse.ArgumentParser(description="Benchmarks for file_organizer.py")
+    p.add_argument("--bench", action="append", choices=BENCHES, help="Benchmark to run (repeatable; default all)")
+    p.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Rule scenario (repeatable; default all)")
+    p.add_argument("--rules", help="YAML rules file to use instead of the built-in scenarios")
+    p.add_argument("--files", type=int, default=20000, help="Number of files in the synthetic tree")
+    p.add_argument("--depth", type=int, default=3, help="Directory nesting depth")
+    p.add_argument("--fanout", type=int, default=6, help="Subdirectories per directory")
+    p.add_argument("--ext-mix", default=DEFAULT_EXT_MIX, help="Extension weights, e.g. 'jpg:40,pdf:20'")
+    p.add_argument("--collision-rate", type=float, default=0.1, help="Fraction of files with colliding names")
+    p.add_argument("--size", type=int, default=64, help="Bytes per file")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--jobs", type=int, default=1, help="--jobs passed to apply/undo/watch")
+    p.add_argument("--scan-order", default="sorted", choices=("sorted", "none"))
+    p.add_argument("--debounce", type=float, default=0.05, help="Watcher debounce for the watch benchmark")
+    p.add_argument("--events", type=int, default=2000, help="Created events fed to the watcher")
+    p.add_argument("--watch-backend", action="append", choices=("auto", "watchdog", "inotify"),
+                   help="Backend for the events benchmark (repeatable; default auto)")
+    p.add_argument("--repeat", type=int, default=3, help="Runs per benchmark (median is reported)")
+    p.add_argument("--timeout", type=float, default=600,
+                   help="Seconds one run may take before it is killed and recorded as failed (0: no limit)")
+    p.add_argument("--workdir", help="Where trees are generated (default: /dev/shm if writable)")
+    p.add_argument("--keep", action="store_true",
+                   help="Keep the generated trees (otherwise only what the harness wrote is removed)")
+    p.add_argument("--out", help="Write results JSON here")
+    p.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two results files")
+    return p.parse_args()
+
+def main():
+    args = parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+    run_suite(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,729 @@
+"""Tests for file_organizer.py (run with: python -m pytest)"""
+
+import errno
+import io
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path, PurePosixPath
+
+import pytest
+
+import file_organizer as fo
+
+RULES = [
+    {"match_ext": ["jpg"], "action": "move", "target_folder": "Photos"},
+    {"match_ext": ["pdf"], "action": "move", "target_folder": "Docs"},
+]
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Run each test in its own folder (logs and indexes go under LOG_DIR in the cwd), quietly."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(fo, "_LOG_DIR_READY", False)
+    monkeypatch.setattr(fo, "OUTPUT", fo.Reporter("quiet"))
+    return tmp_path
+
+
+def make_files(root: Path, *names, data=b"x"):
+    for name in names:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+
+def tree(root: Path):
+    return sorted(p.relative_to(root).as_posix() for p in root.rglob("*") if p.is_file())
+
+
+def cli(monkeypatch, *argv):
+    """One command-line run, as `python file_organizer.py ARGV`."""
+    monkeypatch.setattr("sys.argv", ["file_organizer.py", *argv])
+    fo.run(fo.parse_args())
+
+
+def apply(src, rules=RULES, **kwargs):
+    """One apply run with a journal; returns the journal path."""
+    journal = fo.Journal(fo.new_log_path("applied"))
+    try:
+        fo.process_folder(src, rules, preview=False, journal=journal, **kwargs)
+    finally:
+        journal.close()
+    return journal.path
+
+
+# -------------------------
+# Rule matching
+# -------------------------
+GLOBS = ["*.pdf", "*.PDF", "docs/*.pdf", "/docs/*.pdf", "a/*/c.txt", "photos/", "a/b/", "./x.pdf",
+         "a//x.pdf", "?.txt", "[ab].txt", "[!a].txt", "[!]]x", "[]]x", "[a-c]x", "[c-a]x",
+         "[!c-a]x", "[a-b-c]", "[-a]", "[a-]", "[", "a[b", "*[", "**.pdf", "a.b+c(1).txt"]
+PATHS = ["x.pdf", "X.PDF", "docs/x.pdf", "a/docs/x.pdf", "a/b/c.txt", "a/x/y/c.txt", "photos",
+         "a/photos", "photos/x", "a/b", "b", "a.txt", "b.txt", "c.txt", "ax", "]x", "bx", "dx",
+         "-", "a", "c", "[", "a[b", "x[", "a.b+c(1).txt", "a/x.pdf"]
+
+
+@pytest.mark.parametrize("pattern", GLOBS)
+def test_match_glob_agrees_with_path_match(pattern):
+    rules = fo.compile_rules([{"match_glob": pattern, "action": "move"}])
+    for rel in PATHS:
+        assert (rules.match("", rel)[0] == 0) == PurePosixPath(rel).match(pattern), rel
+
+
+# -------------------------
+# Scan index
+# -------------------------
+@pytest.fixture
+def src(workdir):
+    root = (workdir / "src").resolve()
+    make_files(root, "a.jpg", "b.pdf", "notes.txt")
+    return root
+
+
+def test_index_skips_unchanged_files(src):
+    index = fo.ScanIndex(src, "h")
+    path = str(src / "notes.txt")
+    st = os.stat(path)
+    assert not index.unchanged(path, st)
+    index.record(path, st)
+    assert index.unchanged(path, st)
+    index.close()
+
+    # kept across runs with the same rules
+    index = fo.ScanIndex(src, "h")
+    assert index.unchanged(path, st)
+    index.close()
+
+
+def test_index_invalidated_by_change_rename_or_new_rules(src):
+    index = fo.ScanIndex(src, "h")
+    path = str(src / "notes.txt")
+    index.record(path, os.stat(path))
+
+    os.utime(path, ns=(0, 0))
+    assert not index.unchanged(path, os.stat(path))
+
+    index.record(path, os.stat(path))
+    moved = str(src / "moved.txt")
+    os.rename(path, moved)
+    assert not index.unchanged(moved, os.stat(moved))
+    index.close()
+
+    os.rename(moved, path)
+    index = fo.ScanIndex(src, "other rules")
+    assert not index.unchanged(path, os.stat(path))
+    index.close()
+
+
+def test_index_skips_moved_files_and_rescans_undone_ones(src):
+    index = fo.ScanIndex(src, fo.rules_hash(RULES))
+    log = apply(src, index=index)
+    assert tree(src) == ["Docs/b.pdf", "Photos/a.jpg", "notes.txt"]
+
+    # files the run moved (and the unmatched one) are not looked at again
+    assert apply(src, index=index).read_text() == ""
+
+    fo.undo_log(log)
+    assert tree(src) == ["a.jpg", "b.pdf", "notes.txt"]
+    apply(src, index=index)
+    assert tree(src) == ["Docs/b.pdf", "Photos/a.jpg", "notes.txt"]
+    index.close()
+
+
+# -------------------------
+# Destination reservations
+# -------------------------
+def test_reservations_add_next_free_suffix(workdir):
+    make_files(workdir / "out", "a.jpg", "a_1.jpg", "b")
+    res = fo.DestReservations()
+    out = workdir / "out"
+    assert res.claim(out / "a.jpg") == out / "a_2.jpg"
+    assert res.claim(out / "a.jpg") == out / "a_3.jpg"
+    assert res.claim(out / "b") == out / "b_1"
+    assert res.claim(out / "c.jpg") == out / "c.jpg"
+    assert res.claim(out / "c.jpg") == out / "c_1.jpg"
+    assert res.claim(workdir / "new" / "a.jpg") == workdir / "new" / "a.jpg"
+
+
+def test_reservations_drop_idle_listings_but_keep_claims(workdir):
+    out = workdir / "out"
+    make_files(workdir, "in/a.jpg", "in/b.jpg")
+    res = fo.DestReservations(keep_idle=0)
+    planned = res.queue(workdir / "in" / "a.jpg", out / "a.jpg")
+    assert planned == out / "a.jpg"
+    fo.safe_move(workdir / "in" / "a.jpg", planned, res)
+    res.done(workdir / "in" / "a.jpg", planned)
+    assert str(out) not in res._dirs and not res._sources
+
+    # listed again, so the moved file still takes its name
+    assert res.queue(workdir / "in" / "b.jpg", out / "a.jpg") == out / "a_1.jpg"
+    assert res.is_claimed(str(out / "a.jpg")) and res.is_claimed(str(out / "a_1.jpg"))
+
+
+def test_reservations_keep_claims_only_where_the_scan_can_reach(workdir):
+    make_files(workdir, "in/a.jpg", "in/b.jpg")
+    out = workdir / "out"
+    scan_reaches = {str(out): True}
+    res = fo.DestReservations(reachable=lambda d: scan_reaches.get(d, False))
+    res.queue(workdir / "in" / "a.jpg", out / "a.jpg")
+    res.queue(workdir / "in" / "b.jpg", workdir / "elsewhere" / "b.jpg")
+    assert res.is_claimed(str(out / "a.jpg"))
+    assert not res.is_claimed(str(workdir / "elsewhere" / "b.jpg"))
+
+    scan_reaches[str(out)] = False
+    res.sweep()
+    assert not res._claimed
+    # the names stay taken
+    assert res.claim(out / "a.jpg") == out / "a_1.jpg"
+
+
+def test_moved_files_ahead_of_the_scan_are_not_moved_again(workdir, monkeypatch):
+    src = (workdir / "src").resolve()
+    make_files(src, "0/x.jpg", "a/y.jpg", "b/z.jpg", "zz/keep.txt")
+    made = []
+
+    class Recorded(fo.DestReservations):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            made.append(self)
+    monkeypatch.setattr(fo, "DestReservations", Recorded)
+
+    rules = [{"match_ext": ["jpg"], "action": "move", "target_folder": "zz"},
+             {"match_ext": ["txt"], "action": "move", "target_folder": "0"}]
+    fo.process_folder(src, rules, preview=False, jobs=2)
+    assert tree(src) == ["0/keep.txt", "zz/x.jpg", "zz/y.jpg", "zz/z.jpg"]
+    # the scan was past 0/ when keep.txt moved there: no claim was kept for it
+    assert list(made[0]._claimed) == [str(src / "zz")]
+
+
+def test_preview_names_match_apply(workdir):
+    src = (workdir / "src").resolve()
+    make_files(src, "x/a.jpg", "y/a.jpg", "z/a.jpg", "z/b.pdf")
+    make_files(workdir, "out/a.jpg")
+    rules = [{"match_ext": ["jpg"], "action": "move", "target_folder": "../out"}]
+    preview = fo.process_folder(src, rules, preview=True)
+    planned = [e.get("planned_dest", e["dest"]) for e in preview]
+    assert [os.path.basename(p) for p in planned] == ["a_1.jpg", "a_2.jpg", "a_3.jpg"]
+
+    applied = fo.process_folder(src, rules, preview=False, jobs=4)
+    assert [e["actual_dest"] for e in applied] == planned
+    assert tree(workdir / "out") == ["a.jpg", "a_1.jpg", "a_2.jpg", "a_3.jpg"]
+
+
+# -------------------------
+# Stats
+# -------------------------
+@pytest.mark.parametrize("workers", [1, 2])
+def test_stats_count_rules_and_walk_with_or_without_workers(workdir, monkeypatch, workers):
+    src = (workdir / "src").resolve()
+    make_files(src, "a.jpg", "b.pdf", "c.txt", "d/e.jpg")
+    stats = fo.Stats()
+    monkeypatch.setattr(fo, "STATS", stats)
+    pool = fo.SubtreePool([src], RULES, workers=workers) if workers > 1 else None
+    try:
+        fo.process_folder(src, RULES, preview=True, classified=pool.results(src) if pool else None)
+    finally:
+        if pool is not None:
+            pool.close()
+    assert {idx: hits for idx, (hits, _) in stats.rules.items()} == {0: 2, 1: 1, None: 1}
+    assert stats.phases["walk"][0] == 4
+
+
+# -------------------------
+# Move engine
+# -------------------------
+class CrossDevice(fo.MoveEngine):
+    """Takes the copy path as if source and destination were on different devices."""
+
+    def same_device(self, src_dir, dest_dir):
+        return False
+
+
+@pytest.fixture
+def payload(workdir):
+    src = workdir / "in" / "a.bin"
+    make_files(workdir / "in", "a.bin", data=bytes(range(256)) * 41)
+    os.utime(src, (1_000_000, 1_000_000))
+    (workdir / "out").mkdir()
+    return src, workdir / "out" / "a.bin"
+
+
+@pytest.mark.parametrize("verify", [None, "size", "hash"])
+@pytest.mark.parametrize("fallback", ["copy_file_range", "sendfile", "pread"])
+def test_cross_device_move_copies_in_chunks(payload, monkeypatch, verify, fallback):
+    def unsupported(*args):
+        raise OSError(errno.ENOSYS, "not supported")
+
+    if fallback != "copy_file_range":
+        monkeypatch.setattr(os, "copy_file_range", unsupported, raising=False)
+    if fallback == "pread":
+        monkeypatch.setattr(os, "sendfile", unsupported, raising=False)
+    src, dest = payload
+    data = src.read_bytes()
+    CrossDevice(verify=verify, chunk=1000).move(src, dest)
+    assert not src.exists()
+    assert dest.read_bytes() == data and dest.stat().st_mtime == 1_000_000
+
+
+def test_link_across_devices_falls_back_to_copy(payload, monkeypatch):
+    def no_link(*args, **kwargs):
+        raise OSError(errno.EXDEV, "cross-device link")
+
+    monkeypatch.setattr(os, "link", no_link)
+    src, dest = payload
+    data = src.read_bytes()
+    fo.MoveEngine(verify="hash").move(src, dest)
+    assert not src.exists() and dest.read_bytes() == data
+
+
+@pytest.mark.parametrize("verify", ["size", "hash"])
+def test_failed_verify_keeps_source_and_removes_copy(payload, monkeypatch, verify):
+    if verify == "size":
+        # the copy is cut short after it was written
+        monkeypatch.setattr(fo.shutil, "copystat", lambda src, dest: os.truncate(dest, 1))
+    else:
+        monkeypatch.setattr(fo, "_file_digest", lambda path, chunk=0: str(path).encode())
+    src, dest = payload
+    with pytest.raises(OSError, match="verify failed"):
+        CrossDevice(verify=verify).move(src, dest)
+    assert src.exists() and not os.path.lexists(dest)
+
+
+def test_cross_device_move_never_replaces_dest(payload):
+    src, dest = payload
+    dest.write_bytes(b"theirs")
+    with pytest.raises(FileExistsError):
+        CrossDevice().move(src, dest)
+    assert src.exists() and dest.read_bytes() == b"theirs"
+
+
+def test_cross_device_move_keeps_symlinks(workdir):
+    (workdir / "in").mkdir()
+    (workdir / "out").mkdir()
+    (workdir / "in" / "link").symlink_to("../elsewhere")
+    CrossDevice().move(workdir / "in" / "link", workdir / "out" / "link")
+    assert os.readlink(workdir / "out" / "link") == "../elsewhere"
+    assert not os.path.lexists(workdir / "in" / "link")
+
+
+def test_unknown_verify_mode():
+    with pytest.raises(ValueError):
+        fo.MoveEngine(verify="crc")
+
+
+# -------------------------
+# Move executor
+# -------------------------
+def test_executor_fails_instead_of_hanging_when_on_done_raises(workdir):
+    make_files(workdir / "in", *(f"{i}.jpg" for i in range(20)))
+
+    def on_done(entry, tag):
+        raise OSError("journal disk full")
+
+    executor = fo.MoveExecutor(jobs=2, backlog=1, on_done=on_done)
+    outcome = []
+
+    def run():
+        try:
+            for i in range(20):
+                src, dest = workdir / "in" / f"{i}.jpg", workdir / "out" / f"{i}.jpg"
+                executor.submit({}, src, executor.plan(src, dest))
+        except OSError as e:
+            outcome.append(e)
+        finally:
+            try:
+                executor.close()
+            except OSError as e:
+                outcome.append(e)
+
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    t.join(10)
+    assert not t.is_alive(), "executor hung after its workers failed"
+    assert [str(e) for e in outcome] == ["journal disk full"]
+
+
+def test_daemon_refuses_preview(workdir, monkeypatch, capsys):
+    make_files(workdir, "a.jpg")
+    (workdir / "rules.yaml").write_text("- match_ext: [jpg]\n  target_folder: Photos\n")
+    cli(monkeypatch, "--config", "rules.yaml", "--daemon", "--interval", "0")
+    fo.OUTPUT.flush()
+    assert "--daemon needs --apply" in capsys.readouterr().out
+    assert not list(fo.LOG_DIR.glob("log_*"))
+
+
+# -------------------------
+# Duplicates
+# -------------------------
+@pytest.fixture
+def linked(workdir):
+    """a.bin and b.bin are one file under two names; c.bin is a copy, d.bin differs."""
+    src = (workdir / "src").resolve()
+    make_files(src, "a.bin", "c.bin", data=b"same" * 50_000)
+    make_files(src, "d.bin", data=b"diff" * 50_000)
+    os.link(src / "a.bin", src / "b.bin")
+    return src
+
+
+def test_duplicates_found_by_content_not_by_name(linked):
+    dups = fo.find_duplicates(linked, jobs=2)
+    assert dups == {str(linked / "c.bin"): str(linked / "a.bin")}
+
+
+def test_hardlink_dedupe_undo_keeps_existing_links(linked):
+    log = apply(linked, [], duplicates=fo.find_duplicates(linked), dedupe="hardlink")
+    assert os.stat(linked / "c.bin").st_ino == os.stat(linked / "a.bin").st_ino
+    assert len(list(fo.iter_undo_entries(log))) == 1
+
+    fo.undo_log(log)
+    assert os.stat(linked / "b.bin").st_ino == os.stat(linked / "a.bin").st_ino
+    assert os.stat(linked / "c.bin").st_ino != os.stat(linked / "a.bin").st_ino
+    assert (linked / "c.bin").read_bytes() == b"same" * 50_000
+
+
+def test_move_dedupe_keeps_every_name_of_the_original(linked):
+    apply(linked, [], duplicates=fo.find_duplicates(linked), dedupe="move")
+    assert tree(linked) == [f"{fo.DUPLICATES_FOLDER}/c.bin", "a.bin", "b.bin", "d.bin"]
+
+
+def test_duplicate_tiers_read_only_what_they_need(workdir):
+    src = workdir / "src"
+    make_files(src, "unique.bin", data=b"u" * 5000)
+    make_files(src, "empty1", "empty2", data=b"")
+    make_files(src, "small1.bin", "small2.bin", data=b"s" * 1500)            # edge hash covers it all
+    make_files(src, "head1.bin", data=b"1" + b"h" * 8999)                   # same size, head differs
+    make_files(src, "head2.bin", data=b"2" + b"h" * 8999)
+    make_files(src, "mid1.bin", data=b"m" * 5000 + b"1" + b"m" * 4999)       # only the middle differs
+    make_files(src, "mid2.bin", data=b"m" * 5000 + b"2" + b"m" * 4999)
+    make_files(src, "full1.bin", "full2.bin", data=b"f" * 7000)
+
+    finder = fo.DuplicateFinder(jobs=2, block=1024, chunk=4096)
+    dups = finder.find(fo.scan_files(src, "sorted"))
+    assert dups == {str(src / "full2.bin"): str(src / "full1.bin"),
+                    str(src / "small2.bin"): str(src / "small1.bin")}
+    assert finder.bytes_total == 5000 + 2 * 1500 + 2 * 9000 + 2 * 10000 + 2 * 7000
+    assert finder.bytes_read == (2 * 1500 + 2 * 2048
+                                 + 2 * (2048 + 10000) + 2 * (2048 + 7000))
+
+
+# -------------------------
+# Content matching
+# -------------------------
+def test_content_hits_read_only_the_prefix(workdir, monkeypatch):
+    import mmap
+    monkeypatch.setattr(mmap, "mmap", None)   # mapped files SIGBUS when a writer truncates them
+    make_files(workdir, "f.txt", data=b"x" * 100 + b"INVOICE" + b"x" * 100)
+    specs = ((0, b"invoice", re.IGNORECASE, 200), (1, b"invoice", re.IGNORECASE, 50),
+             (2, b"receipt", 0, 1000))
+    assert fo._content_hits(str(workdir / "f.txt"), specs) == {0}
+    assert fo._content_hits(str(workdir / "missing.txt"), specs) == frozenset()
+
+
+def test_content_scanner_is_reused_across_calls(workdir):
+    src = (workdir / "src").resolve()
+    make_files(src, "invoice.txt", data=b"INVOICE 42")
+    make_files(src, "note.txt", data=b"hello")
+    rules = [{"match_content": "invoice", "action": "move", "target_folder": "Invoices"}]
+    scanner = fo.ContentScanner(1)
+    try:
+        first = fo.process_folder(src, rules, preview=True, content_scanner=scanner)
+        submitted = []
+        submit = scanner._pool.submit
+        scanner._pool.submit = lambda *a: submitted.append(a) or submit(*a)
+        second = fo.process_folder(src, rules, preview=True, content_scanner=scanner)
+    finally:
+        scanner.close()
+    assert [e["dest"] for e in first] == [e["dest"] for e in second] == [str(src / "Invoices" / "invoice.txt")]
+    assert submitted == []   # unchanged files come from the cache; the pool stayed open
+
+
+# -------------------------
+# Output modes
+# -------------------------
+def output_run(workdir, monkeypatch, capsys, mode):
+    """A preview run through main(), which sets up --output; returns what it printed."""
+    make_files(workdir / "src", "a.jpg", "b.jpg", "c.pdf", "d.txt")
+    (workdir / "rules.yaml").write_text("- match_ext: [jpg]\n  target_folder: Photos\n"
+                                        "- match_ext: [pdf]\n  target_folder: Docs\n")
+    capsys.readouterr()
+    monkeypatch.setattr("sys.argv", ["file_organizer.py", "--config", "rules.yaml", "--src", "src",
+                                     "--output", mode])
+    fo.main()
+    return capsys.readouterr()
+
+
+def test_human_output_has_a_line_per_match(workdir, monkeypatch, capsys):
+    out = output_run(workdir, monkeypatch, capsys, "human").out
+    src = workdir / "src"
+    assert [line for line in out.splitlines() if line.startswith("[")] == [
+        f"[MATCH] {src / 'a.jpg'} -> {src / 'Photos' / 'a.jpg'}",
+        f"[MATCH] {src / 'b.jpg'} -> {src / 'Photos' / 'b.jpg'}",
+        f"[MATCH] {src / 'c.pdf'} -> {src / 'Docs' / 'c.pdf'}",
+    ]
+    assert "Preview mode" in out
+
+
+def test_summary_output_counts_rules_and_destinations(workdir, monkeypatch, capsys):
+    out = output_run(workdir, monkeypatch, capsys, "summary").out
+    assert "[MATCH]" not in out
+    table = out[out.index("Summary: 3 match"):].splitlines()
+    src = workdir / "src"
+    assert [line.split() for line in table[2:]] == [
+        ["2", "#0", "move", "Photos", str(src / "Photos")],
+        ["1", "#1", "move", "Docs", str(src / "Docs")],
+    ]
+
+
+def test_ndjson_output_keeps_stdout_parseable(workdir, monkeypatch, capsys):
+    captured = output_run(workdir, monkeypatch, capsys, "ndjson")
+    records = [json.loads(line) for line in captured.out.splitlines()]
+    src = workdir / "src"
+    assert records == [
+        {"event": "match", "rule": "#0 move Photos", "src": str(src / "a.jpg"), "dest": str(src / "Photos" / "a.jpg")},
+        {"event": "match", "rule": "#0 move Photos", "src": str(src / "b.jpg"), "dest": str(src / "Photos" / "b.jpg")},
+        {"event": "match", "rule": "#1 move Docs", "src": str(src / "c.pdf"), "dest": str(src / "Docs" / "c.pdf")},
+    ]
+    assert "Preview mode" in captured.err
+
+
+def test_quiet_output_prints_only_errors(workdir, monkeypatch, capsys):
+    assert output_run(workdir, monkeypatch, capsys, "quiet").out == ""
+    stream = io.StringIO()
+    reporter = fo.Reporter("quiet", stream=stream)
+    reporter.info("Undo complete.")
+    reporter.event("match", "[MATCH] a -> b", src="a", dest="b")
+    reporter.error("[ERROR] a: disk full", src="a")
+    reporter.finish()
+    assert stream.getvalue() == "[ERROR] a: disk full\n"
+    assert reporter.events == {"match": 1, "error": 1}
+
+
+def test_output_is_written_in_blocks(workdir):
+    stream = io.StringIO()
+    reporter = fo.Reporter("human", stream=stream, buffer_size=50, flush_interval=3600)
+    reporter.event("match", "[MATCH] a -> b")
+    assert stream.getvalue() == ""
+    for _ in range(4):
+        reporter.event("match", "[MATCH] a -> b")
+    assert stream.getvalue().count("\n") == 4
+    reporter.flush()
+    assert stream.getvalue().count("\n") == 5
+
+
+# -------------------------
+# Journal and undo
+# -------------------------
+def test_undo_round_trip(workdir):
+    src = (workdir / "src").resolve()
+    names = [f"d{i}/f{j}.{ext}" for i in range(3) for j in range(5) for ext in ("jpg", "pdf", "txt")]
+    make_files(src, *names)
+    before = tree(src)
+    log = apply(src, jobs=4)
+    assert tree(src) != before
+    fo.undo_log(log, jobs=4)
+    assert tree(src) == before
+
+
+def drop_done_records(log: Path):
+    """The journal as a run that stopped before writing any outcome would leave it."""
+    lines = log.read_text(encoding="utf-8").splitlines(keepends=True)
+    log.write_text("".join(l for l in lines if '"t":"done"' not in l), encoding="utf-8")
+
+
+def test_apply_in_cwd_leaves_log_folder_alone(workdir, monkeypatch):
+    make_files(workdir, "a.jpg", "b.pdf", "docs/c.pdf")
+    (workdir / "rules.yaml").write_text("- action: move\n  organize_by: extension\n")
+    cli(monkeypatch, "--src", ".", "--config", "rules.yaml", "--apply", "--index")
+    assert tree(workdir / "pdf") == ["b.pdf", "c.pdf"]
+    logs = sorted(p.name for p in fo.LOG_DIR.iterdir())
+    assert [n for n in logs if n.endswith("_applied.jsonl")] and [n for n in logs if n.startswith("index_")]
+
+    log = next(fo.LOG_DIR.glob("*_applied.jsonl"))
+    fo.undo_log(log)
+    assert tree(workdir / "docs") == ["c.pdf"] and (workdir / "a.jpg").exists()
+    assert not (workdir / "jsonl").exists() and not (workdir / "sqlite").exists()
+
+
+def test_undo_after_crash_uses_planned_name(workdir):
+    src = (workdir / "src").resolve()
+    make_files(src, "a.jpg", data=b"mine")
+    make_files(workdir, "out/a.jpg", data=b"unrelated")
+    rules = [{"match_ext": ["jpg"], "action": "move", "target_folder": "../out"}]
+    log = apply(src, rules)
+    assert (workdir / "out" / "a_1.jpg").read_bytes() == b"mine"
+
+    drop_done_records(log)
+    fo.undo_log(log)
+    assert (src / "a.jpg").read_bytes() == b"mine"
+    assert (workdir / "out" / "a.jpg").read_bytes() == b"unrelated"
+
+
+def test_undo_skips_moves_that_never_ran(workdir):
+    src = (workdir / "src").resolve()
+    make_files(src, "a.jpg", data=b"mine")
+    make_files(workdir, "out/a.jpg", data=b"unrelated")
+    journal = fo.Journal(fo.new_log_path("applied"))
+    journal.plan({"src": str(src / "a.jpg"), "dest": str(workdir / "out" / "a.jpg"),
+                  "planned_dest": str(workdir / "out" / "a_1.jpg"), "rule": RULES[0]})
+    journal.close()
+
+    runner = fo.UndoRunner(journal.path)
+    assert runner.run() == 0
+    assert tree(workdir / "out") == ["a.jpg"]
+    assert (src / "a.jpg").read_bytes() == b"mine"
+
+
+def test_undo_resumes_from_checkpoint(workdir, monkeypatch):
+    src = (workdir / "src").resolve()
+    make_files(src, "a.jpg", "b.jpg", "c.pdf")
+    log = apply(src)
+    entries = list(fo.iter_undo_entries(log))
+
+    # an earlier undo restored the last entry, then stopped
+    first = entries[0]
+    os.rename(first["actual_dest"], first["src"])
+    with open(str(log) + ".undo", "w", encoding="utf-8") as f:
+        f.write(f"{first['n']}\n")
+
+    messages = []
+    monkeypatch.setattr(fo.OUTPUT, "event", lambda kind, text, **fields: messages.append(text))
+    assert fo.UndoRunner(log).run() == 0
+    assert tree(src) == ["a.jpg", "b.jpg", "c.pdf"]
+    assert len(messages) == len(entries) - 1
+    assert all(m.startswith("Restoring") for m in messages)
+
+
+# -------------------------
+# Plans
+# -------------------------
+def make_plan(src, rules=RULES):
+    path = src.parent / "plan.jsonl"
+    writer = fo.PlanWriter(path, [src], rules)
+    try:
+        fo.process_folder(src, rules, preview=True, journal=writer)
+    finally:
+        writer.close()
+    return path
+
+
+def test_plan_applies_what_was_checked(src):
+    plan = make_plan(src)
+    header, originals, copy = fo.read_plan(plan, fo.rules_hash(RULES))
+    plan.write_text("")   # changed after the check: the private copy is what runs
+    with copy:
+        assert [os.path.basename(e["dest"]) for e in fo.iter_plan(copy)] == ["a.jpg", "b.pdf"]
+    assert header["roots"] == [str(src)] and originals == set()
+
+
+@pytest.mark.parametrize("edit, error", [
+    (lambda text: text.replace("Photos", "Photoz"), "does not match its hash"),
+    (lambda text: text.rsplit("\n", 2)[0] + "\n", "incomplete"),
+    (lambda text: text + text.splitlines(keepends=True)[1], "after the end record"),
+])
+def test_plan_rejected_when_edited(src, edit, error):
+    plan = make_plan(src)
+    plan.write_text(edit(plan.read_text(encoding="utf-8")), encoding="utf-8")
+    with pytest.raises(ValueError, match=error):
+        fo.apply_plan(plan)
+    assert tree(src) == ["a.jpg", "b.pdf", "notes.txt"]
+
+
+def test_plan_rejected_for_other_rules(src, monkeypatch, capsys):
+    plan = make_plan(src)
+    with pytest.raises(ValueError, match="different rules"):
+        fo.apply_plan(plan, expect_hash=fo.rules_hash(RULES[:1]))
+
+    (src.parent / "rules.yaml").write_text("- match_ext: [jpg]\n  target_folder: Pictures\n")
+    cli(monkeypatch, "--plan", str(plan), "--apply", "--config", str(src.parent / "rules.yaml"))
+    fo.OUTPUT.flush()
+    assert "made with different rules" in capsys.readouterr().out
+    assert tree(src) == ["a.jpg", "b.pdf", "notes.txt"]
+    assert not list(fo.LOG_DIR.glob("log_*"))
+
+
+def test_plan_skips_drifted_sources(src):
+    plan = make_plan(src)
+    (src / "a.jpg").write_bytes(b"changed since planning")
+    assert fo.apply_plan(plan, expect_hash=fo.rules_hash(RULES)) == (1, 1)
+    assert tree(src) == ["Docs/b.pdf", "a.jpg", "notes.txt"]
+
+
+# -------------------------
+# Watch batches
+# -------------------------
+def test_watch_batch_is_journaled_before_moving(workdir, monkeypatch):
+    src = (workdir / "src").resolve()
+    make_files(src, "a.jpg", "b.pdf", "notes.txt")
+    journaled = []
+    move = fo.safe_move
+
+    def checked_move(source, dest, *args, **kwargs):
+        log, = fo.LOG_DIR.glob("*_watch.jsonl")
+        journaled.append(str(source) in log.read_text(encoding="utf-8"))
+        return move(source, dest, *args, **kwargs)
+    monkeypatch.setattr(fo, "safe_move", checked_move)
+
+    watcher = fo.FolderWatcher(src, RULES, debounce=60)
+    try:
+        watcher.flush([str(src / "a.jpg"), str(src / "b.pdf"), str(src / "notes.txt")])
+    finally:
+        watcher.stop()
+    assert journaled == [True, True]
+    assert sorted(watcher._own) == [str(src / "Docs" / "b.pdf"), str(src / "Photos" / "a.jpg")]
+
+    log, = fo.LOG_DIR.glob("*_watch.jsonl")
+    fo.undo_log(log)
+    assert tree(src) == ["a.jpg", "b.pdf", "notes.txt"]
+
+
+# -------------------------
+# Native inotify backend
+# -------------------------
+class Collector:
+    """Watch handler that records the paths it is given."""
+
+    def __init__(self):
+        self.paths = []
+        self.seen = threading.Event()
+
+    def on_paths(self, paths):
+        self.paths.extend(paths)
+        self.seen.set()
+
+    def on_overflow(self):
+        pass
+
+
+@pytest.mark.skipif(not fo.inotify_available(), reason="inotify is Linux only")
+def test_inotify_reports_files_once_written(workdir):
+    root = workdir / "watched"
+    root.mkdir()
+    handler = Collector()
+    observer = fo.InotifyObserver()
+    observer.schedule(handler, str(root))
+    observer.start()
+    try:
+        path = root / "slow.bin"
+        with open(path, "wb") as f:
+            f.write(b"part")
+            f.flush()
+            assert not handler.seen.wait(0.3), "reported while still being written"
+            f.write(b" two")
+        assert handler.seen.wait(5)
+        assert handler.paths == [str(path)]
+
+        # files in a new directory are still found
+        handler.seen.clear()
+        (root / "sub").mkdir()
+        (root / "sub" / "a.txt").write_bytes(b"x")
+        deadline = time.monotonic() + 5
+        while str(root / "sub" / "a.txt") not in handler.paths and time.monotonic() < deadline:
+            handler.seen.wait(0.1)
+            handler.seen.clear()
+        assert str(root / "sub" / "a.txt") in handler.paths
+    finally:
+        observer.stop()
+        observer.join()
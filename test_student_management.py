@@ -0,0 +1,102 @@
+"""Tests for Student_Management_core.py (run with: python -m pytest)"""
+
+import copy
+import gc
+import io
+import json
+import pickle
+
+import pytest
+
+import Student_Management_core as core
+
+MARKS = {"Math": 90, "Science": 80, "English": 70}
+
+
+# -------------------------
+# Student rows
+# -------------------------
+def test_copies_own_their_rows():
+    student = core.Student("S1", "Ann Lee", MARKS)
+    rows = len(core.MARKS)
+    for clone in (copy.copy(student), copy.deepcopy(student), pickle.loads(pickle.dumps(student))):
+        assert clone._row != student._row
+        assert (clone.student_id, clone.name, clone.marks) == ("S1", "Ann Lee", MARKS)
+        clone.marks = {"Math": 1, "Science": 2, "English": 3}
+        assert student.marks == MARKS
+        del clone
+        gc.collect()
+        assert student.marks == MARKS and student.total_marks() == 240
+    assert len(core.MARKS) == rows
+
+    # a row freed by a copy is not handed out while the original still uses it
+    other = core.Student("S2", "Bob Ray", {"Math": 10, "Science": 20, "English": 30})
+    assert other._row != student._row and student.marks == MARKS
+
+
+def test_deleted_student_keeps_marks_until_dropped():
+    manager = core.StudentManager()
+    manager.add_student(core.Student("S1", "Ann Lee", MARKS))
+    manager.add_student(core.Student("S2", "Bob Ray", {"Math": 50, "Science": 60, "English": 70}))
+    removed = manager.delete_student("S1")
+    assert "S1" not in manager and removed.marks == MARKS
+    assert manager.stats("Math").count == 1
+
+    manager.add_student(removed)
+    assert manager.get("S1").marks == MARKS
+    assert [s.student_id for s in manager.top(2, "total")] == ["S1", "S2"]
+    assert manager.stats("total").mean == (240 + 180) / 2
+
+    rows = len(core.MARKS)
+    del removed
+    manager.delete_student("S1")
+    gc.collect()
+    assert len(core.MARKS) == rows - 1
+    assert manager.get("S2").marks == {"Math": 50, "Science": 60, "English": 70}
+
+
+# -------------------------
+# Batch CLI
+# -------------------------
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "students.db")
+    assert core.main(["--db", path, "add", "S1", "Ann Lee", "90", "80", "70"]) == 0
+    assert core.main(["--db", path, "add", "S2", "Bob Ray", "50", "60", "70"]) == 0
+    return path
+
+
+def query(db, capsys, *args):
+    capsys.readouterr()
+    status = core.main(["--db", db, "query", *args])
+    return status, [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_query_top_and_bottom(db, capsys):
+    assert query(db, capsys, "--top", "0") == (0, [])
+    assert query(db, capsys, "--bottom", "0") == (0, [])
+    status, found = query(db, capsys, "--top", "5", "--by", "Math")
+    assert status == 0 and [r["student_id"] for r in found] == ["S1", "S2"]
+    status, found = query(db, capsys, "--bottom", "1", "--rank")
+    assert [(r["student_id"], r["rank"], r["of"]) for r in found] == [("S2", 2, 2)]
+
+
+@pytest.mark.parametrize("args", [("query", "--top", "-1"), ("query", "--bottom", "-3"),
+                                  ("query", "--name", "A", "--limit", "-1"),
+                                  ("stats", "--histogram", "0")])
+def test_bad_counts_are_usage_errors(db, capsys, args):
+    with pytest.raises(SystemExit) as exc:
+        core.main(["--db", db, *args])
+    assert exc.value.code == 2
+    assert "error:" in capsys.readouterr().err
+
+
+def test_query_ids(db, capsys, monkeypatch):
+    status, found = query(db, capsys, "--id", "S2", "nope")
+    assert status == 1
+    assert found[0]["student_id"] == "S2" and found[0]["total"] == 180
+    assert found[1] == {"student_id": "nope", "error": "not found"}
+
+    monkeypatch.setattr("sys.stdin", io.StringIO("S1\n\nS2\n"))
+    status, found = query(db, capsys, "--id", "-")
+    assert status == 0 and [r["student_id"] for r in found] == ["S1", "S2"]